@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_summarize.py — Тайлангийн brand/өргөний тооцооллын benchmark
+==================================================================
+
+Синтетик баннерын DataFrame (default: 500k мөр) дээр:
+  - legacy:     мөр бүрт detect_brand() + бүх мөрийн str урттай өргөн
+  - vectorized: summarize.fill_brands() + summarize.column_widths() (түүвэр)
+хоёрыг хэмжиж, брэндийн үр дүн ижил эсэхийг шалгана. DB хэрэггүй.
+
+Ашиглалт:
+    python bench_summarize.py
+    python bench_summarize.py --rows 100000
+"""
+
+import time
+import random
+import argparse
+
+import pandas as pd
+
+import summarize
+from core.brands import BRAND_MAP, brand_for_host, detect_brand
+
+SITES = ["news.mn", "ikon.mn", "gogo.mn", "unegui.mn", "caak.mn", "eagle.mn"]
+HOSTS = [
+    "www.khanbank.com", "golomtbank.com", "shop.example.mn", "www.store.co.uk", "bit.ly",
+    "ad.doubleclick.net", "tdbm.mn", "promo.campaign.mn", "www.facebook.com",
+]
+
+
+def synthetic_frame(rows: int, seed: int = 42) -> pd.DataFrame:
+    """Бодит тархалттай төстэй: landing_url давтагддаг (кампанит ажил), src бараг давтагдахгүй."""
+    rnd = random.Random(seed)
+    keys = list(BRAND_MAP)
+    campaigns = []
+    for i in range(max(rows // 50, 1)):
+        host = rnd.choice(HOSTS)
+        kind = rnd.random()
+        if kind < 0.2:
+            campaigns.append(f"https://banner.bolor.net/pub/jump?url=https://{rnd.choice(HOSTS)}/c{i}")
+        elif kind < 0.4:
+            campaigns.append(f"https://{host}/{rnd.choice(keys)}/c{i}")
+        else:
+            campaigns.append(f"https://{host}/landing/c{i}?utm_source=banner")
+    data = {
+        "site": [rnd.choice(SITES) for _ in range(rows)],
+        "brand": [None] * rows,
+        "width": [rnd.choice([300, 728, 160, 970]) for _ in range(rows)],
+        "height": [rnd.choice([250, 90, 600]) for _ in range(rows)],
+        "landing_url": [rnd.choice(campaigns) for _ in range(rows)],
+        "src": [f"https://cdn.{rnd.choice(SITES)}/b/{i}.jpg" for i in range(rows)],
+        "ad_reason": [rnd.choice(["iframe", "img", "size", "network"]) for _ in range(rows)],
+    }
+    return pd.DataFrame(data)
+
+
+def legacy_brands(df: pd.DataFrame) -> list:
+    landing = df["landing_url"].fillna("").astype(str)
+    src = df["src"].fillna("").astype(str)
+    return [detect_brand(u, s) for u, s in zip(landing, src)]
+
+
+def legacy_widths(df: pd.DataFrame) -> list:
+    return [int(min(max(df[c].astype(str).map(len).max(), len(str(c))) + 2, summarize.MAX_COL_WIDTH))
+            for c in df.columns]
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="summarize.py transform benchmark")
+    parser.add_argument("--rows", type=int, default=500_000)
+    args = parser.parse_args()
+
+    print(f"⏳ Синтетик {args.rows} мөр үүсгэж байна...")
+    df = synthetic_frame(args.rows)
+
+    brand_for_host.cache_clear()
+    old_brands, t_old_brand = timed(legacy_brands, df)
+    old_widths, t_old_width = timed(legacy_widths, df.assign(brand=old_brands))
+
+    brand_for_host.cache_clear()
+    filled, t_new_brand = timed(summarize.fill_brands, df.copy())
+    new_widths, t_new_width = timed(summarize.column_widths, filled)
+
+    same = filled["brand"].tolist() == old_brands
+    print("=" * 60)
+    print(f"  {'':12}{'legacy':>12}{'vectorized':>12}{'speedup':>10}")
+    print(f"  {'brand':12}{t_old_brand:>11.2f}s{t_new_brand:>11.2f}s{t_old_brand / t_new_brand:>9.1f}x")
+    print(f"  {'widths':12}{t_old_width:>11.2f}s{t_new_width:>11.2f}s{t_old_width / t_new_width:>9.1f}x")
+    print("=" * 60)
+    print(f"  brand ижил: {'✅' if same else '❌'}")
+    print(f"  өргөн (legacy):     {old_widths}")
+    print(f"  өргөн (vectorized): {new_widths}")
+    if not same:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+# assets.py — Creative asset ID ба screenshot файлын нэгдсэн resolver
+#
+# asset_id нь banner_screenshots/ доторх canonical relative зам:
+#   "2025-12-24/gogo_abc12345.png"   (daily folder)
+#   "gogo_abc12345.png"              (хуучин, root дахь файл)
+# Capture хийх үед (engine) нэг удаа оноогоод DB-д хадгална; dashboard болон
+# /banners/<asset_id> route нь зөвхөн resolve_asset()-аар файл руу хөрвүүлнэ.
+# asset_id-гүй хуучин бичлэгүүдийг AssetIndex (filename → asset_id) санах ойгоос шийднэ.
+
+import os
+import re
+import time
+import threading
+from typing import Dict, Iterable, Iterator, Optional, Set
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCREENSHOT_DIRNAME = "banner_screenshots"
+SCREENSHOT_ROOT = os.path.join(BASE_DIR, SCREENSHOT_DIRNAME)
+
+_DAY_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+# Watcher байхгүй үед хавтсын mtime-ыг хамгийн ихдээ хэдэн секунд тутам шалгах
+ASSET_INDEX_POLL_SEC = float(os.getenv("ASSET_INDEX_POLL_SEC", "10"))
+
+
+def day_dir(day: str) -> str:
+    """Тухайн өдрийн screenshot хавтас (absolute)."""
+    return os.path.join(SCREENSHOT_ROOT, day)
+
+
+def asset_id_from_path(path: str) -> str:
+    """
+    Ямар ч хэлбэрийн screenshot замаас (absolute, relative, Windows 'C:\\...') asset_id гаргах.
+    Зөвхөн string боловсруулалт — дискэнд хандахгүй.
+    """
+    if not path:
+        return ""
+    parts = [p for p in str(path).replace("\\", "/").split("/") if p and p != "."]
+    if not parts:
+        return ""
+    filename = parts[-1]
+    if len(parts) >= 2 and _DAY_RE.match(parts[-2]):
+        return f"{parts[-2]}/{filename}"
+    return filename
+
+
+def asset_id_for_capture(screenshot_path: str) -> str:
+    """Capture-ийн screenshot файл бодитоор бичигдсэн бол asset_id, үгүй бол ""."""
+    if not screenshot_path or not os.path.isfile(screenshot_path):
+        return ""
+    return asset_id_from_path(screenshot_path)
+
+
+def screenshot_path_for(asset_id: str) -> str:
+    """DB/export-д хадгалах canonical relative зам: banner_screenshots/<asset_id>."""
+    return f"{SCREENSHOT_DIRNAME}/{asset_id}" if asset_id else ""
+
+
+def resolve_asset(asset_id: str) -> Optional[str]:
+    """asset_id → absolute файлын зам. banner_screenshots-оос гадагш гарах замыг хүлээж авахгүй."""
+    if not asset_id:
+        return None
+    full = os.path.normpath(os.path.join(SCREENSHOT_ROOT, asset_id))
+    if not full.startswith(SCREENSHOT_ROOT + os.sep):
+        return None
+    return full
+
+
+def iter_asset_ids(root: str = SCREENSHOT_ROOT) -> Iterator[str]:
+    """banner_screenshots доторх бүх asset_id (root файлууд, дараа нь өдрүүд өсөхөөр)."""
+    if not os.path.isdir(root):
+        return
+    with os.scandir(root) as it:
+        entries = sorted(it, key=lambda e: e.name)
+    for entry in entries:
+        if entry.is_file():
+            yield entry.name
+    for entry in entries:
+        if entry.is_dir() and _DAY_RE.match(entry.name):
+            with os.scandir(entry.path) as day_it:
+                for f in day_it:
+                    if f.is_file():
+                        yield f"{entry.name}/{f.name}"
+
+
+def build_index(asset_ids: Iterable[str]) -> Dict[str, str]:
+    """
+    filename → asset_id индекс.
+    Нэг файл олон өдөрт байвал хамгийн сүүлийн өдрийнхийг авна (root-ынхоос daily folder давуу).
+    """
+    index: Dict[str, str] = {}
+    for asset_id in asset_ids:
+        index[asset_id.rsplit("/", 1)[-1]] = asset_id
+    return index
+
+
+def scan_assets(root: str = SCREENSHOT_ROOT) -> Dict[str, str]:
+    """banner_screenshots-ыг нэг удаа гүйлгэж filename → asset_id индекс үүсгэнэ."""
+    return build_index(iter_asset_ids(root))
+
+
+# =====================================================
+# IN-MEMORY ASSET INDEX (filename → asset_id)
+# =====================================================
+
+class AssetIndex:
+    """
+    banner_screenshots-ын процесс даяарх индекс: filename → asset_id, O(1) хайлт.
+    - Анх нэг удаа бүрэн scan хийнэ
+    - watchdog (optional) байвал файлын өөрчлөлтөөр, үгүй бол mtime polling-оор
+      зөвхөн өөрчлөгдсөн хавтсыг (root эсвэл тухайн өдөр) дахин уншина
+    - Pipeline run бүрийн дараа refresh() дуудагдана
+    """
+
+    def __init__(self, root: str = SCREENSHOT_ROOT, poll_sec: float = ASSET_INDEX_POLL_SEC):
+        self.root = root
+        self.poll_sec = poll_sec
+        self._lock = threading.RLock()
+        self._dirs: Dict[str, Set[str]] = {}       # "" (root) эсвэл өдөр → файлын нэрс
+        self._mtimes: Dict[str, float] = {}
+        self._ids: Set[str] = set()
+        self._by_name: Dict[str, str] = {}
+        self._checked_at = 0.0
+        self._dirty = True
+        self._observer = None
+        self._start_watcher()
+
+    # ---------------- scanning ----------------
+    @staticmethod
+    def _mtime(path: str) -> float:
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            return -1.0
+
+    def _scan_dir(self, key: str) -> Set[str]:
+        path = os.path.join(self.root, key) if key else self.root
+        try:
+            with os.scandir(path) as it:
+                return {e.name for e in it if e.is_file()}
+        except OSError:
+            return set()
+
+    def _list_days(self) -> Set[str]:
+        try:
+            with os.scandir(self.root) as it:
+                return {e.name for e in it if e.is_dir() and _DAY_RE.match(e.name)}
+        except OSError:
+            return set()
+
+    def _reindex(self):
+        # iter_asset_ids-тэй ижил дараалал: root, дараа нь өдрүүд өсөхөөр (сүүлийнх нь давуу)
+        ids = [name for name in sorted(self._dirs.get("", ()))]
+        for day in sorted(k for k in self._dirs if k):
+            ids.extend(f"{day}/{name}" for name in sorted(self._dirs[day]))
+        self._ids = set(ids)
+        self._by_name = build_index(ids)
+
+    def refresh(self, force: bool = False) -> int:
+        """
+        Өөрчлөгдсөн хавтсуудыг дахин уншина (force=True бол бүгдийг).
+        Буцаах: дахин уншсан хавтсын тоо.
+        """
+        with self._lock:
+            keys = {""} | self._list_days()
+            changed = 0
+            for key in list(self._dirs):
+                if key not in keys:
+                    self._dirs.pop(key, None)
+                    self._mtimes.pop(key, None)
+                    changed += 1
+            for key in keys:
+                mtime = self._mtime(os.path.join(self.root, key) if key else self.root)
+                if force or key not in self._dirs or self._mtimes.get(key) != mtime:
+                    self._dirs[key] = self._scan_dir(key)
+                    self._mtimes[key] = mtime
+                    changed += 1
+            if changed:
+                self._reindex()
+            self._checked_at = time.monotonic()
+            self._dirty = False
+            return changed
+
+    def _maybe_refresh(self):
+        if self._dirty or (self._observer is None and time.monotonic() - self._checked_at >= self.poll_sec):
+            self.refresh()
+
+    # ---------------- watcher (optional) ----------------
+    def _start_watcher(self):
+        try:
+            from watchdog.observers import Observer  # optional
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            return
+        if not os.path.isdir(self.root):
+            return
+
+        index = self
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                index._dirty = True
+
+        try:
+            observer = Observer()
+            observer.schedule(_Handler(), self.root, recursive=True)
+            observer.daemon = True
+            observer.start()
+            self._observer = observer
+        except Exception as e:
+            print(f"⚠ Asset watcher unavailable, falling back to polling: {e}")
+
+    # ---------------- lookups ----------------
+    def __contains__(self, asset_id: str) -> bool:
+        self._maybe_refresh()
+        return asset_id in self._ids
+
+    def __len__(self) -> int:
+        self._maybe_refresh()
+        return len(self._ids)
+
+    def lookup(self, filename: str) -> Optional[str]:
+        """filename → хамгийн сүүлийн өдрийн asset_id (байхгүй бол None)."""
+        self._maybe_refresh()
+        return self._by_name.get(filename)
+
+    def resolve(self, screenshot_path: str) -> Optional[str]:
+        """
+        Ямар ч хэлбэрийн screenshot замаас дискэнд байгаа asset_id.
+        Зам дахь өдөр + filename яг таарвал түүнийг, үгүй бол filename-аар хамгийн сүүлийнхийг.
+        """
+        candidate = asset_id_from_path(screenshot_path)
+        if not candidate:
+            return None
+        if candidate in self:
+            return candidate
+        return self.lookup(candidate.rsplit("/", 1)[-1])
+
+
+_index: Optional[AssetIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> AssetIndex:
+    """Процесс доторх ганц AssetIndex (анх дуудахад бүрэн scan хийнэ)."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                idx = AssetIndex()
+                idx.refresh(force=True)
+                _index = idx
+    return _index
+
+
+def refresh_index() -> int:
+    """Pipeline run дууссаны дараа дуудагдах hook: шинэ screenshot-уудыг индекст нэмнэ."""
+    if _index is None:
+        return 0
+    return _index.refresh()
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+# brands.py — Нэгдсэн брэнд танигч
+#
+# Өмнө нь server.py, summarize.py (BRAND_MAP-ийн 2 хуулбар) болон
+# core.common.extract_brand_from_url гэсэн 3 тусдаа хэрэгжүүлэлт байсан.
+# - BRAND_MAP-ийн бүх түлхүүрийг НЭГ compiled regex болгож текстийг нэг удаа гүйлгэнэ
+# - Домэйнээс брэнд гаргах fallback-ийг host-оор LRU cache-лэнэ
+# - Ingest (upsert_banner) үед нэг удаа тооцоолж DB-ийн `brand` талбарт хадгална;
+#   dashboard болон тайлан тэр талбарыг шууд уншина
+
+import os
+import re
+from functools import lru_cache
+from typing import Iterator, Tuple
+from urllib.parse import urlparse, parse_qs
+
+# Landing URL / src доторх түлхүүр → брэнд.
+# Дараалал = давуу эрэмбэ: текстэд хэд хэдэн түлхүүр таарвал эхнийх нь ялна.
+BRAND_MAP = {
+    # Банкууд
+    "khanbank": "Хаан Банк", "golomt": "Голомт Банк", "tdbm": "ХХБ (TDB)",
+    "statebank": "Төрийн Банк", "capitron": "Капитрон", "bogdbank": "Богд Банк",
+    "nibs": "ҮХОБ", "transbank": "Тээвэр Хөгжлийн Банк", "xacbank": "Хас Банк",
+
+    # Төлбөрийн системүүд
+    "qpay": "QPay", "monpay": "MonPay", "socialpay": "SocialPay",
+    "toki": "Toki", "storepay": "StorePay", "lendmn": "LendMN",
+
+    # Телеком
+    "unitel": "Unitel", "mobicom": "Mobicom", "skytel": "Skytel",
+    "gmobile": "G-Mobile", "ondo": "Ondo",
+
+    # Мэдээллийн сайтууд
+    "gogo": "GoGo.mn", "univision": "Univision", "news.mn": "News.mn",
+    "ikon": "Ikon.mn", "caak": "Caak.mn",
+
+    # Дэлгүүрүүд
+    "shoppy": "Shoppy", "uran": "Uran", "bsb": "BSB", "pc-mall": "PC Mall",
+    "next": "Next Electronics", "nomin": "Nomin", "emart": "Emart",
+    "cu-mongolia": "CU", "gs25": "GS25",
+
+    # Бусад
+    "tavanbogd": "Tavan Bogd", "mcs": "MCS", "apu": "APU",
+    "unegui": "Unegui.mn", "zangia": "Zangia.mn", "ihelp": "iHelp",
+    "koreanair": "Korean Air", "freshpack": "Freshpack", "sain": "Sain Electronics",
+
+    # Тоглоом/Бооцоо
+    "bet": "Betting", "1xbet": "1xBet", "melbet": "MelBet",
+}
+
+# Banner redirect / short URL сервисүүд: эдгээрийн host-оос брэнд гаргахгүй
+SKIP_HOSTS = ("banner.bolor", "bit.ly", "goo.gl", "tinyurl", "t.co")
+
+# Redirect URL-ын query-д бодит landing URL агуулж болох key-үүд
+REDIRECT_KEYS = ("adurl", "url", "u", "redirect", "rd", "to", "target", "dest")
+
+# Ad network домэйн → брэнд (бодит линк олдохгүй үед)
+AD_NETWORKS = {
+    "google": ("doubleclick.net", "googlesyndication.com", "googleadservices.com"),
+    "facebook": ("facebook.com", "fb.com"),
+    "criteo": ("criteo.com",),
+    "taboola": ("taboola.com",),
+}
+
+BRAND_HOST_CACHE_SIZE = int(os.getenv("BRAND_HOST_CACHE_SIZE", "4096"))
+
+_PRIORITY = {key: i for i, key in enumerate(BRAND_MAP)}
+_BRANDS = list(BRAND_MAP.values())
+
+# Lookahead: байрлал бүрт шалгана, тиймээс давхцсан түлхүүрүүд бүгд олдоно
+# ("tavanbogdbank" дотор "tavanbogd" ба "bogdbank"). Нэг байрлалд урт түлхүүр
+# эхэлж таарна ("melbet" нь "bet"-ийг давна).
+_MATCHER = re.compile("(?=(" + "|".join(re.escape(k) for k in sorted(BRAND_MAP, key=len, reverse=True)) + "))")
+
+
+def iter_brand_matches(text: str) -> Iterator[Tuple[int, int]]:
+    """
+    Текст доторх BRAND_MAP түлхүүр бүрийн (байрлал, priority); priority бага = давуу эрэмбэ.
+    Өмнөх урт түлхүүрийн дотор бүтэн багтсан түлхүүрийг ("melbet" доторх "bet") алгасна.
+    """
+    covered = 0
+    for m in _MATCHER.finditer(text):
+        end = m.start() + len(m.group(1))
+        if end > covered:
+            covered = end
+            yield m.start(), _PRIORITY[m.group(1)]
+
+
+def brand_by_priority(priority: int) -> str:
+    """iter_brand_matches-ийн priority → брэндийн нэр."""
+    return _BRANDS[priority]
+
+
+def match_brand(text: str) -> str:
+    """Текст доторх BRAND_MAP түлхүүрүүдээс хамгийн өндөр эрэмбэтэйг олох (нэг scan)."""
+    best = min((prio for _, prio in iter_brand_matches(text)), default=None)
+    return "" if best is None else brand_by_priority(best)
+
+
+def _host_in(host: str, domain: str) -> bool:
+    return host == domain or host.endswith("." + domain) or host.startswith(domain + ".")
+
+
+def real_landing_url(url: str) -> str:
+    """Redirect URL-ын query-оос (adurl/url/u/...) бодит landing URL-ыг гаргах. Олдохгүй бол url өөрөө."""
+    try:
+        qs = parse_qs(urlparse(url).query)
+    except ValueError:
+        return url
+    for key in REDIRECT_KEYS:
+        for cand in qs.get(key, []):
+            if cand.startswith("http"):
+                return cand
+    return url
+
+
+@lru_cache(maxsize=BRAND_HOST_CACHE_SIZE)
+def brand_for_host(hostname: str) -> str:
+    """Host-оос брэнд таамаглах (BRAND_MAP-д олдоогүй үеийн fallback). Host бүрт нэг л удаа тооцоолно."""
+    host = (hostname or "").lower().strip(".")
+    if host.startswith("www."):
+        host = host[4:]
+    if not host or any(_host_in(host, skip) for skip in SKIP_HOSTS):
+        return ""
+
+    for network, domains in AD_NETWORKS.items():
+        if any(_host_in(host, d) for d in domains):
+            return network.title()
+
+    # domain.tld-ийн domain хэсэг ("mn", "co" гэх мэт богино хэсгийг хасна)
+    parts = host.split(".")
+    if len(parts) >= 2 and len(parts[-2]) > 2:
+        return parts[-2].title()
+    return ""
+
+
+def detect_brand(landing_url: str, src: str = "") -> str:
+    """
+    Landing URL болон src-аас брэндийг таних.
+    1. BRAND_MAP (compiled matcher)
+    2. Redirect URL (banner.bolor.net/pub/jump?url=...) бол бодит URL дээр дахин
+    3. Домэйнээс (host cache-тэй)
+    Олдохгүй бол "".
+    """
+    landing_url = str(landing_url or "")
+    brand = match_brand(f"{landing_url} {src or ''}".lower())
+    if brand or not landing_url:
+        return brand
+
+    real = real_landing_url(landing_url)
+    if real != landing_url:
+        brand = match_brand(real.lower())
+        if brand:
+            return brand
+
+    try:
+        return brand_for_host(urlparse(real).hostname or "")
+    except ValueError:
+        return ""
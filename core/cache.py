@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+# cache.py — Dashboard-ийн query үр дүнгийн cache
+#
+# Өдөрт 2 удаагийн scrape-ийн хооронд баннерын дата бараг өөрчлөгддөггүй тул
+# /api/banners-ийн боловсруулсан хуудас, сайтын жагсаалт, get_stats-ийг
+# шүүлтүүрийн параметрээр нь cache-лэнэ.
+# - TTL (RESULT_CACHE_TTL_SEC) дуусахад автоматаар хуучирна
+# - invalidate(): pipeline дуусах, archive/delete зэрэг өгөгдөл өөрчлөгдөх үед бүгдийг хүчингүй болгоно
+#   (generation дугаарыг нэмэгдүүлнэ — хуучин түлхүүрүүд дахин уншигдахгүй)
+# - Default нь процесс доторх LRU. REDIS_URL тохируулсан ба redis сан суусан бол
+#   gunicorn-ы бүх worker нэг cache (болон invalidation)-ийг хуваалцана
+
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+RESULT_CACHE_TTL_SEC = float(os.getenv("RESULT_CACHE_TTL_SEC", "300"))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "512"))
+REDIS_URL = os.getenv("REDIS_URL", "")
+REDIS_PREFIX = os.getenv("RESULT_CACHE_PREFIX", "banner_cache")
+
+
+class LocalCache:
+    """Процесс доторх LRU + TTL cache."""
+
+    name = "local"
+
+    def __init__(self, max_entries: int = RESULT_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+
+
+class RedisCache:
+    """Redis дээрх хуваалцсан cache (утгууд JSON хэлбэрээр)."""
+
+    name = "redis"
+
+    def __init__(self, client, prefix: str = REDIS_PREFIX):
+        self.client = client
+        self.prefix = prefix
+
+    def generation(self) -> int:
+        return int(self.client.get(f"{self.prefix}:gen") or 0)
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self.client.get(f"{self.prefix}:{key}")
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any, ttl: float):
+        raw = json.dumps(value, ensure_ascii=False, default=str)
+        self.client.set(f"{self.prefix}:{key}", raw, ex=max(1, int(ttl)))
+
+    def invalidate(self):
+        # Хуучин generation-ий түлхүүрүүд TTL-ээрээ өөрөө устна
+        self.client.incr(f"{self.prefix}:gen")
+
+
+def _make_backend():
+    if REDIS_URL:
+        try:
+            import redis  # optional
+            client = redis.Redis.from_url(REDIS_URL, socket_timeout=1, socket_connect_timeout=1)
+            client.ping()
+            print(f"✅ Result cache: redis ({REDIS_URL.rsplit('@', 1)[-1]})")
+            return RedisCache(client)
+        except Exception as e:
+            print(f"⚠ Redis cache unavailable, using local cache: {e}")
+    return LocalCache()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_cache():
+    """Процесс доторх ганц cache backend (анх дуудахад сонгоно)."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _make_backend()
+    return _backend
+
+
+def make_key(namespace: str, params: dict, generation: int) -> str:
+    raw = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+    return f"{namespace}:{generation}:{hashlib.sha1(raw.encode('utf-8')).hexdigest()}"
+
+
+def cached(namespace: str, params: dict, compute: Callable[[], Any], ttl: float = RESULT_CACHE_TTL_SEC) -> Any:
+    """params-аар түлхүүрлэсэн үр дүн. Cache-д байхгүй бол compute() дуудаж хадгална (None-ийг хадгалахгүй)."""
+    if ttl <= 0:
+        return compute()
+    backend = get_cache()
+    try:
+        key = make_key(namespace, params, backend.generation())
+        value = backend.get(key)
+    except Exception as e:
+        print(f"Cache Error: {e}")
+        return compute()
+    if value is not None:
+        return value
+
+    value = compute()
+    if value is None:
+        return None
+    try:
+        backend.set(key, value, ttl)
+    except Exception as e:
+        print(f"Cache Error: {e}")
+    return value
+
+
+def invalidate():
+    """Өгөгдөл өөрчлөгдсөн: бүх cache-лэсэн үр дүнг хүчингүй болгох."""
+    try:
+        get_cache().invalidate()
+    except Exception as e:
+        print(f"Cache Error: {e}")
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+# capture.py — Нэг сайтын capture-уудыг санах ой тогтмол байлгаж DB рүү урсгах pipeline
+#
+#   scraper ──put_many()──▶ [download] ──▶ [hash] ──▶ [classify] ──▶ [upsert (batch)]
+#
+# - Шат бүрийн хооронд хязгаартай queue (CAPTURE_QUEUE_SIZE): дүүрвэл put() блоклоно →
+#   DB/сүлжээ удааширвал scraper өөрөө хүлээнэ (backpressure), capture санах ойд хуримтлагдахгүй
+# - download: img_bytes=None capture-ийн зургийг browser-ийн гадна татна (scraper-ийг саатуулахгүй)
+# - hash: pHash + animated эсэхийг тооцоод img_bytes-ийг шууд чөлөөлнө — цааш зөвхөн metadata явна
+# - upsert: CAPTURE_BATCH_SIZE-аар эсвэл CAPTURE_FLUSH_SEC чимээгүй болмогц ingest() руу бичнэ
+# Нэг сайтын дээд санах ой: bytes-тэй нь ≈ 2 × CAPTURE_DOWNLOAD_WORKERS + 1 capture, bytes-гүй нь
+# ≈ 3 × CAPTURE_QUEUE_SIZE + CAPTURE_BATCH_SIZE — run-ий хэмжээнээс хамаарахгүй.
+
+import os
+import queue
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+from core.common import classify_ad, http_get_bytes, image_fingerprint, phash_hex_from_file
+
+CAPTURE_QUEUE_SIZE = int(os.getenv("CAPTURE_QUEUE_SIZE", "32"))
+CAPTURE_BATCH_SIZE = int(os.getenv("CAPTURE_BATCH_SIZE", "20"))
+CAPTURE_FLUSH_SEC = float(os.getenv("CAPTURE_FLUSH_SEC", "5"))
+CAPTURE_DOWNLOAD_WORKERS = int(os.getenv("CAPTURE_DOWNLOAD_WORKERS", "2"))
+
+_DONE = object()
+
+
+def download(cap: Dict) -> Dict:
+    # img_bytes=None → хараахан татаагүй; b"" (iframe гэх мэт) → татах шаардлагагүй
+    referer = cap.pop("referer", None)
+    if cap.get("img_bytes") is None and cap.get("src"):
+        cap["img_bytes"] = http_get_bytes(cap["src"], referer=referer)
+    return cap
+
+
+def hash_capture(cap: Dict) -> Dict:
+    img_bytes = cap.pop("img_bytes", None)
+    phash, animated = image_fingerprint(img_bytes)
+    cap["phash"] = phash or phash_hex_from_file(cap.get("screenshot_path", ""))
+    cap["animated"] = animated
+    return cap
+
+
+def classifier(min_score: int) -> Callable[[Dict], Dict]:
+    def classify(cap: Dict) -> Dict:
+        animated = cap.pop("animated", False)
+        # Scraper ангилсан бол (ad_score байгаа) дахин тооцохгүй
+        if "ad_score" not in cap:
+            _, score, reason = classify_ad(
+                cap.get("site", ""), cap.get("src", ""), cap.get("landing_url", ""),
+                str(cap.get("width") or 0), str(cap.get("height") or 0), cap.get("notes", ""),
+                min_score, animated=animated,
+            )
+            cap["ad_score"], cap["ad_reason"] = int(score), reason
+        return cap
+    return classify
+
+
+class CapturePipeline:
+    """
+    Ашиглалт:
+        with CapturePipeline("gogo_mn", ingest_batch) as pipe:
+            scraper(emit=pipe.put_many)
+        pipe.counts     # {"collected", "new"}
+        pipe.processed  # {"download", "hash", "classify"} — шат бүрийг дамжсан тоо
+
+    ingest_batch(items) -> {"collected", "new"} нь upsert шатны thread-ээс дуудагдана.
+    Upsert алдаа __exit__ дээр дахин шидэгдэнэ (scraper-ийн алдаатай адил job-ийг унагана).
+    """
+
+    def __init__(self, name: str, ingest_batch: Callable[[List[Dict]], Dict], min_score: int = 3,
+                 queue_size: int = CAPTURE_QUEUE_SIZE, batch_size: int = CAPTURE_BATCH_SIZE,
+                 flush_sec: float = CAPTURE_FLUSH_SEC, download_workers: int = CAPTURE_DOWNLOAD_WORKERS):
+        self.name = name
+        self.ingest_batch = ingest_batch
+        self.batch_size = batch_size
+        self.flush_sec = flush_sec
+        self.counts = {"collected": 0, "new": 0}
+        self.processed = {"download": 0, "hash": 0, "classify": 0}   # шат бүрийг дамжсан capture (checkpoint-д)
+        self.error: Optional[Exception] = None
+
+        # download → hash хооронд л img_bytes явдаг тул тэр queue-г worker-ийн тоогоор хязгаарлана
+        stages = [
+            ("download", download, download_workers, download_workers),
+            ("hash", hash_capture, 1, queue_size),
+            ("classify", classifier(min_score), 1, queue_size),
+        ]
+        self._inbox = queue.Queue(maxsize=queue_size)
+        self._threads: List[threading.Thread] = []
+        inbox = self._inbox
+        for stage, fn, workers, outbox_size in stages:
+            outbox = queue.Queue(maxsize=outbox_size)
+            remaining = [workers]
+            for i in range(workers):
+                self._threads.append(threading.Thread(
+                    target=self._run_stage, args=(stage, fn, inbox, outbox, remaining),
+                    daemon=True, name=f"capture-{name}-{stage}-{i}",
+                ))
+            inbox = outbox
+        self._threads.append(threading.Thread(
+            target=self._run_upsert, args=(inbox,), daemon=True, name=f"capture-{name}-upsert",
+        ))
+        self._lock = threading.Lock()
+
+    # ---------------- Scraper тал ----------------
+    def put(self, cap: Dict):
+        """Нэг capture (queue дүүрсэн бол сул зай гартал блоклоно)."""
+        if self.error:
+            raise self.error
+        self._inbox.put(cap)
+
+    def put_many(self, caps: Iterable[Dict]):
+        for cap in caps:
+            self.put(cap)
+
+    # ---------------- Шатууд ----------------
+    def _run_stage(self, stage: str, fn: Callable[[Dict], Dict], inbox: queue.Queue, outbox: queue.Queue,
+                   remaining: List[int]):
+        while True:
+            cap = inbox.get()
+            if cap is _DONE:
+                # Хамт ажиллаж буй worker-уудад дамжуулаад, сүүлчийнх нь дараагийн шатанд мэдэгдэнэ
+                inbox.put(_DONE)
+                with self._lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    outbox.put(_DONE)
+                return
+            try:
+                cap = fn(cap)
+            except Exception as e:
+                # Татах/hash/ангилах алдаа capture-ийг хаяхгүй: metadata-аа хадгалуулна
+                print(f"⚠ {self.name}: {stage} failed for {cap.get('src', '')[:80]}: {e}")
+                cap.pop("img_bytes", None)
+                cap.pop("animated", None)
+                cap.pop("referer", None)
+            with self._lock:
+                self.processed[stage] += 1
+            outbox.put(cap)
+
+    def _flush(self, batch: List[Dict]):
+        if not batch or self.error:
+            return
+        try:
+            result = self.ingest_batch(batch) or {}
+            self.counts["collected"] += result.get("collected", 0)
+            self.counts["new"] += result.get("new", 0)
+        except Exception as e:
+            self.error = e
+
+    def _run_upsert(self, inbox: queue.Queue):
+        batch: List[Dict] = []
+        while True:
+            try:
+                cap = inbox.get(timeout=self.flush_sec)
+            except queue.Empty:
+                # Scraper dwell дунд чимээгүй болсон: хүлээлгүй бичих
+                self._flush(batch)
+                batch = []
+                continue
+            if cap is _DONE:
+                self._flush(batch)
+                return
+            batch.append(cap)
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+
+    # ---------------- Lifecycle ----------------
+    def __enter__(self):
+        for t in self._threads:
+            t.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Scraper алдаатай дууссан ч авсан capture-ууд нь DB-д орно
+        self._inbox.put(_DONE)
+        for t in self._threads:
+            t.join()
+        if self.error and exc_type is None:
+            raise self.error
+        return False
@@ -1,9 +1,8 @@
 # -*- coding: utf-8 -*-
-# common.py (v6) — TSV storage + robust HTTP + EXIF/animated handling + brand extraction + pHash config + ad-classifier + upsert + OCR/Title
+# common.py (v6) — TSV storage (journal) + robust HTTP + EXIF/animated handling + brand extraction + pHash config + ad-classifier + upsert + OCR/Title
 # ЗАСВАР: times_seen хасагдсан
 
 import os
-import csv
 import hashlib
 import requests
 import re
@@ -15,10 +14,13 @@ except ImportError:
 from io import BytesIO
 from datetime import datetime, timezone
 from typing import List, Dict, Optional, Tuple
-from urllib.parse import urlparse, unquote
+from urllib.parse import urlparse
 from PIL import Image, ImageOps
 import imagehash
 
+from core.brands import detect_brand
+from core.journal import get_store
+
 # ===================== Config =====================
 DELIM = "\t"
 PHASH_SIZE = int(os.getenv("PHASH_SIZE", "8"))             # 8 эсвэл 16
@@ -42,37 +44,15 @@ def ensure_dir(p: str):
     if d: os.makedirs(d, exist_ok=True)
 
 def load_db(path: str) -> List[Dict[str, str]]:
-    if not os.path.exists(path): return []
-    with open(path, "r", newline="", encoding="utf-8") as f:
-        return list(csv.DictReader(f, delimiter=DELIM))
+    """Snapshot + journal tail-аас одоогийн мөрүүдийг сэргээнэ (core.journal)."""
+    return get_store(path, CSV_HEADERS).rows()
 
 def save_db(path: str, rows: List[Dict[str, str]]):
-    """Аюулгүй бичих; portalocker байх бол богино лок хэрэглэнэ."""
-    ensure_dir(path)
-    tmp = path + ".tmp"
-
-    # Optional file lock
-    lock_path = path + ".lock"
-    try:
-        import portalocker  # optional
-        with portalocker.Lock(lock_path, timeout=5):
-            _write_rows(tmp, rows)
-            os.replace(tmp, path)
-    except Exception:
-        # lock байхгүй/алдаатай бол энгийн бичих горим
-        _write_rows(tmp, rows)
-        os.replace(tmp, path)
-
-def _write_rows(tmp: str, rows: List[Dict[str, str]]):
-    with open(tmp, "w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(
-            f, fieldnames=CSV_HEADERS,
-            delimiter=DELIM, quoting=csv.QUOTE_MINIMAL, extrasaction="ignore"
-        )
-        w.writeheader()
-        for r in rows:
-            out = {k: (r.get(k, "") if r.get(k) is not None else "") for k in CSV_HEADERS}
-            w.writerow(out)
+    """
+    Аюулгүй бичих: бүх мөрийг дахин бичихгүй, зөвхөн өөрчлөгдсөн мөрүүдийг
+    journal-д append хийнэ. Journal томровол background-д snapshot руу нийлүүлнэ.
+    """
+    get_store(path, CSV_HEADERS).sync(rows)
 
 # ===================== HTTP (Session + Retry + Stream cap) =====================
 from requests.adapters import HTTPAdapter
@@ -166,6 +146,17 @@ def phash_hex_from_bytes(b: Optional[bytes]) -> str:
     if img is None: return ""
     return str(imagehash.phash(img, hash_size=PHASH_SIZE))
 
+def image_fingerprint(b: Optional[bytes]) -> Tuple[str, bool]:
+    """(pHash, animated эсэх) — зургийг нэг л удаа decode хийнэ (capture pipeline-ийн hash шат)."""
+    if not b: return "", False
+    img = _img_from_bytes(b)
+    if img is None: return "", False
+    try:
+        animated = bool(getattr(img, "is_animated", False) or getattr(img, "n_frames", 1) > 1)
+    except Exception:
+        animated = False
+    return str(imagehash.phash(img, hash_size=PHASH_SIZE)), animated
+
 def phash_hex_from_file(path: str) -> str:
     if not path or not os.path.exists(path): return ""
     try:
@@ -229,74 +220,9 @@ def _norm_site_host(site: str) -> str:
     if "://" not in site: site = "https://" + site
     return _host(site)
 
-# Нийтлэг TLD/Subdomain ба ad network-ууд
-_COMMON_TLDS = {".com", ".mn", ".org", ".net", ".info", ".biz", ".gov", ".edu", ".co", ".io"}
-_COMMON_SUBDOMAINS = {"www", "m", "mobile", "shop", "promo", "news", "blog", "en"}
-_AD_NETWORKS = {
-    "google": {"doubleclick.net", "googlesyndication.com", "googleadservices.com"},
-    "facebook": {"facebook.com", "fb.com"},
-    "criteo": {"criteo.com"},
-    "taboola": {"taboola.com"},
-}
-
-def _extract_true_url_from_redirect(u: str) -> Optional[str]:
-    """Google/Facebook redirect query-оос бодит landing URL-ыг ил гаргах оролдлого."""
-    try:
-        q = urlparse(u).query
-        pairs = re.findall(r'(?:^|&)([^=]+)=([^&]+)', q)
-        params = {k: v for k, v in pairs}
-    except Exception:
-        params = {}
-    for key in ("adurl", "url", "u", "redirect", "rd", "to"):
-        if key in params:
-            cand = unquote(params[key])
-            if cand.startswith("http"):
-                return cand
-    return None
-
 def extract_brand_from_url(url: str) -> str:
-    """
-    Landing URL-оос брэндийн нэрийг таамаглана.
-    - Redirect query (adurl/url/u/...) байвал бодит URL руу "өөдрүүлнэ"
-    - Ad network домэйноос "жинхэнэ линк"-ийг дахин шалгана
-    - tldextract байвал ашиглана (optional), үгүй бол heuristic
-    """
-    if not url: return ""
-    try:
-        real = _extract_true_url_from_redirect(url) or url
-        hostname = urlparse(real).hostname
-        if not hostname: return ""
-        hostname = hostname.lower()
-
-        # Ad network илэрвэл дахин бодит линк хайна
-        for network, domains in _AD_NETWORKS.items():
-            if any(d in hostname for d in domains):
-                cand = _extract_true_url_from_redirect(real)
-                if cand:
-                    hostname = (urlparse(cand).hostname or hostname).lower()
-                else:
-                    return network.title()
-
-        # Илүү найдвартай бол tldextract ашиглана
-        brand = ""
-        try:
-            import tldextract  # optional
-            ext = tldextract.extract(hostname)
-            # ext.domain ихэвчлэн брэндэд хамгийн ойр
-            brand = ext.domain or ""
-        except Exception:
-            # Heuristic: дэд домэйнүүдийг шүүж meaningful хэсгээс сүүлчийнхийг авна
-            parts = hostname.split(".")
-            meaningful_parts = [p for p in parts if ("."+p) not in _COMMON_TLDS and p not in _COMMON_SUBDOMAINS]
-            if meaningful_parts:
-                cands = [p for p in meaningful_parts if len(p) > 1 and not p.isdigit()]
-                brand = cands[-1] if cands else meaningful_parts[-1]
-            else:
-                brand = parts[-2] if len(parts) >= 2 else hostname
-
-        return brand
-    except Exception:
-        return ""
+    """Landing URL-оос брэндийн нэр (core.brands-ийн нэгдсэн танигч руу дамжуулна)."""
+    return detect_brand(url)
 
 # ===================== Ad classifier =====================
 _STD_AD_SIZES = [(728,90),(970,250),(300,250),(336,280),(300,600),(160,600),(320,100),(468,60),(250,250),(240,400),(980,120)]
@@ -308,7 +234,8 @@ def _near_std_size(w: int, h: int, tol: int = 25) -> bool:
     return any(abs(w-sw)<=tol and abs(h-sh)<=tol for sw,sh in _STD_AD_SIZES)
 
 def classify_ad(site: str, src: str, landing: str, width: str, height: str, notes: str,
-                min_score: int = 5, img_bytes: Optional[bytes] = None) -> Tuple[str,str,str]:
+                min_score: int = 5, img_bytes: Optional[bytes] = None,
+                animated: Optional[bool] = None) -> Tuple[str,str,str]:
     """
     Return (is_ad '1/0', score_str, reason_csv).
     Оноо (heuristics):
@@ -319,7 +246,7 @@ def classify_ad(site: str, src: str, landing: str, width: str, height: str, note
       - ad-related үгс
       - thumbnail/logo/icon зэрэг сөрөг оноо
       - aspect ratio (өргөн тууз, босоо баннер)
-      - animated hint (gif/mp4/webm path эсвэл animated image)
+      - animated hint (gif/mp4/webm path эсвэл animated image; bytes чөлөөлсөн бол animated=)
     Guardrail: min_score≤4 үед (ad-host ИЛЭРХИЙ эсвэл external эсвэл стандарт хэмжээ) байхгүй бол ad биш болгоно.
     """
     score, reasons = 0, []
@@ -364,7 +291,7 @@ def classify_ad(site: str, src: str, landing: str, width: str, height: str, note
     # Animated hint (file path + бодитоор animated эсэх)
     if any(ext in path for ext in [".gif", ".mp4", ".webm"]):
         score += 1; reasons.append("animated_hint")
-    elif img_bytes and is_animated_image_bytes(img_bytes):
+    elif animated or (animated is None and img_bytes and is_animated_image_bytes(img_bytes)):
         score += 1; reasons.append("animated_hint")
 
     # Эхний шийд
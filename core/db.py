@@ -1,240 +1,1150 @@
 # -*- coding: utf-8 -*-
 import os
+import re
 import pymongo
+from bson import ObjectId
 from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
 from dotenv import load_dotenv
 
+from core import assets, mongo
+from core.storage import (
+    BANNER_LIST_FIELDS, BULK_ACTIONS, FACET_DIMENSIONS, FACET_LIMIT, SITE_JOB_KIND, SORTABLE_FIELDS, SOV_GROUPINGS,
+    StorageBackend, facet_result,
+)
+
 # .env файлаас тохиргоо унших
 load_dotenv()
 
-# MongoDB Connection String
-# Docker дотор: "mongodb://mongo:27017/banner_db"
-# Local дээр: "mongodb://localhost:27017/banner_db"
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/banner_db")
-
-try:
-    client = pymongo.MongoClient(MONGO_URI)
-    db = client.get_database()
-    print(f"✅ Connected to MongoDB: {MONGO_URI}")
-except Exception as e:
-    print(f"❌ MongoDB Connection Error: {e}")
-    # Fallback for testing without DB (not recommended for production)
-    db = None
-
-# Collections
-if db is not None:
-    banners_col = db["banners"]       # Баннеруудын жагсаалт
-    runs_col = db["runs"]             # Ажиллагааны түүх (Logs)
-    daily_stats_col = db["daily_stats"] # Өдрийн нэгдсэн тоо
-else:
-    banners_col = None
-    runs_col = None
-    daily_stats_col = None
+# Storage backend сонголт: "mongo" (default) эсвэл "sqlite"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mongo").strip().lower()
 
-def upsert_banner(item: dict) -> dict:
-    """
-    Баннерыг хадгалах эсвэл шинэчлэх.
-    - Хэрэв бүртгэлтэй бол: 'last_seen_date' шинэчилнэ.
-    - days_seen: Зөвхөн өөр өдөр харагдсан үед л нэмэгдэнэ.
-    - Хэрэв шинэ бол: Шинээр үүсгэнэ.
-    """
-    if banners_col is None: return {"status": "error", "reason": "no_db"}
-
-    src = item.get("src")
-    site = item.get("site")
-    
-    if not src:
-        return {"status": "skipped", "reason": "no_src"}
-
-    today_str = datetime.now().strftime("%Y-%m-%d")
-
-    # Хайх нөхцөл: Нэг сайт дээрх нэг зураг
-    filter_q = {"src": src, "site": site}
-    
-    # Эхлээд одоо байгаа бичлэгийг шалгах
-    existing = banners_col.find_one(filter_q)
-    
-    if existing:
-        # UPDATE: Бичлэг байгаа
-        update_fields = {
-            "last_seen_date": today_str,
-            "landing_url": item.get("landing_url"),
-            "screenshot_path": item.get("screenshot_path"),
-            "width": item.get("width"),
-            "height": item.get("height"),
-            "updated_at": datetime.utcnow()
+# MongoDB холболтыг core.mongo (lazy, pooled) удирдана.
+# Import хийхэд холбогдохгүй; анхны query дээр л pool үүснэ.
+
+def _parsed_date(field: str) -> dict:
+    """'YYYY-MM-DD' string талбарыг Date болгох expression (алдаатай бол null)."""
+    return _date_expr(f"${field}")
+
+def _date_expr(expr) -> dict:
+    """'YYYY-MM-DD' string expression-ийг Date болгох (алдаатай бол null)."""
+    return {
+        "$dateFromString": {
+            "dateString": expr,
+            "format": "%Y-%m-%d",
+            "onError": None,
+            "onNull": None,
+        }
+    }
+
+# days_seen = (last_seen_date - first_seen_date) + 1.
+# Огноо нь задрахгүй бол ($dateDiff → null) хуучин утгаа хадгална.
+DAYS_SEEN_PIPELINE = [
+    {
+        "$set": {
+            "days_seen": {
+                "$ifNull": [
+                    {
+                        "$add": [
+                            {
+                                "$dateDiff": {
+                                    "startDate": _parsed_date("first_seen_date"),
+                                    "endDate": _parsed_date("last_seen_date"),
+                                    "unit": "day",
+                                }
+                            },
+                            1,
+                        ]
+                    },
+                    "$days_seen",
+                ]
+            }
         }
-        
-        # days_seen: Зөвхөн өөр өдөр бол нэмэгдүүлнэ
-        old_last_seen = existing.get("last_seen_date", "")
-        if old_last_seen != today_str:
-            # Өөр өдөр тул days_seen нэмэгдүүлнэ
-            current_days = existing.get("days_seen", 1) or 1
-            update_fields["days_seen"] = current_days + 1
-        
+    },
+    # Хуучин times_seen талбарыг мөн адил устгана
+    {"$unset": "times_seen"},
+]
+
+
+class MongoBackend(StorageBackend):
+    """MongoDB (pymongo) дээрх хэрэгжүүлэлт."""
+
+    name = "mongo"
+
+    # Collections (core.mongo-гийн нэгдсэн client-ээс lazy авна)
+    @property
+    def banners(self):
+        return mongo.get_collection("banners")       # Баннеруудын жагсаалт
+
+    @property
+    def runs(self):
+        return mongo.get_collection("runs")          # Ажиллагааны түүх (Logs)
+
+    @property
+    def daily_stats(self):
+        return mongo.get_collection("daily_stats")   # Өдрийн нэгдсэн тоо
+
+    @property
+    def admins(self):
+        return mongo.get_collection("admins")        # Dashboard-ийн admin хэрэглэгчид
+
+    @property
+    def jobs(self):
+        return mongo.get_collection("jobs")          # Scrape job-уудын түүх
+
+    @property
+    def job_locks(self):
+        return mongo.get_collection("job_locks")     # kind бүрт нэг lock баримт (queued/running/idle)
+
+    @property
+    def job_events(self):
+        return mongo.get_collection("job_events")    # Worker → web SSE event-үүд
+
+    @property
+    def counters(self):
+        return mongo.get_collection("counters")      # Өсөх дугаарууд (job_events seq)
+
+    @property
+    def site_schedule(self):
+        return mongo.get_collection("site_schedule") # Сайт бүрийн дараагийн scrape хугацаа (_id = site)
+
+    def check_connection(self) -> bool:
+        """DB холболт хэвийн эсэхийг шалгана (cache-тэй ping)"""
+        return mongo.ping()
+
+    def upsert_banner(self, item: dict) -> dict:
+        """
+        Баннерыг хадгалах эсвэл шинэчлэх.
+        - Хэрэв бүртгэлтэй бол: 'last_seen_date' шинэчилнэ.
+        - days_seen: Зөвхөн өөр өдөр харагдсан үед л нэмэгдэнэ.
+        - Хэрэв шинэ бол: Шинээр үүсгэнэ.
+        """
+
+        src = item.get("src")
+        site = item.get("site")
+
+        if not src:
+            return {"status": "skipped", "reason": "no_src"}
+
+        today_str = datetime.now().strftime("%Y-%m-%d")
+
+        # Хайх нөхцөл: Нэг сайт дээрх нэг зураг
+        filter_q = {"src": src, "site": site}
+
+        # Эхлээд одоо байгаа бичлэгийг шалгах
+        existing = self.banners.find_one(filter_q)
+
+        if existing:
+            # UPDATE: Бичлэг байгаа
+            update_fields = {
+                "last_seen_date": today_str,
+                "landing_url": item.get("landing_url"),
+                "brand": self.brand_for(item),
+                "width": item.get("width"),
+                "height": item.get("height"),
+                "size_bucket": self.size_bucket_for(item),
+                "updated_at": datetime.utcnow()
+            }
+
+            # Screenshot амжилтгүй болсон бол хуучин asset-аа хадгална
+            if item.get("asset_id"):
+                update_fields["asset_id"] = item["asset_id"]
+                update_fields["screenshot_path"] = item.get("screenshot_path")
+            if item.get("phash"):
+                update_fields["phash"] = item["phash"]
+
+            # days_seen: Зөвхөн өөр өдөр бол нэмэгдүүлнэ
+            old_last_seen = existing.get("last_seen_date", "")
+            if old_last_seen != today_str:
+                # Өөр өдөр тул days_seen нэмэгдүүлнэ
+                current_days = existing.get("days_seen", 1) or 1
+                update_fields["days_seen"] = current_days + 1
+
+            try:
+                self.banners.update_one(filter_q, {"$set": update_fields})
+                return {"status": "success", "new": False}
+            except Exception as e:
+                print(f"DB Update Error: {e}")
+                return {"status": "error", "error": str(e)}
+        else:
+            # INSERT: Шинэ бичлэг
+            new_doc = {
+                "site": site,
+                "src": src,
+                "first_seen_date": today_str,
+                "last_seen_date": today_str,
+                "days_seen": 1,
+                "landing_url": item.get("landing_url"),
+                "brand": self.brand_for(item),
+                "screenshot_path": item.get("screenshot_path"),
+                "asset_id": item.get("asset_id", ""),
+                "phash": item.get("phash", ""),
+                "width": item.get("width"),
+                "height": item.get("height"),
+                "size_bucket": self.size_bucket_for(item),
+                "ad_score": item.get("ad_score", 0),
+                "ad_reason": item.get("ad_reason", ""),
+                "notes": item.get("notes", ""),
+                "created_at": datetime.utcnow(),
+                "updated_at": datetime.utcnow()
+            }
+
+            try:
+                self.banners.insert_one(new_doc)
+                return {"status": "success", "new": True}
+            except Exception as e:
+                print(f"DB Insert Error: {e}")
+                return {"status": "error", "error": str(e)}
+
+    def save_run(self, record: dict):
+        """
+        Scraper ажиллаж дууссан түүхийг хадгалах (run.py дуудна)
+        """
         try:
-            banners_col.update_one(filter_q, {"$set": update_fields})
-            return {"status": "success", "new": False}
+            self.runs.insert_one(record)
         except Exception as e:
-            print(f"DB Update Error: {e}")
-            return {"status": "error", "error": str(e)}
-    else:
-        # INSERT: Шинэ бичлэг
-        new_doc = {
-            "site": site,
-            "src": src,
-            "first_seen_date": today_str,
-            "last_seen_date": today_str,
-            "days_seen": 1,
-            "landing_url": item.get("landing_url"),
-            "screenshot_path": item.get("screenshot_path"),
-            "width": item.get("width"),
-            "height": item.get("height"),
-            "ad_score": item.get("ad_score", 0),
-            "ad_reason": item.get("ad_reason", ""),
-            "notes": item.get("notes", ""),
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
-        }
-        
+            print(f"Failed to save run log: {e}")
+
+    def start_run(self, record: dict) -> Optional[str]:
         try:
-            banners_col.insert_one(new_doc)
-            return {"status": "success", "new": True}
+            return str(self.runs.insert_one(dict(record)).inserted_id)
         except Exception as e:
-            print(f"DB Insert Error: {e}")
-            return {"status": "error", "error": str(e)}
+            print(f"Failed to save run log: {e}")
+            return None
 
-def save_run(record: dict):
-    """
-    Scraper ажиллаж дууссан түүхийг хадгалах (run.py дуудна)
-    """
-    if runs_col is None: return
-    try:
-        runs_col.insert_one(record)
-    except Exception as e:
-        print(f"Failed to save run log: {e}")
+    def update_run_site(self, run_id: str, site: str, fields: dict):
+        try:
+            self.runs.update_one(
+                {"_id": ObjectId(run_id)},
+                {"$set": {f"sites.{site}.{k}": v for k, v in fields.items()}},
+            )
+        except Exception as e:
+            print(f"Failed to update run site {site}: {e}")
 
-def update_daily_summary(date_key: str, total_collected: int, new_banners: int, per_site: dict):
-    """
-    Өдрийн нэгдсэн статистикийг шинэчлэх
-    """
-    if daily_stats_col is None: return
-    try:
-        daily_stats_col.update_one(
-            {"date": date_key},
+    def finish_run(self, run_id: str, fields: dict):
+        try:
+            self.runs.update_one({"_id": ObjectId(run_id)}, {"$set": fields})
+        except Exception as e:
+            print(f"Failed to save run log: {e}")
+
+    def list_unfinished_runs(self) -> List[dict]:
+        runs = []
+        for doc in self.runs.find({"status": "running"}).sort("timestamp", pymongo.DESCENDING):
+            doc["run_id"] = str(doc.pop("_id"))
+            runs.append(doc)
+        return runs
+
+    def get_run_status(self, run_id: str) -> Optional[str]:
+        try:
+            doc = self.runs.find_one({"_id": ObjectId(run_id)}, {"status": 1})
+        except Exception:
+            return None
+        return doc.get("status") if doc else None
+
+    def update_daily_summary(self, date_key: str, total_collected: int, new_banners: int, per_site: dict):
+        """
+        Өдрийн нэгдсэн статистикт run-ий дүнг нэмэх (уншиж бичихгүй — нэг $inc)
+        """
+        try:
+            counts = {"total_collected": total_collected, "new_banners": new_banners}
+            counts.update({f"per_site.{site}": n for site, n in (per_site or {}).items()})
+            self.daily_stats.update_one(
+                {"date": date_key},
+                {
+                    "$inc": counts,
+                    "$set": {"last_updated": datetime.utcnow()}
+                },
+                upsert=True
+            )
+        except Exception as e:
+            print(f"Failed to update daily stats: {e}")
+
+    def get_stats(self) -> dict:
+        """
+        Web UI (server.py)-д зориулсан ерөнхий статистик
+        """
+        try:
+            total_banners = self.banners.count_documents({})
+
+            # Сүүлийн run
+            last_run = self.runs.find_one(sort=[("timestamp", -1)])
+            last_run_time = last_run.get("timestamp") if last_run else "Never"
+
+            # Өнөөдрийн тоо
+            today_str = datetime.now().strftime("%Y-%m-%d")
+            today_stat = self.daily_stats.find_one({"date": today_str})
+            today_collected = today_stat.get("total_collected", 0) if today_stat else 0
+
+            return {
+                "total_banners": total_banners,
+                "last_run": last_run_time,
+                "today_collected": today_collected
+            }
+        except Exception as e:
+            return {"error": str(e)}
+
+    def archive_single_banner(self, site: str, src: str) -> bool:
+        """
+        Тодорхой нэг зарыг (site + src хослолоор) олж
+        Dashboard-оос нуух (is_archived=True).
+        """
+        try:
+            res = self.banners.update_one(
+                {"site": site, "src": src},
+                {"$set": {"is_archived": True, "status": "MANUAL_HIDDEN", "updated_at": datetime.utcnow()}}
+            )
+            return res.modified_count > 0
+        except Exception as e:
+            print(f"Archive Single Error: {e}")
+            return False
+
+    def archive_old_banners(self, days_threshold: int = 7) -> int:
+        """
+        Сүүлийн 'days_threshold' хоногт харагдаагүй заруудыг 'is_archived=True' болгоно.
+        """
+        cutoff_date = (datetime.now() - timedelta(days=days_threshold)).strftime("%Y-%m-%d")
+
+        try:
+            # Delete биш Update хийнэ
+            result = self.banners.update_many(
+                {"last_seen_date": {"$lt": cutoff_date}, "is_archived": {"$ne": True}},
+                {"$set": {"is_archived": True, "status": "ARCHIVED", "updated_at": datetime.utcnow()}}
+            )
+            return result.modified_count
+        except Exception as e:
+            print(f"Archive Error: {e}")
+            return 0
+
+    def recalculate_days_seen(self) -> int:
+        """
+        Бүх баннеруудын days_seen-ийг first_seen_date болон last_seen_date-аас дахин тооцоолох.
+        Python-д нэг нэгээр нь уншихгүй: нэг update_many (aggregation pipeline update)
+        DB дотор ажиллаж, times_seen талбарыг давхар цэвэрлэнэ.
+        Буцаах утга: өөрчлөгдсөн баримтын тоо (modified_count).
+        """
+        try:
+            # Зөвхөн days_seen нь өөрчлөгдсөн баримтын updated_at-ийг шинэчилнэ (incremental тайланд).
+            # $$NOW (DB серверийн цаг) биш: updated_at бүгд апп-ын нэг цагаас ирнэ (тайлангийн watermark)
+            pipeline = [{"$set": {"_prev_days_seen": "$days_seen"}}] + DAYS_SEEN_PIPELINE + [
+                {"$set": {"updated_at": {"$cond": [
+                    {"$eq": ["$_prev_days_seen", "$days_seen"]}, "$updated_at", datetime.utcnow()
+                ]}}},
+                {"$unset": "_prev_days_seen"},
+            ]
+            result = self.banners.update_many({}, pipeline)
+            print(f"✅ Recalculated days_seen for {result.modified_count} banners")
+            return result.modified_count
+        except Exception as e:
+            print(f"Recalculate Error: {e}")
+            return 0
+
+    def backfill_asset_ids(self, resolve: Callable[[str], Optional[str]]) -> int:
+        missing = {"$or": [{"asset_id": {"$exists": False}}, {"asset_id": ""}, {"asset_id": None}]}
+        ops, updated = [], 0
+        for doc in self.banners.find(missing, {"_id": 1, "screenshot_path": 1}):
+            asset_id = resolve(doc.get("screenshot_path") or "")
+            if not asset_id:
+                continue
+            ops.append(pymongo.UpdateOne(
+                {"_id": doc["_id"]},
+                {"$set": {"asset_id": asset_id, "screenshot_path": assets.screenshot_path_for(asset_id),
+                          "updated_at": datetime.utcnow()}}
+            ))
+            if len(ops) >= 1000:
+                updated += self.banners.bulk_write(ops, ordered=False).modified_count
+                ops = []
+        if ops:
+            updated += self.banners.bulk_write(ops, ordered=False).modified_count
+        return updated
+
+    def backfill_brands(self) -> int:
+        missing = {"$or": [{"brand": {"$exists": False}}, {"brand": None}]}
+        ops, updated = [], 0
+        for doc in self.banners.find(missing, {"_id": 1, "landing_url": 1, "src": 1}):
+            ops.append(pymongo.UpdateOne({"_id": doc["_id"]}, {"$set": {"brand": self.brand_for(doc), "updated_at": datetime.utcnow()}}))
+            if len(ops) >= 1000:
+                updated += self.banners.bulk_write(ops, ordered=False).modified_count
+                ops = []
+        if ops:
+            updated += self.banners.bulk_write(ops, ordered=False).modified_count
+        return updated
+
+    def backfill_size_buckets(self) -> int:
+        missing = {"$or": [{"size_bucket": {"$exists": False}}, {"size_bucket": None}]}
+        ops, updated = [], 0
+        for doc in self.banners.find(missing, {"_id": 1, "width": 1, "height": 1}):
+            ops.append(pymongo.UpdateOne({"_id": doc["_id"]}, {"$set": {"size_bucket": self.size_bucket_for(doc), "updated_at": datetime.utcnow()}}))
+            if len(ops) >= 1000:
+                updated += self.banners.bulk_write(ops, ordered=False).modified_count
+                ops = []
+        if ops:
+            updated += self.banners.bulk_write(ops, ordered=False).modified_count
+        return updated
+
+    def find_banners(self, start_date: str = "", end_date: str = "") -> List[dict]:
+        # Үндсэн query: Нуугдсан (hidden=True) заруудыг харуулахгүй
+        query = {"hidden": {"$ne": True}}
+
+        # first_seen_date-ээр шүүх
+        if start_date or end_date:
+            date_filter = {}
+            if start_date:
+                date_filter["$gte"] = start_date
+            if end_date:
+                date_filter["$lte"] = end_date
+            query["first_seen_date"] = date_filter
+
+        return list(self.banners.find(query, {"_id": 0}).sort("last_seen_date", -1))
+
+    def ensure_indexes(self):
+        try:
+            self.banners.create_index([("hidden", 1), ("last_seen_date", -1), ("_id", -1)])
+            self.banners.create_index([("first_seen_date", 1)])
+            self.banners.create_index([("site", 1), ("src", 1)])
+            # Facet шүүлтүүрүүд (хэмжигдэхүүн + огнооны муж)
+            self.banners.create_index([("site", 1), ("first_seen_date", 1)])
+            self.banners.create_index([("brand", 1), ("first_seen_date", 1)])
+            self.banners.create_index([("size_bucket", 1), ("first_seen_date", 1)])
+            self.banners.create_index([("ad_score", 1)])
+            self.banners.create_index([("updated_at", 1)])
+            self.daily_stats.create_index([("date", 1)])   # SOV presence-ийн rollup $lookup
+            self.job_events.create_index([("seq", 1)])
+            # Site job-ийн claim (kind+status+available_at) ба run-ий job-уудыг жагсаах
+            self.jobs.create_index([("kind", 1), ("status", 1), ("priority", -1), ("available_at", 1)])
+            self.jobs.create_index([("run_id", 1)])
+            # Хуучин event-үүдийг 2 хоногийн дараа Mongo өөрөө устгана
+            self.job_events.create_index([("created_at", 1)], expireAfterSeconds=2 * 86400)
+        except Exception as e:
+            print(f"Index Error: {e}")
+
+    @staticmethod
+    def _dimension_query(filters: dict) -> dict:
+        """Facet хэмжигдэхүүн тус бүрийн нөхцөл: {"site": {...}, "brand": {...}, ...}"""
+        conds = {}
+        if filters.get("site"):
+            conds["site"] = {"site": filters["site"]}
+        if filters.get("brand"):
+            conds["brand"] = {"brand": filters["brand"]}
+        if filters.get("size") == "unknown":
+            # migrate хийгдээгүй (size_bucket-гүй) баннерууд ч энд орно
+            conds["size"] = {"size_bucket": {"$in": ["unknown", None]}}
+        elif filters.get("size"):
+            conds["size"] = {"size_bucket": filters["size"]}
+
+        # Төлөв: өнөөдөр харагдсан = идэвхтэй
+        today = filters.get("today")
+        if today and filters.get("status") == "active":
+            conds["status"] = {"last_seen_date": today}
+        elif today and filters.get("status") == "ended":
+            conds["status"] = {"last_seen_date": {"$ne": today}}
+        return conds
+
+    @classmethod
+    def _list_query(cls, filters: dict, exclude=()) -> dict:
+        query = {"hidden": {"$ne": True}}
+
+        date_filter = {}
+        if filters.get("start"):
+            date_filter["$gte"] = filters["start"]
+        if filters.get("end"):
+            date_filter["$lte"] = filters["end"]
+        if date_filter:
+            query["first_seen_date"] = date_filter
+
+        score_filter = {}
+        if filters.get("score_min") is not None:
+            score_filter["$gte"] = filters["score_min"]
+        if filters.get("score_max") is not None:
+            score_filter["$lte"] = filters["score_max"]
+        if score_filter:
+            query["ad_score"] = score_filter
+
+        if filters.get("q"):
+            rx = {"$regex": re.escape(filters["q"]), "$options": "i"}
+            query["$or"] = [{"site": rx}, {"brand": rx}, {"landing_url": rx}, {"src": rx}]
+
+        for key, cond in cls._dimension_query(filters).items():
+            if key not in exclude:
+                query.update(cond)
+        return query
+
+    @staticmethod
+    def _after_query(sort: str, direction: int, after: dict) -> dict:
+        """
+        (sort, _id) keyset нөхцөл. null/байхгүй утга нь буурахад хамгийн сүүлд,
+        өсөхөд хамгийн эхэнд ирдэг тул тэдгээрийг тусад нь авч үзнэ.
+        """
+        value = after.get("v")
+        last_id = ObjectId(after["id"])
+        op = "$lt" if direction < 0 else "$gt"
+        if value is None:
+            same = {sort: None, "_id": {op: last_id}}
+            return same if direction < 0 else {"$or": [{sort: {"$ne": None}}, same]}
+        clauses = [{sort: {op: value}}, {sort: value, "_id": {op: last_id}}]
+        if direction < 0:
+            clauses.append({sort: None})
+        return {"$or": clauses}
+
+    def list_banners_page(self, filters: dict, sort: str = "last_seen_date", direction: int = -1,
+                          limit: int = 100, after: Optional[dict] = None) -> Tuple[List[dict], Optional[dict]]:
+        if sort not in SORTABLE_FIELDS:
+            sort = "last_seen_date"
+        direction = -1 if direction < 0 else 1
+
+        query = self._list_query(filters)
+        if after:
+            query = {"$and": [query, self._after_query(sort, direction, after)]}
+
+        projection = {f: 1 for f in BANNER_LIST_FIELDS}
+        cursor = (
+            self.banners.find(query, projection)
+            .sort([(sort, direction), ("_id", direction)])
+            .limit(limit + 1)
+        )
+        docs = list(cursor)
+
+        next_after = None
+        if len(docs) > limit:
+            docs = docs[:limit]
+            next_after = {"v": docs[-1].get(sort), "id": str(docs[-1]["_id"])}
+        for d in docs:
+            d["id"] = str(d.pop("_id"))
+        return docs, next_after
+
+    def iter_banners(self, filters: dict, fields: Sequence[str] = BANNER_LIST_FIELDS, sort: str = "last_seen_date",
+                     direction: int = -1, batch_size: int = 1000) -> Iterator[dict]:
+        if sort not in SORTABLE_FIELDS:
+            sort = "last_seen_date"
+        projection = {"_id": 0, **{f: 1 for f in fields}}
+        cursor = (
+            self.banners.find(self._list_query(filters), projection)
+            .sort([(sort, direction), ("_id", direction)])
+            .batch_size(batch_size)
+        )
+        try:
+            yield from cursor
+        finally:
+            cursor.close()
+
+    def list_sites(self) -> List[str]:
+        return sorted(s for s in self.banners.distinct("site", {"hidden": {"$ne": True}}) if s)
+
+    def banner_facets(self, filters: dict, limit: int = FACET_LIMIT) -> dict:
+        # Нэг aggregation: нийтлэг нөхцөлөөр $match хийгээд facet бүр бусад хэмжигдэхүүнээр нэмж шүүнэ
+        dims = self._dimension_query(filters)
+
+        def others(skip):
+            conds = [c for k, c in dims.items() if k != skip]
+            return {"$and": conds} if conds else {}
+
+        def group(field, skip, top=None):
+            stages = [
+                {"$match": others(skip)},
+                {"$group": {"_id": f"${field}", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1, "_id": 1}},
+            ]
+            return stages + ([{"$limit": top}] if top else [])
+
+        today = filters.get("today") or datetime.now().strftime("%Y-%m-%d")
+        pipeline = [
+            {"$match": self._list_query(filters, exclude=FACET_DIMENSIONS)},
+            {"$facet": {
+                "site": group("site", "site", limit),
+                "brand": group("brand", "brand", limit),
+                "size": group("size_bucket", "size"),
+                "status": [
+                    {"$match": others("status")},
+                    {"$group": {"_id": {"$eq": ["$last_seen_date", today]}, "count": {"$sum": 1}}},
+                ],
+                "total": [
+                    {"$match": others(None)},
+                    {"$group": {"_id": None, "count": {"$sum": 1},
+                                "score_min": {"$min": "$ad_score"}, "score_max": {"$max": "$ad_score"}}},
+                ],
+            }},
+        ]
+        res = next(self.banners.aggregate(pipeline), {})
+        total = (res.get("total") or [{}])[0]
+        status = {"active": 0, "ended": 0}
+        for r in res.get("status", []):
+            status["active" if r["_id"] else "ended"] += r["count"]
+        return facet_result(
+            total.get("count", 0), total.get("score_min"), total.get("score_max"),
+            [(r["_id"], r["count"]) for r in res.get("site", [])],
+            [(r["_id"], r["count"]) for r in res.get("brand", [])],
+            [(r["_id"], r["count"]) for r in res.get("size", [])],
+            status,
+        )
+
+    @staticmethod
+    def _active_window(start: str, end: str, site: str = "") -> list:
+        """
+        [start, end] цонхонд идэвхтэй баннерууд: {site, brand, from (Date), days}.
+        Идэвхтэй муж = first_seen_date..last_seen_date ∩ цонх; задрахгүй огноотой нь хасагдана.
+        """
+        match = {"hidden": {"$ne": True}, "first_seen_date": {"$lte": end}, "last_seen_date": {"$gte": start}}
+        if site:
+            match["site"] = site
+        day_from = _date_expr({"$max": ["$first_seen_date", start]})
+        day_to = _date_expr({"$min": ["$last_seen_date", end]})
+        return [
+            {"$match": match},
+            {"$project": {
+                "_id": 0,
+                "site": 1,
+                "brand": {"$ifNull": ["$brand", ""]},
+                "from": day_from,
+                "days": {"$ifNull": [
+                    {"$add": [{"$dateDiff": {"startDate": day_from, "endDate": day_to, "unit": "day"}}, 1]}, 0,
+                ]},
+            }},
+            {"$match": {"days": {"$gt": 0}}},
+        ]
+
+    def brand_presence(self, start: str, end: str, site: str = "") -> List[dict]:
+        # Баннер бүрийг идэвхтэй өдрүүдээр нь задлаад (өдөр, сайт, брэнд)-ээр тоолно;
+        # collected-ийг daily_stats rollup-аас тухайн өдөр/сайтаар нь join хийнэ
+        pipeline = self._active_window(start, end, site) + [
+            {"$set": {"day": {"$map": {
+                "input": {"$range": [0, "$days"]},
+                "as": "i",
+                "in": {"$dateToString": {
+                    "format": "%Y-%m-%d", "date": {"$add": ["$from", {"$multiply": ["$$i", 86400000]}]},
+                }},
+            }}}},
+            {"$unwind": "$day"},
+            {"$group": {"_id": {"date": "$day", "site": "$site", "brand": "$brand"}, "banners": {"$sum": 1}}},
+            {"$group": {
+                "_id": {"date": "$_id.date", "site": "$_id.site"},
+                "site_banners": {"$sum": "$banners"},
+                "brands": {"$push": {"brand": "$_id.brand", "banners": "$banners"}},
+            }},
+            {"$lookup": {"from": "daily_stats", "localField": "_id.date", "foreignField": "date", "as": "rollup"}},
+            {"$unwind": "$brands"},
+            {"$project": {
+                "_id": 0,
+                "date": "$_id.date",
+                "site": "$_id.site",
+                "brand": "$brands.brand",
+                "banners": "$brands.banners",
+                "site_banners": 1,
+                "share": {"$divide": ["$brands.banners", "$site_banners"]},
+                "collected": {"$first": {"$map": {
+                    "input": {"$filter": {
+                        "input": {"$objectToArray": {"$ifNull": [{"$first": "$rollup.per_site"}, {}]}},
+                        "cond": {"$eq": ["$$this.k", "$_id.site"]},
+                    }},
+                    "in": "$$this.v",
+                }}},
+            }},
+            {"$sort": {"date": 1, "site": 1, "banners": -1, "brand": 1}},
+        ]
+        rows = list(self.banners.aggregate(pipeline, allowDiskUse=True))
+        for r in rows:
+            r.setdefault("collected", None)
+        return rows
+
+    def share_of_voice(self, start: str, end: str, by: str = "site", site: str = "") -> List[dict]:
+        if by not in SOV_GROUPINGS:
+            raise ValueError(f"unknown grouping: {by}")
+        pipeline = self._active_window(start, end, site) + [
+            {"$group": {
+                "_id": {"site": "$site" if by == "site" else None, "brand": "$brand"},
+                "banners": {"$sum": 1},
+                "banner_days": {"$sum": "$days"},
+            }},
+            {"$group": {
+                "_id": "$_id.site",
+                "total": {"$sum": "$banner_days"},
+                "brands": {"$push": {"brand": "$_id.brand", "banners": "$banners", "banner_days": "$banner_days"}},
+            }},
+            {"$unwind": "$brands"},
+            {"$project": {
+                "_id": 0,
+                "site": "$_id",
+                "brand": "$brands.brand",
+                "banners": "$brands.banners",
+                "banner_days": "$brands.banner_days",
+                "share": {"$divide": ["$brands.banner_days", "$total"]},
+            }},
+            {"$sort": {"site": 1, "banner_days": -1, "brand": 1}},
+        ]
+        return list(self.banners.aggregate(pipeline, allowDiskUse=True))
+
+    def fetch_all_banners(self) -> List[dict]:
+        # _id талбарыг хасч татах
+        return list(self.banners.find({}, {"_id": 0}))
+
+    def fetch_banners_since(self, updated_since: str) -> List[dict]:
+        since = datetime.fromisoformat(updated_since)
+        return list(self.banners.find({"updated_at": {"$gte": since}}, {"_id": 0}))
+
+    def list_banner_keys(self) -> List[Tuple[str, str]]:
+        return [(d.get("site"), d.get("src")) for d in self.banners.find({}, {"_id": 0, "site": 1, "src": 1})]
+
+    def hide_banner(self, site: str, src: str) -> bool:
+        res = self.banners.update_one({"src": src, "site": site}, {"$set": {"hidden": True, "updated_at": datetime.utcnow()}})
+        return res.matched_count > 0
+
+    def hide_banners_before(self, cutoff_date: str) -> int:
+        result = self.banners.update_many(
+            {"last_seen_date": {"$lt": cutoff_date}, "hidden": {"$ne": True}},
+            {"$set": {"hidden": True, "updated_at": datetime.utcnow()}}
+        )
+        return result.modified_count
+
+    def delete_banner(self, site: str, src: str) -> bool:
+        res = self.banners.delete_one({"src": src, "site": site})
+        return res.deleted_count > 0
+
+    _BULK_UPDATES = {
+        "hide": {"hidden": True},
+        "archive": {"hidden": True, "is_archived": True, "status": "MANUAL_HIDDEN"},
+    }
+
+    def _bulk_apply(self, action: str, query: dict) -> int:
+        if action not in BULK_ACTIONS:
+            raise ValueError(f"unknown action: {action}")
+        if action == "delete":
+            return self.banners.delete_many(query).deleted_count
+        update = {"$set": {**self._BULK_UPDATES[action], "updated_at": datetime.utcnow()}}
+        return self.banners.update_many(query, update).matched_count
+
+    def bulk_moderate_ids(self, action: str, ids: Sequence[str]) -> Dict[str, bool]:
+        oids = {}
+        for i in ids:
+            try:
+                oids[i] = ObjectId(i)
+            except Exception:
+                pass
+        # Олдсон id-нуудыг нэг уншилтаар тогтоогоод нэг update_many/delete_many
+        found = {d["_id"] for d in self.banners.find({"_id": {"$in": list(oids.values())}}, {"_id": 1})}
+        if found:
+            self._bulk_apply(action, {"_id": {"$in": list(found)}})
+        return {i: oids.get(i) in found for i in ids}
+
+    def bulk_moderate_filter(self, action: str, filters: dict) -> int:
+        query = self._list_query(filters)
+        # Зөвхөн hidden нөхцөлтэй бол шүүлтүүр огт хэрэгжээгүй (буруу утгууд хаягдсан) гэсэн үг
+        if set(query) == {"hidden"}:
+            raise ValueError("filters required")
+        return self._bulk_apply(action, query)
+
+    # ---------------- Jobs ----------------
+    def request_job(self, kind: str, source: str, stale_sec: float,
+                    sites: Optional[List[str]] = None) -> Optional[dict]:
+        now = datetime.utcnow()
+        job_id = ObjectId()
+        try:
+            # Lock idle эсвэл heartbeat нь хуучирсан үед л авна; бусад үед upsert нь
+            # _id давхардлаар унаж "busy" гэсэн үг (хоёр процесс зэрэг авч чадахгүй)
+            previous = self.job_locks.find_one_and_update(
+                {"_id": kind, "$or": [{"state": "idle"}, {"heartbeat_at": {"$lt": now - timedelta(seconds=stale_sec)}}]},
+                {"$set": {"state": "queued", "job_id": str(job_id), "source": source, "sites": sites, "worker": None,
+                          "heartbeat_at": now, "event_seq_start": None, "pending": False, "progress": None}},
+                upsert=True,
+            )
+        except pymongo.errors.DuplicateKeyError:
+            return None
+
+        if previous and previous.get("state") != "idle" and previous.get("job_id"):
+            # Хариу өгөхөө больсон worker-ийн job
+            self.jobs.update_one(
+                {"_id": ObjectId(previous["job_id"]), "status": {"$in": ["queued", "running"]}},
+                {"$set": {"status": "abandoned", "finished_at": now}}
+            )
+
+        self.jobs.insert_one({"_id": job_id, "kind": kind, "source": source, "sites": sites, "status": "queued",
+                              "requested_at": now})
+        return {"job_id": str(job_id), "kind": kind, "source": source, "sites": sites}
+
+    def claim_job(self, kind: str, worker: str, event_seq_start: int = 0) -> Optional[dict]:
+        now = datetime.utcnow()
+        lock = self.job_locks.find_one_and_update(
+            {"_id": kind, "state": "queued"},
+            {"$set": {"state": "running", "worker": worker, "heartbeat_at": now, "event_seq_start": event_seq_start}},
+            return_document=pymongo.ReturnDocument.AFTER,
+        )
+        if not lock:
+            return None
+        self.jobs.update_one(
+            {"_id": ObjectId(lock["job_id"])},
+            {"$set": {"status": "running", "worker": worker, "started_at": now}}
+        )
+        return {"job_id": lock["job_id"], "kind": kind, "source": lock.get("source"), "sites": lock.get("sites")}
+
+    def heartbeat_job(self, kind: str, job_id: str, progress: Optional[str] = None) -> bool:
+        update = {"heartbeat_at": datetime.utcnow()}
+        if progress is not None:
+            update["progress"] = progress
+        res = self.job_locks.update_one({"_id": kind, "job_id": job_id, "state": "running"}, {"$set": update})
+        return res.matched_count > 0
+
+    def defer_job(self, kind: str) -> bool:
+        res = self.job_locks.update_one({"_id": kind, "state": "running"}, {"$set": {"pending": True}})
+        return res.matched_count > 0
+
+    def finish_job(self, kind: str, job_id: str, status: str, error: Optional[str] = None,
+                   result: Optional[dict] = None):
+        now = datetime.utcnow()
+        self.jobs.update_one(
+            {"_id": ObjectId(job_id)},
+            {"$set": {"status": status, "finished_at": now, "error": error, "result": result}}
+        )
+        self.job_locks.update_one(
+            {"_id": kind, "job_id": job_id},
+            {"$set": {"state": "idle", "heartbeat_at": now}}
+        )
+
+    def get_job_state(self, kind: str, stale_sec: float) -> dict:
+        lock = self.job_locks.find_one({"_id": kind}) or {}
+        state = lock.get("state", "idle")
+        fresh = bool(lock.get("heartbeat_at")) and \
+            lock["heartbeat_at"] >= datetime.utcnow() - timedelta(seconds=stale_sec)
+        return {
+            "running": state in ("queued", "running") and fresh,
+            "state": state,
+            "job_id": lock.get("job_id"),
+            "source": lock.get("source"),
+            "event_seq_start": lock.get("event_seq_start"),
+            "pending": bool(lock.get("pending")),
+            "progress": lock.get("progress"),
+        }
+
+    # ---------------- Site jobs (lease queue) ----------------
+    @staticmethod
+    def _site_job(doc: dict) -> dict:
+        return {
+            "job_id": str(doc["_id"]), "run_id": doc.get("run_id"), "site": doc.get("site"),
+            "status": doc.get("status"), "worker": doc.get("worker"), "attempts": doc.get("attempts", 0),
+            "max_attempts": doc.get("max_attempts", 1), "priority": doc.get("priority", 0),
+            "error": doc.get("error"), "result": doc.get("result"),
+        }
+
+    def enqueue_site_jobs(self, run_id: str, sites: Sequence[dict]) -> List[str]:
+        now = datetime.utcnow()
+        docs = [{
+            "_id": ObjectId(), "kind": SITE_JOB_KIND, "source": run_id, "run_id": run_id, "site": s["site"],
+            "status": "queued", "attempts": 0, "max_attempts": int(s.get("max_attempts", 1)),
+            "priority": int(s.get("priority", 0)), "requested_at": now, "available_at": now,
+            "worker": None, "lease_expires_at": None,
+        } for s in sites]
+        if docs:
+            self.jobs.insert_many(docs)
+        return [str(d["_id"]) for d in docs]
+
+    def claim_site_job(self, worker: str, lease_sec: float) -> Optional[dict]:
+        now = datetime.utcnow()
+        # Хаагдсан (дууссан/тасалсан) run-ий job-ийг авахгүй
+        open_runs = [str(d["_id"]) for d in self.runs.find({"status": "running"}, {"_id": 1})]
+        doc = self.jobs.find_one_and_update(
             {
-                "$set": {
-                    "total_collected": total_collected,
-                    "new_banners": new_banners,
-                    "per_site": per_site,
-                    "last_updated": datetime.utcnow()
-                }
+                "kind": SITE_JOB_KIND,
+                "run_id": {"$in": open_runs},
+                "$or": [
+                    {"status": "queued", "available_at": {"$lte": now}},
+                    {"status": "running", "lease_expires_at": {"$lt": now}},   # унасан node-ийн job
+                ],
+                "$expr": {"$lt": ["$attempts", "$max_attempts"]},
             },
-            upsert=True
+            {"$set": {"status": "running", "worker": worker, "started_at": now, "heartbeat_at": now,
+                      "lease_expires_at": now + timedelta(seconds=lease_sec)},
+             "$inc": {"attempts": 1}},
+            sort=[("priority", -1), ("available_at", 1)],
+            return_document=pymongo.ReturnDocument.AFTER,
         )
-    except Exception as e:
-        print(f"Failed to update daily stats: {e}")
-        
+        return self._site_job(doc) if doc else None
+
+    def renew_site_lease(self, job_id: str, worker: str, lease_sec: float) -> bool:
+        now = datetime.utcnow()
+        res = self.jobs.update_one(
+            {"_id": ObjectId(job_id), "worker": worker, "status": "running"},
+            {"$set": {"heartbeat_at": now, "lease_expires_at": now + timedelta(seconds=lease_sec)}},
+        )
+        return res.matched_count > 0
+
+    def finish_site_job(self, job_id: str, worker: str, status: str, error: Optional[str] = None,
+                        result: Optional[dict] = None, retry_delay: float = 0) -> Optional[str]:
+        now = datetime.utcnow()
+        owned = {"_id": ObjectId(job_id), "worker": worker, "status": "running"}
+        if status == "failed":
+            # Оролдлого үлдсэн бол дахин дараалалд
+            res = self.jobs.update_one(
+                dict(owned, **{"$expr": {"$lt": ["$attempts", "$max_attempts"]}}),
+                {"$set": {"status": "queued", "worker": None, "lease_expires_at": None, "error": error,
+                          "result": result, "available_at": now + timedelta(seconds=retry_delay)}},
+            )
+            if res.matched_count:
+                return "queued"
+        res = self.jobs.update_one(
+            owned,
+            {"$set": {"status": status, "finished_at": now, "error": error, "result": result,
+                      "lease_expires_at": None}},
+        )
+        return status if res.matched_count else None
+
+    def get_site_job(self, job_id: str) -> Optional[dict]:
+        try:
+            doc = self.jobs.find_one({"_id": ObjectId(job_id), "kind": SITE_JOB_KIND})
+        except Exception:
+            return None
+        return self._site_job(doc) if doc else None
+
+    def list_site_jobs(self, run_id: str) -> List[dict]:
+        return [self._site_job(d) for d in self.jobs.find({"kind": SITE_JOB_KIND, "run_id": run_id}).sort("site", 1)]
+
+    def expire_site_jobs(self) -> int:
+        now = datetime.utcnow()
+        res = self.jobs.update_many(
+            {"kind": SITE_JOB_KIND, "status": "running", "lease_expires_at": {"$lt": now},
+             "$expr": {"$gte": ["$attempts", "$max_attempts"]}},
+            {"$set": {"status": "failed", "finished_at": now, "error": "lease expired", "lease_expires_at": None}},
+        )
+        return res.modified_count
+
+    def abandon_site_jobs(self, run_id: str, error: str) -> int:
+        res = self.jobs.update_many(
+            {"kind": SITE_JOB_KIND, "run_id": run_id, "status": {"$in": ["queued", "running"]}},
+            {"$set": {"status": "failed", "finished_at": datetime.utcnow(), "error": error,
+                      "lease_expires_at": None}},
+        )
+        return res.modified_count
+
+    # ---------------- Job events ----------------
+    def append_event(self, event_type: str, data: dict) -> int:
+        counter = self.counters.find_one_and_update(
+            {"_id": "job_events"}, {"$inc": {"seq": 1}},
+            upsert=True, return_document=pymongo.ReturnDocument.AFTER,
+        )
+        seq = counter["seq"]
+        self.job_events.insert_one({"seq": seq, "type": event_type, "data": data, "created_at": datetime.utcnow()})
+        return seq
+
+    def events_since(self, seq: int, limit: int = 500) -> List[dict]:
+        cursor = self.job_events.find({"seq": {"$gt": seq}}, {"_id": 0, "created_at": 0}).sort("seq", 1).limit(limit)
+        return list(cursor)
+
+    def latest_event_seq(self) -> int:
+        counter = self.counters.find_one({"_id": "job_events"})
+        return counter.get("seq", 0) if counter else 0
+
+    # ---------------- Site schedule ----------------
+    def get_site_due(self) -> Dict[str, float]:
+        return {doc["_id"]: doc["due_at"] for doc in self.site_schedule.find({})}
+
+    def set_site_due(self, site: str, due_at: float, expected: Optional[float] = None) -> bool:
+        if expected is None:
+            try:
+                self.site_schedule.insert_one({"_id": site, "due_at": due_at})
+                return True
+            except pymongo.errors.DuplicateKeyError:
+                return False
+        res = self.site_schedule.update_one({"_id": site, "due_at": expected}, {"$set": {"due_at": due_at}})
+        return res.matched_count > 0
+
+    def get_admin(self, username: str) -> Optional[Dict]:
+        return self.admins.find_one({"username": username})
+
+    def create_admin(self, username: str, password_hash: str) -> bool:
+        if self.admins.find_one({"username": username}):
+            return False
+        self.admins.insert_one({
+            "username": username,
+            "password_hash": password_hash,
+            "created_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow()
+        })
+        return True
+
+    def update_admin_password(self, username: str, password_hash: str) -> bool:
+        result = self.admins.update_one(
+            {"username": username},
+            {"$set": {"password_hash": password_hash, "updated_at": datetime.utcnow()}}
+        )
+        return result.modified_count > 0
+
+
+# =====================================================
+# BACKEND СОНГОЛТ + НИЙТИЙН API
+# =====================================================
+
+_backend: Optional[StorageBackend] = None
+
+def get_backend() -> StorageBackend:
+    """STORAGE_BACKEND-ээс хамаарч идэвхтэй backend-ийг буцаана (нэг удаа үүсгэнэ)."""
+    global _backend
+    if _backend is None:
+        if STORAGE_BACKEND == "sqlite":
+            from core.sqlite_db import SQLiteBackend
+            _backend = SQLiteBackend()
+        else:
+            _backend = MongoBackend()
+    return _backend
+
+def upsert_banner(item: dict) -> dict:
+    return get_backend().upsert_banner(item)
+
+def upsert_banners(items: List[dict]) -> List[dict]:
+    return get_backend().upsert_banners(items)
+
+def save_run(record: dict):
+    return get_backend().save_run(record)
+
+def start_run(record: dict) -> Optional[str]:
+    return get_backend().start_run(record)
+
+def update_run_site(run_id: str, site: str, fields: dict):
+    return get_backend().update_run_site(run_id, site, fields)
+
+def finish_run(run_id: str, fields: dict):
+    return get_backend().finish_run(run_id, fields)
+
+def list_unfinished_runs() -> List[dict]:
+    return get_backend().list_unfinished_runs()
+
+def get_run_status(run_id: str) -> Optional[str]:
+    return get_backend().get_run_status(run_id)
+
+def update_daily_summary(date_key: str, total_collected: int, new_banners: int, per_site: dict):
+    return get_backend().update_daily_summary(date_key, total_collected, new_banners, per_site)
 
 def get_stats() -> dict:
-    """
-    Web UI (server.py)-д зориулсан ерөнхий статистик
-    """
-    if banners_col is None: 
-        return {"error": "No DB Connection"}
-
-    try:
-        total_banners = banners_col.count_documents({})
-        
-        # Сүүлийн run
-        last_run = runs_col.find_one(sort=[("timestamp", -1)])
-        last_run_time = last_run.get("timestamp") if last_run else "Never"
-        
-        # Өнөөдрийн тоо
-        today_str = datetime.now().strftime("%Y-%m-%d")
-        today_stat = daily_stats_col.find_one({"date": today_str})
-        today_collected = today_stat.get("total_collected", 0) if today_stat else 0
+    return get_backend().get_stats()
 
-        return {
-            "total_banners": total_banners,
-            "last_run": last_run_time,
-            "today_collected": today_collected
-        }
-    except Exception as e:
-        return {"error": str(e)}
-    
 def check_connection() -> bool:
-    """DB холболт хэвийн эсэхийг шалгана"""
-    return banners_col is not None
-
-# db.py файлын хамгийн төгсгөлд:
+    return get_backend().check_connection()
 
 def archive_single_banner(site: str, src: str) -> bool:
-    """
-    Тодорхой нэг зарыг (site + src хослолоор) олж
-    Dashboard-оос нуух (is_archived=True).
-    """
-    if banners_col is None: return False
-    try:
-        res = banners_col.update_one(
-            {"site": site, "src": src},
-            {"$set": {"is_archived": True, "status": "MANUAL_HIDDEN"}}
-        )
-        return res.modified_count > 0
-    except Exception as e:
-        print(f"Archive Single Error: {e}")
-        return False
+    return get_backend().archive_single_banner(site, src)
 
 def archive_old_banners(days_threshold: int = 7) -> int:
-    """
-    Сүүлийн 'days_threshold' хоногт харагдаагүй заруудыг 'is_archived=True' болгоно.
-    """
-    if banners_col is None: return 0
-
-    cutoff_date = (datetime.now() - timedelta(days=days_threshold)).strftime("%Y-%m-%d")
-
-    try:
-        # Delete биш Update хийнэ
-        result = banners_col.update_many(
-            {"last_seen_date": {"$lt": cutoff_date}, "is_archived": {"$ne": True}},
-            {"$set": {"is_archived": True, "status": "ARCHIVED"}}
-        )
-        return result.modified_count
-    except Exception as e:
-        print(f"Archive Error: {e}")
-        return 0
-
-
-def recalculate_days_seen():
-    """
-    Бүх баннеруудын days_seen-ийг first_seen_date болон last_seen_date-аас дахин тооцоолох.
-    Нэг удаа ажиллуулж буруу өгөгдлийг засна.
-    """
-    if banners_col is None: return 0
-    
-    fixed_count = 0
-    try:
-        for banner in banners_col.find({}):
-            first = banner.get("first_seen_date", "")
-            last = banner.get("last_seen_date", "")
-            
-            if first and last:
-                try:
-                    first_dt = datetime.strptime(first, "%Y-%m-%d")
-                    last_dt = datetime.strptime(last, "%Y-%m-%d")
-                    correct_days = (last_dt - first_dt).days + 1
-                    
-                    if correct_days != banner.get("days_seen"):
-                        banners_col.update_one(
-                            {"_id": banner["_id"]},
-                            {"$set": {"days_seen": correct_days}}
-                        )
-                        fixed_count += 1
-                except:
-                    pass
-        
-        print(f"✅ Recalculated days_seen for {fixed_count} banners")
-        return fixed_count
-    except Exception as e:
-        print(f"Recalculate Error: {e}")
-        return 0
\ No newline at end of file
+    return get_backend().archive_old_banners(days_threshold)
+
+def recalculate_days_seen() -> int:
+    return get_backend().recalculate_days_seen()
+
+def backfill_asset_ids(resolve: Callable[[str], Optional[str]]) -> int:
+    return get_backend().backfill_asset_ids(resolve)
+
+def backfill_brands() -> int:
+    return get_backend().backfill_brands()
+
+def backfill_size_buckets() -> int:
+    return get_backend().backfill_size_buckets()
+
+def find_banners(start_date: str = "", end_date: str = "") -> List[dict]:
+    return get_backend().find_banners(start_date, end_date)
+
+def list_banners_page(filters: dict, sort: str = "last_seen_date", direction: int = -1,
+                      limit: int = 100, after: Optional[dict] = None) -> Tuple[List[dict], Optional[dict]]:
+    return get_backend().list_banners_page(filters, sort, direction, limit, after)
+
+def iter_banners(filters: dict, fields: Sequence[str] = BANNER_LIST_FIELDS, sort: str = "last_seen_date",
+                 direction: int = -1, batch_size: int = 1000) -> Iterator[dict]:
+    return get_backend().iter_banners(filters, fields, sort, direction, batch_size)
+
+def list_sites() -> List[str]:
+    return get_backend().list_sites()
+
+def fetch_banners_since(updated_since: str) -> List[dict]:
+    return get_backend().fetch_banners_since(updated_since)
+
+def list_banner_keys() -> List[Tuple[str, str]]:
+    return get_backend().list_banner_keys()
+
+def banner_facets(filters: dict, limit: int = FACET_LIMIT) -> dict:
+    return get_backend().banner_facets(filters, limit)
+
+def brand_presence(start: str, end: str, site: str = "") -> List[dict]:
+    return get_backend().brand_presence(start, end, site)
+
+def share_of_voice(start: str, end: str, by: str = "site", site: str = "") -> List[dict]:
+    return get_backend().share_of_voice(start, end, by, site)
+
+def ensure_indexes():
+    return get_backend().ensure_indexes()
+
+def fetch_all_banners() -> List[dict]:
+    return get_backend().fetch_all_banners()
+
+def hide_banner(site: str, src: str) -> bool:
+    return get_backend().hide_banner(site, src)
+
+def bulk_moderate_ids(action: str, ids: Sequence[str]) -> Dict[str, bool]:
+    return get_backend().bulk_moderate_ids(action, ids)
+
+def bulk_moderate_filter(action: str, filters: dict) -> int:
+    return get_backend().bulk_moderate_filter(action, filters)
+
+def hide_banners_before(cutoff_date: str) -> int:
+    return get_backend().hide_banners_before(cutoff_date)
+
+def delete_banner(site: str, src: str) -> bool:
+    return get_backend().delete_banner(site, src)
+
+def request_job(kind: str, source: str, stale_sec: float, sites: Optional[List[str]] = None) -> Optional[dict]:
+    return get_backend().request_job(kind, source, stale_sec, sites)
+
+def claim_job(kind: str, worker: str, event_seq_start: int = 0) -> Optional[dict]:
+    return get_backend().claim_job(kind, worker, event_seq_start)
+
+def heartbeat_job(kind: str, job_id: str, progress: Optional[str] = None) -> bool:
+    return get_backend().heartbeat_job(kind, job_id, progress)
+
+def defer_job(kind: str) -> bool:
+    return get_backend().defer_job(kind)
+
+def finish_job(kind: str, job_id: str, status: str, error: Optional[str] = None, result: Optional[dict] = None):
+    return get_backend().finish_job(kind, job_id, status, error, result)
+
+def get_job_state(kind: str, stale_sec: float) -> dict:
+    return get_backend().get_job_state(kind, stale_sec)
+
+def enqueue_site_jobs(run_id: str, sites: Sequence[dict]) -> List[str]:
+    return get_backend().enqueue_site_jobs(run_id, sites)
+
+def claim_site_job(worker: str, lease_sec: float) -> Optional[dict]:
+    return get_backend().claim_site_job(worker, lease_sec)
+
+def renew_site_lease(job_id: str, worker: str, lease_sec: float) -> bool:
+    return get_backend().renew_site_lease(job_id, worker, lease_sec)
+
+def finish_site_job(job_id: str, worker: str, status: str, error: Optional[str] = None,
+                    result: Optional[dict] = None, retry_delay: float = 0) -> Optional[str]:
+    return get_backend().finish_site_job(job_id, worker, status, error, result, retry_delay)
+
+def get_site_job(job_id: str) -> Optional[dict]:
+    return get_backend().get_site_job(job_id)
+
+def list_site_jobs(run_id: str) -> List[dict]:
+    return get_backend().list_site_jobs(run_id)
+
+def expire_site_jobs() -> int:
+    return get_backend().expire_site_jobs()
+
+def abandon_site_jobs(run_id: str, error: str) -> int:
+    return get_backend().abandon_site_jobs(run_id, error)
+
+def append_event(event_type: str, data: dict) -> int:
+    return get_backend().append_event(event_type, data)
+
+def events_since(seq: int, limit: int = 500) -> List[dict]:
+    return get_backend().events_since(seq, limit)
+
+def latest_event_seq() -> int:
+    return get_backend().latest_event_seq()
+
+def get_site_due() -> Dict[str, float]:
+    return get_backend().get_site_due()
+
+def set_site_due(site: str, due_at: float, expected: Optional[float] = None) -> bool:
+    return get_backend().set_site_due(site, due_at, expected)
+
+def get_admin(username: str) -> Optional[Dict]:
+    return get_backend().get_admin(username)
+
+def create_admin(username: str, password_hash: str) -> bool:
+    return get_backend().create_admin(username, password_hash)
+
+def update_admin_password(username: str, password_hash: str) -> bool:
+    return get_backend().update_admin_password(username, password_hash)
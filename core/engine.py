@@ -1,14 +1,22 @@
 # engine.py — High-Performance Parallel Scraper (Env Configured)
 import concurrent.futures
+import inspect
+import threading
 import traceback
+import time
 import os
 from datetime import datetime
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional, Set
 from dotenv import load_dotenv 
 
 # .env тохиргоог унших
 load_dotenv()  
 
+from core import assets, events
+from core.capture import CapturePipeline
+from core.schedule import by_priority
+from core.spool import RunSpool
+
 # Import Site Modules
 from sites import gogo_mn
 from sites import ikon_mn
@@ -29,9 +37,32 @@ SITES_CONFIG = [
     {"module": bolortoli_mn, "name": "bolortoli_mn"},
 ]
 
-def _scrape_wrapper(site_conf: Dict) -> Dict[str, List]:
+# Нэг run-д зэрэг ажиллах browser-ийн дээд тоо (хуучин MAX_WORKERS тохиргоог default болгоно)
+MAX_BROWSERS = int(os.getenv("MAX_BROWSERS", os.getenv("MAX_WORKERS", "2")))
+
+def site_conf(name: str) -> Optional[Dict]:
+    """SITES_CONFIG-оос нэрээр нь (site job-ийн "site" талбар)."""
+    return next((conf for conf in SITES_CONFIG if conf["name"] == name), None)
+
+def max_attempts_for(site_conf: Dict) -> int:
+    """Сайтын retry policy: SITES_CONFIG-ийн "max_attempts", үгүй бол SITE_MAX_ATTEMPTS (default 2)."""
+    return int(site_conf.get("max_attempts", os.getenv("SITE_MAX_ATTEMPTS", "2")))
+
+def _assign_asset_ids(items: List[Dict]):
+    """
+    Capture бүрт canonical asset_id оноох (banner_screenshots/ доторх relative зам).
+    screenshot_path-ыг мөн canonical хэлбэрт оруулна — дараа нь зам засварлах шаардлагагүй.
     """
-    Single site scraper wrapper to handle errors independently.
+    for item in items:
+        asset_id = assets.asset_id_for_capture(item.get("screenshot_path", ""))
+        item["asset_id"] = asset_id
+        item["screenshot_path"] = assets.screenshot_path_for(asset_id)
+
+def scrape_site(site_conf: Dict, emit: Optional[Callable[[List[Dict]], None]] = None) -> List[Dict]:
+    """
+    Нэг сайтыг scrape хийх. Алдаа гарвал exception шиднэ (retry-г run_site_jobs шийднэ).
+    emit өгвөл capture-ууд scraper-аас шууд урсана (core.capture.CapturePipeline.put_many);
+    emit-ийг дэмжихгүй scraper-ийн жагсаалтыг дууссаны дараа emit руу өгнө.
     """
     mod = site_conf["module"]
     name = site_conf["name"]
@@ -47,56 +78,267 @@ def _scrape_wrapper(site_conf: Dict) -> Dict[str, List]:
     
     # 2. Daily folder structure
     today = datetime.now().strftime("%Y-%m-%d")
-    output_dir = f"./banner_screenshots/{today}"
+    output_dir = assets.day_dir(today)
     
     print(f"⏳ Starting: {name} (Dwell: {dwell}s, Score: {min_score}, Headless: {headless})...")
-    try:
-        prefix = name.split('_')[0] 
-        func_name = f"scrape_{prefix}"
+    prefix = name.split('_')[0] 
+    func_name = f"scrape_{prefix}"
+    
+    if hasattr(mod, func_name):
+        scraper_func = getattr(mod, func_name)
+        kwargs = {}
+        if emit and "emit" in inspect.signature(scraper_func).parameters:
+            kwargs["emit"], emit = emit, None
+        # 2. Тохиргоонуудыг функц рүү дамжуулах
+        results = scraper_func(
+            output_dir=output_dir, 
+            headless=headless,
+            dwell_seconds=dwell,
+            ads_only=ads_only,
+            min_score=min_score,
+            **kwargs
+        )
+        if kwargs:
+            return []
+    elif hasattr(mod, "scrape"):
+        results = mod.scrape()
+    else:
+        print(f"⚠ Warning: No scrape function found for {name}")
         
-        if hasattr(mod, func_name):
-            scraper_func = getattr(mod, func_name)
-            # 2. Тохиргоонуудыг функц рүү дамжуулах
-            results = scraper_func(
-                output_dir=output_dir, 
-                headless=headless,
-                dwell_seconds=dwell,
-                ads_only=ads_only,
-                min_score=min_score
+    results = results or []
+    if emit:
+        emit(results)
+        return []
+    _assign_asset_ids(results)
+    print(f"✅ Finished: {name} (Found {len(results)} items)")
+    return results
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+def run_site_jobs(ingest: Callable[[str, List[Dict]], Dict],
+                  on_status: Optional[Callable[[str, Dict], None]] = None,
+                  sites: Optional[List[Dict]] = None, spool: Optional[RunSpool] = None,
+                  feed: Optional[Callable[[int, Set[str]], List[str]]] = None) -> Dict[str, Dict]:
+    """
+    Сайт бүр тусдаа job: scrape (retry-тэй) → core.capture pipeline → ingest(name, batch).
+    Capture-ууд scraper ажиллаж байх үед batch-аар DB-д орно (ingest нэг сайтад олон удаа дуудагдана);
+    удаан/гацсан сайт бусдынхаа өгөгдлийг саатуулахгүй.
+
+    Retry: сайт бүрт SITE_MAX_ATTEMPTS (эсвэл SITES_CONFIG-ийн "max_attempts") оролдлого,
+    хооронд нь SITE_RETRY_DELAY_SEC * attempt хүлээнэ.
+    Timeout: нэг оролдлого эхэлснээс SITE_TIMEOUT_SEC-ээс удаан ажилласан сайтыг "timeout" гэж
+    тэмдэглээд хүлээхээ болино (thread-ийг зогсоох боломжгүй тул хожуу ирсэн үр дүнг хаяна).
+    Оролдлого бүр шинээр тоологдоно; retry-ийн хоорондын хүлээлт, browser slot хүлээх хугацаа орохгүй.
+
+    Сайтууд priority-гоор (core.schedule) эхэлнэ; зэрэг scrape хийх browser run бүрийн MAX_BROWSERS
+    slot-оор хязгаарлагдана. Timeout болсон сайтын slot-ийг чөлөөлнө (гацсан thread дараагийн
+    сайтуудыг, дараагийн run-уудыг хориглохгүй).
+
+    Checkpoint: spool өгвөл capture бүр core.spool-д бичигдэж, сайтын явц (checkpoint, scraped,
+    downloaded, collected) on_status-аар run-д орно. Spool нь бүрэн (scraper дууссан) сайтыг
+    browser нээлгүй spool-оос ingest хийнэ — тасалдсан run-ийг үргэлжлүүлэх, ingest алдааны retry.
+
+    feed(limit, in_run) — SCHEDULE_MODE=interval: slot чөлөөлөгдөх бүрт шинээр due болсон (энэ run-д
+    ороогүй) сайтуудын нэрийг limit хүртэл буцаана; тэд энэ run-д нэмэгдэнэ. Сайт run-д нэг л удаа.
+
+    on_status(name, changes) — сайтын төлөв өөрчлөгдөх бүрт (run.sites[name] руу бичихэд).
+    Буцаах: {name: {"status": "ingested"|"failed"|"timeout", "attempts", "collected", "new", "error", ...}}
+    """
+    sites = by_priority(SITES_CONFIG if sites is None else sites)
+    dwell_sec = int(os.getenv("DWELL_SEC", "60"))
+    retry_delay = float(os.getenv("SITE_RETRY_DELAY_SEC", "30"))
+    # Default: dwell + хөтөч ачаалах/scroll хийх хугацааны нөөц
+    site_timeout = float(os.getenv("SITE_TIMEOUT_SEC", str(dwell_sec + 600)))
+
+    states: Dict[str, Dict] = {}
+    started: Dict[str, float] = {}
+    abandoned = set()
+    lock = threading.Lock()
+    slots = threading.Semaphore(MAX_BROWSERS)
+    holding = set()
+
+    def take_slot(name: str):
+        slots.acquire()
+        with lock:
+            holding.add(name)
+
+    def free_slot(name: str):
+        # Нэг удаа л: сайт timeout болоход эсвэл thread нь scrape-ээ дуусгахад (аль нь түрүүлсэн)
+        with lock:
+            if name not in holding:
+                return
+            holding.discard(name)
+        slots.release()
+
+    def report(name: str, **changes) -> Dict:
+        with lock:
+            if name in abandoned:
+                return states[name]
+            states.setdefault(name, {}).update(changes)
+            snapshot = dict(states[name])
+        if on_status:
+            try:
+                on_status(name, changes)
+            except Exception as e:
+                print(f"⚠ Status update failed for {name}: {e}")
+        return snapshot
+
+    def job(site_conf: Dict) -> Dict:
+        name = site_conf["name"]
+        attempts = max_attempts_for(site_conf)
+        min_score = int(os.getenv("ADS_MIN_SCORE", "3"))
+        totals = {"collected": 0, "new": 0}
+        scraped = [0]
+
+        def ingest_batch(batch: List[Dict]) -> Dict:
+            # Timeout-ийн дараа ирсэн capture-уудыг хаяна (run аль хэдийн хаагдсан)
+            if name in abandoned:
+                return {}
+            _assign_asset_ids(batch)
+            counts = ingest(name, batch) or {}
+            totals["collected"] += counts.get("collected", 0)
+            totals["new"] += counts.get("new", 0)
+            report(name, scraped=scraped[0], downloaded=pipe.processed["download"], **totals)
+            return counts
+
+        def emit(caps: List[Dict]):
+            caps = list(caps)
+            if spool:
+                spool.append(name, caps)
+            scraped[0] += len(caps)
+            pipe.put_many(caps)
+
+        for attempt in range(1, attempts + 1):
+            if name in abandoned:
+                break
+            replay = spool is not None and spool.is_complete(name)
+            # Оролдлого бүр сайтын бүх capture-ийг дахин ingest хийнэ: collected-ийг тэгээс тоолно.
+            # new хуримтлагдана — өмнөх оролдлогын оруулсан мөрүүд retry-д "хуучин" болж тоологдоно.
+            totals["collected"] = 0
+            report(name, status="running", checkpoint="scraped" if replay else "scraping", attempts=attempt,
+                   started_at=_now(), collected=0)
+            pipe = CapturePipeline(name, ingest_batch, min_score=min_score)
+            try:
+                if replay:
+                    # Scraper өмнө нь бүрэн дууссан: browser нээлгүй spool-оос дахин ingest
+                    with lock:
+                        started[name] = time.monotonic()
+                    print(f"♻ {name}: ingesting spooled captures")
+                    scraped[0] = 0
+                    with pipe:
+                        for cap in spool.read(name):
+                            scraped[0] += 1
+                            pipe.put(cap)
+                    break
+                # Browser-ийн slot хүлээх хугацаа timeout-д орохгүй (started нь slot авсны дараа)
+                take_slot(name)
+                try:
+                    with lock:
+                        started[name] = time.monotonic()
+                    if spool:
+                        spool.start(name)
+                    scraped[0] = 0
+                    # Capture-ууд scraper ажиллаж байх хооронд batch-аар DB-д орно (өмнөх оролдлогынх ч хадгалагдана)
+                    with pipe:
+                        scrape_site(site_conf, emit=emit)
+                        if spool:
+                            spool.complete(name)
+                        report(name, checkpoint="scraped", scraped=scraped[0])
+                finally:
+                    free_slot(name)
+                break
+            except Exception as e:
+                stage = "ingest" if e is pipe.error else "scrape"
+                print(f"❌ Error in {name} ({stage}, attempt {attempt}/{attempts}): {e}")
+                traceback.print_exc()
+                if attempt == attempts:
+                    return report(name, status="failed", stage=stage, error=str(e), finished_at=_now())
+                report(name, status="retrying", error=str(e))
+                # Retry хүлээлт timeout-д орохгүй: дараагийн оролдлого эхлэхэд цаг дахин эхэлнэ
+                with lock:
+                    started.pop(name, None)
+                time.sleep(retry_delay * attempt)
+
+        if name in abandoned:
+            print(f"⚠ {name}: finished after timeout, results discarded")
+            return states[name]
+        print(f"✅ Finished: {name} (Saved {totals['collected']} items, new: {totals['new']})")
+        events.publish("site_finished", {"site": name, "count": totals["collected"]})
+        return report(name, status="ingested", checkpoint="ingested", error=None, finished_at=_now(),
+                      scraped=scraped[0], downloaded=pipe.processed["download"], **totals)
+
+    print(f"🚀 Launching parallel scraper with {MAX_BROWSERS} browsers (Dwell: {dwell_sec}s)...")
+    results: Dict[str, Dict] = {}
+    # Сайт бүр өөрийн thread-тэй (browser-ийг slots хязгаарлана): гацсан thread pool-ийн байрыг эзлэхгүй
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(len(sites), len(SITES_CONFIG) if feed else 0, 1))
+    futures: Dict[concurrent.futures.Future, str] = {}
+    pending = set()
+
+    def submit(confs: List[Dict]):
+        for site in by_priority(confs):
+            future = executor.submit(job, site)
+            futures[future] = site["name"]
+            pending.add(future)
+
+    submit(sites)
+    try:
+        while True:
+            if feed and len(pending) < MAX_BROWSERS:
+                try:
+                    fed = [conf for conf in map(site_conf, feed(MAX_BROWSERS - len(pending), set(futures.values())))
+                           if conf]
+                except Exception as e:
+                    print(f"⚠ Schedule feed failed: {e}")
+                    fed = []
+                if fed:
+                    print(f"➕ Joining this run: {', '.join(conf['name'] for conf in fed)}")
+                    submit(fed)
+            if not pending:
+                break
+            done, pending = concurrent.futures.wait(
+                pending, timeout=5, return_when=concurrent.futures.FIRST_COMPLETED
             )
-        elif hasattr(mod, "scrape"):
-            results = mod.scrape()
-        else:
-            print(f"⚠ Warning: No scrape function found for {name}")
-            
-        print(f"✅ Finished: {name} (Found {len(results)} items)")
-        return {name: results}
-        
-    except Exception as e:
-        print(f"❌ Error in {name}: {str(e)}")
-        traceback.print_exc()
-        return {name: []}
+            for future in done:
+                name = futures[future]
+                try:
+                    results[name] = future.result()
+                except Exception as exc:
+                    print(f"❌ Critical Thread Error: {exc}")
+                    results[name] = report(name, status="failed", error=str(exc), finished_at=_now())
+            now = time.monotonic()
+            for future in list(pending):
+                name = futures[future]
+                if name in started and now - started[name] > site_timeout:
+                    print(f"⏱ Timeout: {name} ({site_timeout:.0f}s), not waiting any longer")
+                    results[name] = report(name, status="timeout", error=f"timeout after {site_timeout:.0f}s",
+                                           finished_at=_now())
+                    with lock:
+                        abandoned.add(name)
+                    free_slot(name)
+                    pending.discard(future)
+    finally:
+        # Гацсан thread-ийг хүлээхгүй; эхлээгүй job-уудыг цуцална
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return results
 
 def scrape_all_sites() -> Dict[str, List]:
     """
-    Runs all scrapers in parallel using ThreadPoolExecutor.
+    Runs all scrapers in parallel and returns {name: items} (DB-д бичихгүй).
     """
-    all_results = {}
-    
-    # .env-ээс уншина (Default: 2)
-    MAX_WORKERS = int(os.getenv("MAX_WORKERS", "2"))
-    DWELL_SEC = int(os.getenv("DWELL_SEC", "60"))
-    
-    print(f"🚀 Launching parallel scraper with {MAX_WORKERS} workers (Dwell: {DWELL_SEC}s)...")
-    
-    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = [executor.submit(_scrape_wrapper, site) for site in SITES_CONFIG]
-        
-        for future in concurrent.futures.as_completed(futures):
-            try:
-                data = future.result()
-                all_results.update(data)
-            except Exception as exc:
-                print(f"❌ Critical Thread Error: {exc}")
+    all_results: Dict[str, List] = {}
+
+    def collect(name: str, items: List[Dict]) -> Dict:
+        all_results.setdefault(name, []).extend(items)
+        return {"collected": len(items)}
+
+    def on_status(name: str, changes: Dict):
+        # Retry нь бүх capture-ийг дахин өгнө: өмнөх оролдлогын хэсгийг хаяна
+        if changes.get("status") == "running":
+            all_results[name] = []
 
-    return all_results
\ No newline at end of file
+    statuses = run_site_jobs(collect, on_status=on_status)
+    for name in statuses:
+        all_results.setdefault(name, [])
+    return all_results
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# events.py — Scraper-ийн төлөв болон логийн event bus (SSE-д зориулсан)
+#
+# Pipeline (run.py, engine) болон server.py-ийн ui_logger энд event нийтэлнэ:
+#   log           — лог мөр
+#   state         — running / idle шилжилт
+#   site_finished — нэг сайтын scrape дууссан
+#   db_sync       — DB-д хадгалж дууссан
+#   report        — report job-ийн төлөв (running / success / failed), scrape-ийн state-ээс тусдаа
+#   report_done   — тайлан үүссэн
+# Event бүр өсөх дугаартай (seq). /scraper/events клиент сүүлд авсан seq-ээсээ
+# үргэлжлүүлж зөвхөн шинэ event-үүдийг авна. Буфер нь хязгаартай deque.
+# Worker процесс listener-ээр event-үүдээ DB руу дамжуулж, web tier нь
+# core.jobs.EventRelay-ээр буцааж өөрийн bus-д нийтэлнэ — web процесст seq нь
+# job_events.seq (бүх gunicorn worker-т ижил), тиймээс SSE id/Last-Event-ID аль ч worker дээр хүчинтэй.
+
+import os
+import time
+import threading
+from collections import deque
+from typing import Callable, List, Optional
+
+EVENT_BUFFER_SIZE = int(os.getenv("EVENT_BUFFER_SIZE", "500"))
+
+
+class EventBus:
+    def __init__(self, maxlen: int = EVENT_BUFFER_SIZE):
+        self._events = deque(maxlen=maxlen)
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._listeners: List[Callable[[dict], None]] = []
+
+    def add_listener(self, fn: Callable[[dict], None]):
+        """publish бүрт дуудагдах callback (lock дотор, нийтэлсэн дарааллаар)."""
+        self._listeners.append(fn)
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+    def publish(self, kind: str, data: Optional[dict] = None, seq: Optional[int] = None) -> int:
+        """seq өгвөл (EventRelay: job_events.seq) түүнийг ашиглана; аль хэдийн нийтэлсэн seq-ийг алгасна."""
+        with self._cond:
+            if seq is not None and seq <= self._seq:
+                return self._seq
+            self._seq = self._seq + 1 if seq is None else seq
+            event = {"seq": self._seq, "type": kind, "ts": time.time(), "data": data or {}}
+            self._events.append(event)
+            self._cond.notify_all()
+            for fn in self._listeners:
+                try:
+                    fn(event)
+                except Exception as e:
+                    print(f"Event listener error: {e}")
+            return self._seq
+
+    def since(self, seq: int) -> List[dict]:
+        """seq-ээс хойшхи event-үүд (буферээс гарсан хуучин event-үүд алдагдана)."""
+        with self._cond:
+            if seq >= self._seq:
+                return []
+            return [e for e in self._events if e["seq"] > seq]
+
+    def wait(self, seq: int, timeout: float) -> List[dict]:
+        """Шинэ event гартал (эсвэл timeout) хүлээгээд seq-ээс хойшхийг буцаана."""
+        with self._cond:
+            if seq >= self._seq:
+                self._cond.wait(timeout)
+            if seq >= self._seq:
+                return []
+            return [e for e in self._events if e["seq"] > seq]
+
+    def tail(self, kind: str, limit: int) -> List[dict]:
+        """Тухайн төрлийн сүүлийн limit event."""
+        with self._cond:
+            return [e for e in self._events if e["type"] == kind][-limit:]
+
+
+bus = EventBus()
+
+
+def publish(kind: str, data: Optional[dict] = None) -> int:
+    return bus.publish(kind, data)
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+# exports.py — Dashboard-ийн шүүлтүүртэй on-demand export (TSV / CSV / JSONL / XLSX)
+#
+# _export/summary.* нь сүүлийн run-ий бүтэн тайлан. Энд харин iter_banners()-ийн
+# cursor-оос мөр мөрөөр нь уншиж шууд бичнэ (DataFrame үүсгэхгүй):
+# - TSV/CSV/JSONL: chunk-ээр stream хийнэ — татаж эхлэх нь шууд, санах ой тогтмол
+# - XLSX: xlsxwriter-ийн constant_memory горимоор түр файлд бичээд дараа нь stream хийнэ
+#   (zip архив тул workbook хаагдахаас өмнө илгээх боломжгүй)
+
+import io
+import os
+import csv
+import json
+import tempfile
+from typing import Iterable, Iterator
+
+import xlsxwriter
+
+from core.storage import StorageBackend
+
+# summarize.py-ийн тайлантай ижил баганын дараалал
+EXPORT_COLUMNS = [
+    "site", "brand", "width", "height", "size_bucket", "first_seen_date", "last_seen_date", "days_seen",
+    "landing_url", "src", "screenshot_path", "asset_id", "ad_score", "ad_reason",
+]
+
+EXPORT_FORMATS = {
+    "tsv": "text/tab-separated-values; charset=utf-8",
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+FLUSH_ROWS = 500            # Текст export-д хэдэн мөр тутамд chunk илгээх
+XLSX_MAX_COL_WIDTH = 60
+FILE_CHUNK_SIZE = 1 << 16
+
+
+def _prepare(row: dict) -> dict:
+    # brand-гүй (migrate хийгдээгүй) мөрд л тооцоолно
+    if not row.get("brand"):
+        row["brand"] = StorageBackend.brand_for(row)
+    return row
+
+
+def stream_delimited(rows: Iterable[dict], delimiter: str = "\t") -> Iterator[str]:
+    buf = io.StringIO()
+    writer = csv.writer(buf, delimiter=delimiter, lineterminator="\n")
+    writer.writerow(EXPORT_COLUMNS)
+    for i, row in enumerate(rows, 1):
+        row = _prepare(row)
+        writer.writerow(["" if row.get(c) is None else row.get(c) for c in EXPORT_COLUMNS])
+        if i % FLUSH_ROWS == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def stream_jsonl(rows: Iterable[dict]) -> Iterator[str]:
+    lines = []
+    for row in rows:
+        row = _prepare(row)
+        lines.append(json.dumps({c: row.get(c) for c in EXPORT_COLUMNS}, ensure_ascii=False, default=str))
+        if len(lines) >= FLUSH_ROWS:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def write_xlsx(rows: Iterable[dict], path: str) -> int:
+    """constant_memory горимоор path руу бичнэ (мөр бүр шууд түр файл руу). Буцаах: мөрийн тоо."""
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True, "strings_to_urls": False})
+    try:
+        worksheet = workbook.add_worksheet("Banner Report")
+        header_format = workbook.add_format({
+            'bold': True,
+            'text_wrap': True,
+            'valign': 'top',
+            'fg_color': '#D7E4BC',
+            'border': 1
+        })
+        widths = [len(c) + 2 for c in EXPORT_COLUMNS]
+        for col, name in enumerate(EXPORT_COLUMNS):
+            worksheet.write(0, col, name, header_format)
+
+        count = 0
+        for count, row in enumerate(rows, 1):
+            row = _prepare(row)
+            for col, name in enumerate(EXPORT_COLUMNS):
+                value = row.get(name)
+                if value is None:
+                    continue
+                worksheet.write(count, col, value)
+                widths[col] = max(widths[col], len(str(value)) + 2)
+
+        # Баганын өргөн <cols> хэсэгт workbook хаах үед бичигдэнэ
+        for col, width in enumerate(widths):
+            worksheet.set_column(col, col, min(width, XLSX_MAX_COL_WIDTH))
+    finally:
+        workbook.close()
+    return count
+
+
+def stream_xlsx(rows: Iterable[dict]) -> Iterator[bytes]:
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        write_xlsx(rows, path)
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(FILE_CHUNK_SIZE), b""):
+                yield chunk
+    finally:
+        os.remove(path)
+
+
+def stream_export(fmt: str, rows: Iterable[dict]) -> Iterator:
+    if fmt == "xlsx":
+        return stream_xlsx(rows)
+    if fmt == "jsonl":
+        return stream_jsonl(rows)
+    return stream_delimited(rows, "," if fmt == "csv" else "\t")
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+# jobs.py — Scrape job-ийн worker процесс ба web tier-ийн холбоос
+#
+# Scheduler болон pipeline нь тусдаа worker процесст (worker.py) ажиллана.
+# Web (server.py, олон gunicorn worker байж болно) ба worker хоорондоо зөвхөн
+# DB-ээр харилцана:
+#   job_locks  — kind бүрт нэг баримт: idle → queued (web/scheduler) → running (worker) → idle
+#   jobs       — job бүрийн түүх (source, status, error, result)
+#   job_events — worker-ийн лог/төлөвийн event-үүд; web tier EventRelay-ээр уншиж SSE-д дамжуулна
+# Lock нь heartbeat-тэй: worker унасан бол JOB_STALE_SEC-ийн дараа шинэ job авах боломжтой.
+#
+# Тайлан (summarize.py) нь scrape-аас тусдаа "report" kind-ийн job: scrape дуусах,
+# dashboard-ийн товч зэрэг олон trigger нэг build болж нэгтгэгдэнэ (request_report).
+
+import os
+import time
+import socket
+import threading
+from typing import Callable, List, Optional
+
+from core import events
+from core.db import (
+    request_job, heartbeat_job, defer_job, get_job_state, append_event, events_since, latest_event_seq,
+)
+
+SCRAPE_JOB = "scrape"
+REPORT_JOB = "report"
+# Тасалдсан run-ийг үргэлжлүүлэх scrape job-ийн source (worker эхлэхэд дараалалд оруулна)
+RESUME_SOURCE = "Resume"
+
+JOB_STALE_SEC = float(os.getenv("JOB_STALE_SEC", "120"))
+JOB_HEARTBEAT_SEC = float(os.getenv("JOB_HEARTBEAT_SEC", "20"))
+EVENT_RELAY_POLL_SEC = float(os.getenv("EVENT_RELAY_POLL_SEC", "1"))
+# job_events.seq-ийн завсрыг (Mongo: seq N+1 нь N-ээс өмнө commit хийгдэж болно) хүлээх хугацаа;
+# үүнээс удаан нөхөгдөөгүй бол N-ийг алдагдсан гэж үзээд цааш явна
+EVENT_GAP_GRACE_SEC = float(os.getenv("EVENT_GAP_GRACE_SEC", "10"))
+# Report job дараалалд орсноос хойш build эхлэхээс өмнө хүлээх хугацаа (энэ хооронд ирсэн trigger-үүд нэгтгэгдэнэ)
+REPORT_COALESCE_SEC = float(os.getenv("REPORT_COALESCE_SEC", "30"))
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def request_scrape(source: str, sites: Optional[List[str]] = None) -> Optional[dict]:
+    """Scrape job дараалалд оруулах (sites — зөвхөн эдгээр сайт). Өөр job идэвхтэй бол None (busy)."""
+    return request_job(SCRAPE_JOB, source, JOB_STALE_SEC, sites)
+
+
+def scrape_state() -> dict:
+    return get_job_state(SCRAPE_JOB, JOB_STALE_SEC)
+
+
+def request_report(source: str) -> dict:
+    """
+    Тайлан үүсгэх хүсэлт (давхардалгүй):
+      idle    → шинэ job дараалалд орно                       → "queued"
+      queued  → тэр job-д нэгтгэнэ (build DB-г хараахан уншаагүй) → "coalesced"
+      running → pending тэмдэг: дууссаны дараа нэг удаа дахин    → "deferred"
+    Буцаах: {"status", "job_id"}
+    """
+    for _ in range(3):
+        job = request_job(REPORT_JOB, source, JOB_STALE_SEC)
+        if job:
+            return {"status": "queued", "job_id": job["job_id"]}
+        state = report_state()
+        if state["state"] == "queued":
+            return {"status": "coalesced", "job_id": state["job_id"]}
+        if defer_job(REPORT_JOB):
+            return {"status": "deferred", "job_id": state["job_id"]}
+        # Энэ хооронд lock idle болсон: дахин оролдоно
+    return {"status": "busy", "job_id": None}
+
+
+def report_state() -> dict:
+    return get_job_state(REPORT_JOB, JOB_STALE_SEC)
+
+
+# =====================================================
+# WORKER ТАЛ
+# =====================================================
+
+class Heartbeat:
+    """Job ажиллах хугацаанд lock-ийн heartbeat-ийг тогтмол шинэчилнэ."""
+
+    def __init__(self, kind: str, job_id: str, interval: float = JOB_HEARTBEAT_SEC):
+        self.kind, self.job_id, self.interval = kind, job_id, interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True, name=f"heartbeat-{job_id}")
+
+    def _beat(self, progress: Optional[str] = None):
+        try:
+            if not heartbeat_job(self.kind, self.job_id, progress):
+                print(f"⚠ Job {self.job_id}: lock lost (stale takeover?)")
+        except Exception as e:
+            print(f"Heartbeat Error: {e}")
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self._beat()
+
+    def progress(self, text: str):
+        """Job-ийн явцыг lock-д шууд бичих (status endpoint-д харагдана)."""
+        self._beat(text)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join(timeout=5)
+
+
+def forward_events_to_db():
+    """Энэ процессын бүх event-ийг job_events руу бичих (worker процесст дуудна)."""
+    def _forward(event: dict):
+        append_event(event["type"], event["data"])
+    events.bus.add_listener(_forward)
+
+
+# =====================================================
+# WEB ТАЛ
+# =====================================================
+
+class EventRelay:
+    """
+    job_events-ийг DB-ээс уншиж энэ процессын events.bus-д (job_events.seq-тэй нь) дахин нийтэлнэ.
+    Web процесс бүрт нэг thread (SSE клиент бүр DB-г poll хийхгүй).
+    Зөвхөн тасралтгүй seq-ээр урагшилна: завсар гарвал EVENT_GAP_GRACE_SEC хүртэл
+    дутуу event commit хийгдэхийг хүлээнэ (түүний дараах event-үүдийг нийтлэхгүй).
+    """
+
+    def __init__(self, on_event: Optional[Callable[[dict], None]] = None, poll_sec: float = EVENT_RELAY_POLL_SEC):
+        self.on_event = on_event
+        self.poll_sec = poll_sec
+        self._started = False
+        self._lock = threading.Lock()
+        # Нийтэлсэн сүүлийн seq (үүнээс өмнөх бүх event эцэслэгдсэн); эхлэхээс өмнө None
+        self.seq: Optional[int] = None
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._loop, daemon=True, name="event-relay").start()
+
+    @staticmethod
+    def _initial_seq() -> int:
+        # Ажиллаж буй run байвал түүний эхнээс, үгүй бол зөвхөн шинэ event-үүд
+        state = scrape_state()
+        if state["running"] and state.get("event_seq_start") is not None:
+            return state["event_seq_start"]
+        return latest_event_seq()
+
+    def _loop(self):
+        last = None
+        gap_since = None
+        while True:
+            try:
+                if last is None:
+                    last = self.seq = self._initial_seq()
+                for e in events_since(last):
+                    if e["seq"] > last + 1:
+                        # Дутуу seq хараахан commit хийгдээгүй байж болно: дараагийн poll-оор дахин уншина
+                        gap_since = gap_since or time.monotonic()
+                        if time.monotonic() - gap_since < EVENT_GAP_GRACE_SEC:
+                            break
+                    gap_since = None
+                    last = self.seq = e["seq"]
+                    # DB-ийн seq-ээр: SSE id нь бүх web процесст ижил
+                    events.bus.publish(e["type"], e["data"], seq=e["seq"])
+                    if self.on_event:
+                        self.on_event(e)
+            except Exception as ex:
+                print(f"Event relay error: {ex}")
+            time.sleep(self.poll_sec)
@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+# journal.py — TSV snapshot + append-only JSONL journal storage
+#
+# Файлын бүтэц (path = banner_tracking_combined.tsv гэж үзвэл):
+#   path                      → compact snapshot (хуучин TSV формат хэвээр)
+#   path.journal              → snapshot-оос хойших put/del бичлэгүүд (JSONL)
+#   path.journal.compacting   → compaction явагдаж байх үеийн хуучин journal
+#
+# Сэргээх дараалал: snapshot → journal.compacting → journal.
+# put/del бичлэгүүд key-ээр бүтэн мөрийг орлуулдаг тул дахин replay хийхэд аюулгүй.
+#
+# Олон процесс (server + worker) нэг файлыг бичихэд portalocker (requirements.txt) шаардлагатай —
+# суулгаагүй бол _FileLock зөвхөн thread лок тул нэг процессын store болно.
+
+import os
+import csv
+import json
+import threading
+from typing import Dict, Iterable, List, Optional
+
+DELIM = "\t"
+JOURNAL_COMPACT_BYTES = int(os.getenv("JOURNAL_COMPACT_BYTES", str(8 * 1024 * 1024)))  # 8MB
+JOURNAL_FSYNC = os.getenv("JOURNAL_FSYNC", "1") == "1"
+
+
+def row_key(row: Dict[str, str]) -> str:
+    """Мөрийн тогтвортой түлхүүр: banner_key, байхгүй бол site|src."""
+    return row.get("banner_key") or f"{row.get('site', '')}|{row.get('src', '')}"
+
+
+def _fsync_dir(path: str):
+    """os.replace-ийн дараа директорын entry-г дискэнд буулгах (POSIX)."""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except Exception:
+        return
+    try:
+        os.fsync(fd)
+    except Exception:
+        pass
+    finally:
+        os.close(fd)
+
+
+class _FileLock:
+    """portalocker байвал процесс хоорондын лок, үгүй бол юу ч хийхгүй (JournalStore-ийн RLock л үлдэнэ)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = None
+
+    def __enter__(self):
+        try:
+            import portalocker  # optional
+            self._lock = portalocker.Lock(self.path, timeout=5)
+            self._lock.acquire()
+        except Exception:
+            self._lock = None
+        return self
+
+    def __exit__(self, *exc):
+        if self._lock is not None:
+            try:
+                self._lock.release()
+            except Exception:
+                pass
+
+
+class JournalStore:
+    """
+    TSV snapshot дээр суурилсан append-only storage.
+    - put()/delete() нь journal-д нэг мөр нэмнэ (O(1) I/O).
+    - refresh() нь зөвхөн шинээр нэмэгдсэн journal хэсгийг уншина.
+    - Journal JOURNAL_COMPACT_BYTES-ээс томровол background thread snapshot-ыг шинэчилнэ.
+    """
+
+    def __init__(self, path: str, headers: List[str], compact_bytes: int = JOURNAL_COMPACT_BYTES):
+        self.path = path
+        self.headers = list(headers)
+        self.compact_bytes = compact_bytes
+        self.journal_path = path + ".journal"
+        self.compacting_path = path + ".journal.compacting"
+        self.lock_path = path + ".lock"
+
+        self._lock = threading.RLock()
+        self._state: Dict[str, Dict[str, str]] = {}
+        self._snapshot_sig = None
+        self._journal_sig = None
+        self._journal_offset = 0
+        self._compactor: Optional[threading.Thread] = None
+        self._loaded = False
+
+    # ---------------- Read side ----------------
+    @staticmethod
+    def _sig(path: str):
+        try:
+            st = os.stat(path)
+            return (st.st_ino, st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return None
+
+    def _read_snapshot(self) -> Dict[str, Dict[str, str]]:
+        state: Dict[str, Dict[str, str]] = {}
+        if not os.path.exists(self.path):
+            return state
+        with open(self.path, "r", newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f, delimiter=DELIM):
+                row = self._clean(row)
+                state[row_key(row)] = row
+        return state
+
+    @staticmethod
+    def _apply(state: Dict[str, Dict[str, str]], rec: dict):
+        if rec.get("op") == "del":
+            state.pop(rec.get("key"), None)
+        elif rec.get("op") == "put":
+            row = rec.get("row") or {}
+            state[rec.get("key") or row_key(row)] = row
+
+    def _replay(self, state: Dict[str, Dict[str, str]], path: str, offset: int = 0) -> int:
+        """offset-оос эхлэн journal-ыг хэрэгжүүлнэ; дуусаагүй (crash) сүүлийн мөрийг алгасна."""
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return 0  # Байхгүй (эсвэл compaction яг одоо устгасан — _full_load дахин уншина)
+        with f:
+            f.seek(offset)
+            pos = offset
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break  # Бүрэн бичигдээгүй сүүлийн мөр
+                try:
+                    self._apply(state, json.loads(raw.decode("utf-8")))
+                except Exception:
+                    pass
+                pos += len(raw)
+        return pos
+
+    def _layout(self):
+        """Snapshot, .compacting-ийн sig болон journal-ын inode — compaction явсныг илрүүлэхэд."""
+        jsig = self._sig(self.journal_path)
+        return self._sig(self.path), self._sig(self.compacting_path), jsig[0] if jsig else None
+
+    def _full_load(self):
+        # Лок-гүй уншина: хооронд нь өөр процесс compaction-ий rotate эсвэл snapshot солих алхмыг хийвэл
+        # (хуучин snapshot + аль хэдийн устсан .compacting) бичлэгүүд дутна → бүтэн дахин уншина
+        while True:
+            layout = self._layout()
+            state = self._read_snapshot()
+            self._replay(state, self.compacting_path)
+            offset = self._replay(state, self.journal_path)
+            if self._layout() == layout:
+                break
+        self._state = state
+        self._journal_offset = offset
+        self._snapshot_sig = layout[0]
+        # Уншсаны дараа journal-д мөр нэмэгдсэн бол mtime-гүй sig (inode, rotate шалгахад) → дараагийн
+        # refresh() түүнийг "өөрчлөгдсөн" гэж үзээд offset-оос үргэлжлүүлнэ
+        jsig = self._sig(self.journal_path)
+        self._journal_sig = jsig if jsig is None or jsig[2] == offset else (jsig[0], None, offset)
+        self._loaded = True
+
+    def refresh(self):
+        """Бусад процессын бичсэн өөрчлөлтийг татах. Snapshot солигдсон бол бүтэн уншина."""
+        with self._lock:
+            if not self._loaded or self._sig(self.path) != self._snapshot_sig:
+                self._full_load()
+                return
+            jsig = self._sig(self.journal_path)
+            if jsig == self._journal_sig:
+                return
+            if jsig is None or (self._journal_sig and jsig[0] != self._journal_sig[0]) \
+                    or jsig[2] < self._journal_offset:
+                # Journal rotate хийгдсэн (өөр процесс compaction эхлүүлсэн)
+                self._full_load()
+                return
+            self._journal_offset = self._replay(self._state, self.journal_path, self._journal_offset)
+            self._journal_sig = self._sig(self.journal_path)
+
+    def rows(self) -> List[Dict[str, str]]:
+        """Одоогийн төлөвийн хуулбар (дуудагч өөрчилж болно)."""
+        self.refresh()
+        with self._lock:
+            return [dict(r) for r in self._state.values()]
+
+    # ---------------- Write side ----------------
+    def _append(self, records: Iterable[dict]):
+        records = list(records)
+        lines = [json.dumps(r, ensure_ascii=False) + "\n" for r in records]
+        if not lines:
+            return
+        d = os.path.dirname(self.journal_path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        with self._lock, _FileLock(self.lock_path):
+            self.refresh()
+            with open(self.journal_path, "ab") as f:
+                f.write("".join(lines).encode("utf-8"))
+                f.flush()
+                if JOURNAL_FSYNC:
+                    os.fsync(f.fileno())
+            for rec in records:
+                self._apply(self._state, rec)
+            self._journal_offset = self._sig(self.journal_path)[2]
+            self._journal_sig = self._sig(self.journal_path)
+        self._maybe_compact()
+
+    def _clean(self, row: Dict[str, str]) -> Dict[str, str]:
+        return {k: ("" if row.get(k) is None else str(row.get(k))) for k in self.headers}
+
+    def put(self, row: Dict[str, str]):
+        self.put_many([row])
+
+    def put_many(self, rows: Iterable[Dict[str, str]]):
+        recs = []
+        for r in rows:
+            clean = self._clean(r)
+            recs.append({"op": "put", "key": row_key(clean), "row": clean})
+        self._append(recs)
+
+    def delete(self, key: str):
+        self._append([{"op": "del", "key": key}])
+
+    def sync(self, rows: List[Dict[str, str]]) -> int:
+        """
+        Бүтэн мөрийн жагсаалтыг хадгалах (хуучин save_db-ийн семантик).
+        Зөвхөн өөрчлөгдсөн/шинэ/устсан мөрүүдийг journal-д нэмнэ. Буцаах: бичлэгийн тоо.
+        """
+        self.refresh()
+        recs, seen = [], set()
+        with self._lock:
+            for r in rows:
+                clean = self._clean(r)
+                key = row_key(clean)
+                seen.add(key)
+                if self._state.get(key) != clean:
+                    recs.append({"op": "put", "key": key, "row": clean})
+            for key in list(self._state.keys()):
+                if key not in seen:
+                    recs.append({"op": "del", "key": key})
+        self._append(recs)
+        return len(recs)
+
+    # ---------------- Compaction ----------------
+    def _maybe_compact(self):
+        try:
+            size = os.path.getsize(self.journal_path)
+        except OSError:
+            return
+        if size >= self.compact_bytes:
+            self.compact()
+
+    def compact(self, wait: bool = False):
+        """Journal-ыг snapshot руу нийлүүлэх. Default-аар background thread дээр ажиллана."""
+        with self._lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                if wait:
+                    self._compactor.join()
+                return
+            self._compactor = threading.Thread(target=self._compact, daemon=True, name="journal-compact")
+            self._compactor.start()
+            t = self._compactor
+        if wait:
+            t.join()
+
+    def _compact(self):
+        # 1. Лок дор: journal-ыг rotate хийж, төлөвийн хуулбар авна
+        with self._lock, _FileLock(self.lock_path):
+            self.refresh()
+            if os.path.exists(self.compacting_path):
+                # Өмнөх compaction тасарсан: түүнийг эхлээд дуусгана
+                pass
+            elif os.path.exists(self.journal_path):
+                os.replace(self.journal_path, self.compacting_path)
+                self._journal_offset = 0
+                self._journal_sig = None
+            else:
+                return
+            frozen = [dict(r) for r in self._state.values()]
+
+        # 2. Лок-гүй: шинэ snapshot бичих (энэ хооронд put() шинэ journal руу бичнэ)
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", newline="", encoding="utf-8") as f:
+                w = csv.DictWriter(f, fieldnames=self.headers, delimiter=DELIM,
+                                   quoting=csv.QUOTE_MINIMAL, extrasaction="ignore")
+                w.writeheader()
+                for r in frozen:
+                    w.writerow(self._clean(r))
+                f.flush()
+                os.fsync(f.fileno())
+        except Exception as e:
+            print(f"Journal compaction failed: {e}")
+            return
+
+        # 3. Атомаар солиод, нийлүүлсэн journal-ыг устгана
+        with self._lock, _FileLock(self.lock_path):
+            os.replace(tmp, self.path)
+            _fsync_dir(self.path)
+            try:
+                os.remove(self.compacting_path)
+            except FileNotFoundError:
+                pass
+            self._snapshot_sig = self._sig(self.path)
+
+
+_STORES: Dict[str, JournalStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_store(path: str, headers: List[str]) -> JournalStore:
+    """Нэг path-д нэг JournalStore (процесс доторх singleton)."""
+    key = os.path.abspath(path)
+    with _STORES_LOCK:
+        store = _STORES.get(key)
+        if store is None:
+            store = JournalStore(path, headers)
+            _STORES[key] = store
+        return store
@@ -1,11 +1,23 @@
 # manager.py
-import subprocess
+import logging
 import threading
 import os
-import time
 
 SCRAPER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # Parent of core/
-RUN_PY = os.path.join(SCRAPER_DIR, "run.py")
+
+
+class _ManagerLogHandler(logging.Handler):
+    """Pipeline-ийн log мөрүүдийг ScraperManager.logs руу дамжуулна."""
+
+    def __init__(self, manager):
+        super().__init__(level=logging.INFO)
+        self.manager = manager
+
+    def emit(self, record):
+        try:
+            self.manager.logs.append(self.format(record))
+        except Exception:
+            pass
 
 class ScraperManager:
     def __init__(self):
@@ -32,39 +44,28 @@ class ScraperManager:
         self.logs = []   # шинэ run дээр log-оо цэвэрлэнэ
 
         def _task():
+            # run.py-г subprocess-оор биш, нэг процесс дотор ажиллуулна:
+            # ингэснээр core.mongo-гийн нэгдсэн connection pool-ыг хуваалцана.
+            # Тайланг run.run_pipeline() report job болгон дараалалд оруулна (worker.py үүсгэнэ).
+            import run
+
+            handler = _ManagerLogHandler(self)
+            pipeline_logger = logging.getLogger("ScraperPipeline")
+            pipeline_logger.addHandler(handler)
             try:
                 self.append_log("▶ SCRAPER эхэлж байна...")
 
-                # run.py-г realtime logger-тай ажиллуулах
-                process = subprocess.Popen(
-                    ["python", RUN_PY],
-                    cwd=SCRAPER_DIR,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.STDOUT,
-                    text=True,
-                    bufsize=1
-                )
-
-                for line in process.stdout:
-                    self.append_log(line.strip())
-
-                process.wait()
-
-                self.append_log("✔ RUN.PY дууслаа. Summary үүсгэж байна...")
-
-                # summary.py ажиллуулах (parent directory-аас)
-                summarize_path = os.path.join(SCRAPER_DIR, "summarize.py")
-                subprocess.run(
-                    ["python", summarize_path],
-                    cwd=SCRAPER_DIR,
-                    check=False
-                )
+                res = run.run_pipeline()
+                if res.get("status") == "failed":
+                    self.append_log(f"❌ SCRAPER АЛДАА: {res.get('error')}")
+                    return
 
-                self.append_log("✔ SUMMARY дууслаа.")
+                self.append_log("✔ RUN.PY дууслаа. Summary report job дараалалд орлоо.")
                 self.append_log("🏁 SCRAPER АМЖИЛТТАЙ ДУУСЛАА.")
             except Exception as e:
                 self.append_log(f"❌ SCRAPER АЛДАА: {e}")
             finally:
+                pipeline_logger.removeHandler(handler)
                 self.running = False
 
         threading.Thread(target=_task, daemon=True).start()
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+# mongo.py — Нэгдсэн, lazy MongoDB connection factory
+#
+# server.py, run.py, summarize.py, core.db, core.manager бүгд энэ нэг
+# MongoClient (connection pool)-ийг хуваалцана.
+# - Import хийхэд холболт үүсгэхгүй: анх get_client() дуудагдахад л үүснэ
+# - connect=False тул MongoClient үүсэх нь server selection хүлээхгүй
+# - ping() нь богино timeout-той health probe, үр дүнг хэдэн секунд cache-лэнэ
+
+import os
+import time
+import threading
+from typing import Optional
+
+import pymongo
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Docker дотор: "mongodb://mongo:27017/banner_db"
+# Local дээр: "mongodb://localhost:27017/banner_db"
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/banner_db")
+
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "20"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_MS = int(os.getenv("MONGO_MAX_IDLE_MS", "60000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "30000"))
+MONGO_PING_TIMEOUT_MS = int(os.getenv("MONGO_PING_TIMEOUT_MS", "1500"))
+MONGO_HEALTH_TTL_SEC = float(os.getenv("MONGO_HEALTH_TTL_SEC", "5"))
+
+_client: Optional[pymongo.MongoClient] = None
+_client_lock = threading.Lock()
+_health = {"ok": None, "checked_at": 0.0, "error": ""}
+
+
+def get_client() -> pymongo.MongoClient:
+    """Процесс доторх ганц MongoClient (анх дуудахад үүснэ)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = pymongo.MongoClient(
+                    MONGO_URI,
+                    connect=False,
+                    appname="banner-scraper",
+                    maxPoolSize=MONGO_MAX_POOL_SIZE,
+                    minPoolSize=MONGO_MIN_POOL_SIZE,
+                    maxIdleTimeMS=MONGO_MAX_IDLE_MS,
+                    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                    connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+                    socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+                )
+    return _client
+
+
+def get_database():
+    return get_client().get_database()
+
+
+def get_collection(name: str):
+    return get_database()[name]
+
+
+def ping(force: bool = False) -> bool:
+    """
+    Health probe: {"ping": 1} командыг богино timeout-той илгээнэ.
+    Үр дүнг MONGO_HEALTH_TTL_SEC хугацаанд cache-лэх тул route бүрт round-trip хийхгүй.
+    """
+    now = time.monotonic()
+    if not force and _health["ok"] is not None and now - _health["checked_at"] < MONGO_HEALTH_TTL_SEC:
+        return _health["ok"]
+
+    ok, error = False, ""
+    try:
+        client = get_client()
+        # Ping-д зориулж server selection-ийг богино хугацаагаар хязгаарлана
+        with pymongo.timeout(MONGO_PING_TIMEOUT_MS / 1000.0):
+            client.admin.command("ping")
+        ok = True
+    except Exception as e:
+        error = str(e)
+
+    if ok and _health["ok"] is not True:
+        print(f"✅ Connected to MongoDB: {MONGO_URI}")
+    elif not ok and _health["ok"] is not False:
+        print(f"❌ MongoDB Connection Error: {error}")
+
+    _health.update(ok=ok, checked_at=now, error=error)
+    return ok
+
+
+def health() -> dict:
+    """Dashboard/monitoring-д зориулсан холболтын төлөв."""
+    ok = ping()
+    return {
+        "ok": ok,
+        "uri_host": MONGO_URI.rsplit("@", 1)[-1],
+        "error": _health["error"],
+        "checked_at": _health["checked_at"],
+    }
+
+
+def close_client():
+    """Fork хийхийн өмнө эсвэл тестэд pool-ыг хаах."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+    _health.update(ok=None, checked_at=0.0, error="")
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+# schedule.py — Сайт тус бүрийн scrape хуваарь (SCHEDULE_MODE=interval)
+#
+#   cron (default): 09:00 & 18:00 (Asia/Ulaanbaatar) цагт бүх сайт нэг дор (worker.py)
+#   interval:       сайт бүр өөрийн interval_min ± jitter_min тутамд. worker.py SCHEDULE_TICK_SEC
+#                   тутам хугацаа нь болсон сайтуудыг priority-гоор эрэмбэлж, MAX_BROWSERS хүртэлхийг
+#                   нэг scrape job болгон дараалалд оруулна. Job ажиллаж байх хооронд browser slot
+#                   чөлөөлөгдөх бүрт шинээр due болсон сайтууд тэр run-д нэмэгдэнэ (engine.run_site_jobs
+#                   feed) → ачаалал өдрийн турш жигд тархана, хурдан солигддог сайт (ikon) олон дээж авна.
+#
+# Хуваарь: SITES_CONFIG-ийн "interval_min" / "jitter_min" / "priority", эсвэл SITE_SCHEDULE env (JSON):
+#   SITE_SCHEDULE='{"ikon_mn": {"interval_min": 60, "jitter_min": 10, "priority": 5}}'
+# Тохируулаагүй сайт: SITE_INTERVAL_MIN (default 540 = өдөрт ~2 удаа), SITE_JITTER_MIN (default 20).
+#
+# Дараагийн хугацаа DB-д (site_schedule): олон worker нэг хуваарийг хуваалцана. Сайтыг авахдаа
+# due_at-ийг compare-and-set-ээр дараагийн хугацаа руу шилжүүлдэг тул нэг интервалд нэг л worker
+# авна. Анх удаа сайтууд SCHEDULE_WARMUP_MIN хугацаанд тархаж эхэлнэ (бүгд нэг зэрэг биш).
+
+import os
+import json
+import time
+import random
+from typing import Collection, Dict, List, Optional, Tuple
+
+from core.db import get_site_due, set_site_due
+
+SCHEDULE_MODE = os.getenv("SCHEDULE_MODE", "cron").strip().lower()   # cron | interval
+SCHEDULE_TICK_SEC = float(os.getenv("SCHEDULE_TICK_SEC", "60"))
+SCHEDULE_WARMUP_MIN = float(os.getenv("SCHEDULE_WARMUP_MIN", "30"))
+SITE_INTERVAL_MIN = float(os.getenv("SITE_INTERVAL_MIN", "540"))
+SITE_JITTER_MIN = float(os.getenv("SITE_JITTER_MIN", "20"))
+
+
+def _load_overrides() -> Dict[str, Dict]:
+    raw = os.getenv("SITE_SCHEDULE", "").strip()
+    if not raw:
+        return {}
+    try:
+        return json.loads(raw)
+    except ValueError as e:
+        print(f"⚠ SITE_SCHEDULE is not valid JSON, ignoring: {e}")
+        return {}
+
+
+# Import хийхэд нэг удаа (бусад SITE_* тохиргоотой адил) — sort key бүрт дахин parse хийхгүй
+SITE_SCHEDULE = _load_overrides()
+
+
+def site_schedule(site_conf: Dict) -> Dict:
+    """Сайтын хуваарь: {"interval_min", "jitter_min", "priority"} (SITE_SCHEDULE > SITES_CONFIG > default)."""
+    conf = dict(site_conf, **SITE_SCHEDULE.get(site_conf["name"], {}))
+    return {
+        "interval_min": float(conf.get("interval_min", SITE_INTERVAL_MIN)),
+        "jitter_min": float(conf.get("jitter_min", SITE_JITTER_MIN)),
+        "priority": int(conf.get("priority", 0)),
+    }
+
+
+def by_priority(sites: List[Dict]) -> List[Dict]:
+    """Өндөр priority-тэй сайт эхэлж (тэнцүү бол SITES_CONFIG-ийн дарааллаар)."""
+    return sorted(sites, key=lambda conf: -site_schedule(conf)["priority"])
+
+
+class SiteScheduler:
+    """
+    Ашиглалт (worker.py):
+        sched = SiteScheduler()
+        names = sched.take_due(limit=engine.MAX_BROWSERS)
+        if names and not request_scrape("Schedule", sites=names):
+            sched.release(names)
+    """
+
+    def __init__(self, sites: Optional[List[Dict]] = None, rng: Optional[random.Random] = None):
+        if sites is None:
+            from core import engine
+            sites = engine.SITES_CONFIG
+        self.sites = list(sites)
+        self.rng = rng or random.Random()
+        # take_due-ээр авсан сайт: (өмнөх due_at, шинэ due_at) — release()-д
+        self._taken: Dict[str, Tuple[float, float]] = {}
+
+    def due_times(self, now: Optional[float] = None) -> Dict[str, float]:
+        """{site: due_at}. Хуваарьгүй сайтад анхны хугацаа ононо (өөр worker түрүүлсэн бол түүнийх)."""
+        now = time.time() if now is None else now
+        due_at = get_site_due()
+        missing = [conf for conf in self.sites if conf["name"] not in due_at]
+        for conf in missing:
+            # Interval болон warmup-ийн багахан нь дотор санамсаргүй → бүх сайт нэг зэрэг эхлэхгүй
+            first = now + self.rng.uniform(0, min(site_schedule(conf)["interval_min"], SCHEDULE_WARMUP_MIN)) * 60
+            set_site_due(conf["name"], first)
+        return get_site_due() if missing else due_at
+
+    def due(self, now: Optional[float] = None, limit: Optional[int] = None,
+            exclude: Collection[str] = ()) -> List[str]:
+        """Хугацаа нь болсон сайтууд: priority ↓, тэнцүү бол хамгийн удаан хүлээсэн нь эхэнд."""
+        now = time.time() if now is None else now
+        names = [name for name, _ in self._ready(now, exclude)]
+        return names[:limit] if limit else names
+
+    def _ready(self, now: float, exclude: Collection[str]) -> List[Tuple[str, float]]:
+        due_at = self.due_times(now)
+        ready = [conf for conf in self.sites
+                 if conf["name"] not in exclude and due_at.get(conf["name"], now) <= now]
+        ready.sort(key=lambda conf: (-site_schedule(conf)["priority"], due_at.get(conf["name"], now)))
+        return [(conf["name"], due_at.get(conf["name"], now)) for conf in ready]
+
+    def take_due(self, now: Optional[float] = None, limit: Optional[int] = None,
+                 exclude: Collection[str] = ()) -> List[str]:
+        """
+        Хугацаа нь болсон сайтуудыг авах: due_at-ийг now + interval ± jitter болгож compare-and-set
+        хийнэ — өөр worker түрүүлсэн сайтыг алгасна. Буцаах: энэ worker-т ногдсон сайтууд.
+        """
+        now = time.time() if now is None else now
+        taken = []
+        for name, prev in self._ready(now, exclude):
+            if limit and len(taken) >= limit:
+                break
+            sched = site_schedule(next(conf for conf in self.sites if conf["name"] == name))
+            jitter = self.rng.uniform(-sched["jitter_min"], sched["jitter_min"])
+            nxt = now + max(sched["interval_min"] + jitter, 1) * 60
+            if set_site_due(name, nxt, expected=prev):
+                self._taken[name] = (prev, nxt)
+                taken.append(name)
+        return taken
+
+    def release(self, names: List[str]):
+        """take_due-ээр авсан ч ажиллуулж чадаагүй (scraper busy) сайтуудыг буцааж due болгох."""
+        for name in names:
+            prev, nxt = self._taken.pop(name, (None, None))
+            if prev is not None:
+                set_site_due(name, prev, expected=nxt)
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+# sitejobs.py — Олон машин (VM) дээр scrape хийх: сайт тус бүрийн job + lease + ingest API
+#
+#   coordinator (worker.py, SCRAPE_MODE=distributed): scrape job бүрт run үүсгээд сайт бүрт
+#       jobs коллекцид kind="site" job оруулна (run_distributed), бүгд дуустал хүлээнэ
+#   node (site_worker.py, хэдэн ч машин): claim_site_job → scrape_* → capture pipeline →
+#       batch-уудыг POST /api/ingest руу илгээнэ (screenshot-той нь)
+#   web (server.py /api/ingest): lease-ийг шалгаад banner upsert + screenshot хадгална
+#
+# Node унавал heartbeat зогсож lease (SITE_LEASE_SEC) дуусна → өөр node тэр job-ийг авна.
+# Lease алдсан node-ийн хожуу ирсэн batch-уудыг ingest API 409-өөр буцаана.
+# Coordinator SITE_RUN_TIMEOUT_SEC-ийн дараа хүлээхээ болиход үлдсэн job-ууд failed болно; хаагдсан
+# (status != "running") run-ий job-ийг node авахгүй, batch-ийг нь ingest API хүлээж авахгүй.
+# engine (playwright) зөвхөн coordinator/node талд хэрэгтэй тул функц дотор import хийнэ.
+
+import os
+import re
+import time
+import base64
+import threading
+from datetime import date, datetime
+from typing import Callable, Dict, List, Optional, Set
+
+import requests
+
+from core import assets
+from core.common import ensure_dir
+from core.db import (
+    abandon_site_jobs, enqueue_site_jobs, expire_site_jobs, finish_site_job, get_run_status, get_site_job,
+    list_site_jobs, renew_site_lease, update_run_site, upsert_banners,
+)
+from core.schedule import site_schedule
+from core.storage import SITE_JOB_DONE_STATES
+
+SCRAPE_MODE = os.getenv("SCRAPE_MODE", "local").strip().lower()   # local | distributed
+SITE_LEASE_SEC = float(os.getenv("SITE_LEASE_SEC", "300"))
+SITE_LEASE_RENEW_SEC = float(os.getenv("SITE_LEASE_RENEW_SEC", "60"))
+SITE_POLL_SEC = float(os.getenv("SITE_POLL_SEC", "5"))
+# Node-ууд бүх job-ийг дуусгахыг coordinator хамгийн ихдээ хэр удаан хүлээх
+SITE_RUN_TIMEOUT_SEC = float(os.getenv("SITE_RUN_TIMEOUT_SEC", str(4 * 3600)))
+SITE_JOB_ABANDONED = "abandoned: not finished by remote workers before the run timed out"
+INGEST_URL = os.getenv("INGEST_URL", "").rstrip("/")
+INGEST_TOKEN = os.getenv("INGEST_TOKEN", "")
+INGEST_TIMEOUT_SEC = 60
+
+_SHOT_NAME_RE = re.compile(r"^[\w.-]+\.(png|jpe?g|webp)$", re.IGNORECASE)
+
+
+class LeaseLost(Exception):
+    """Job өөр worker-т шилжсэн (lease дууссан) — энэ worker-ийн үр дүнг хүлээж авахгүй."""
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+
+# =====================================================
+# COORDINATOR ТАЛ
+# =====================================================
+
+def site_job_specs(sites: Optional[List[Dict]] = None) -> List[dict]:
+    from core import engine
+    sites = engine.SITES_CONFIG if sites is None else sites
+    return [{"site": conf["name"], "max_attempts": engine.max_attempts_for(conf),
+             "priority": site_schedule(conf)["priority"]}
+            for conf in sites]
+
+
+def run_distributed(run_id: Optional[str], stats: dict, sites: Optional[List[Dict]] = None,
+                    feed: Optional[Callable[[int, Set[str]], List[str]]] = None) -> Dict[str, Dict]:
+    """
+    run-ий сайт бүрийг (sites өгвөл зөвхөн тэдгээрийг) site job болгон дараалалд оруулаад node-ууд дуусгахыг хүлээнэ.
+    feed өгвөл хүлээх явцад шинээр due болсон сайтууд энэ run-д site job болж нэмэгдэнэ (engine.run_site_jobs-тэй ижил).
+    stats-ийг job-уудын үр дүнгээр дүүргэнэ. Буцаах: engine.run_site_jobs-тэй ижил {name: state}.
+    """
+    if not run_id:
+        raise RuntimeError("run record could not be created")
+    specs = site_job_specs(sites)
+    names = {spec["site"] for spec in specs}
+    # Үргэлжлүүлж буй run: node-ууд дээр амьд байгаа (queued/running/done) job-уудыг дахин оруулахгүй
+    active = {j["site"] for j in list_site_jobs(run_id) if j["status"] != "failed"}
+    enqueue_site_jobs(run_id, [spec for spec in specs if spec["site"] not in active])
+    print(f"📤 Run {run_id}: site jobs queued for remote workers")
+
+    deadline = time.monotonic() + SITE_RUN_TIMEOUT_SEC
+    run_jobs: List[dict] = []
+    while True:
+        if feed:
+            from core import engine
+            try:
+                fed = [conf for conf in map(engine.site_conf, feed(len(engine.SITES_CONFIG), set(names))) if conf]
+            except Exception as e:
+                print(f"⚠ Schedule feed failed: {e}")
+                fed = []
+            if fed:
+                enqueue_site_jobs(run_id, site_job_specs(fed))
+                names |= {conf["name"] for conf in fed}
+                print(f"📤 Run {run_id}: {', '.join(conf['name'] for conf in fed)} joined")
+        expire_site_jobs()
+        latest: Dict[str, Dict] = {}
+        run_jobs = list_site_jobs(run_id)
+        for j in run_jobs:
+            # Сайт бүрт нэг job: өмнөх run-ий failed job-оос шинэ оролдлогыг нь илүүд үзнэ
+            if j["site"] in names and (j["site"] not in latest or latest[j["site"]]["status"] == "failed"):
+                latest[j["site"]] = j
+        site_jobs = list(latest.values())
+        if all(j["status"] in SITE_JOB_DONE_STATES for j in site_jobs):
+            break
+        if time.monotonic() > deadline:
+            # Үлдсэн job-уудыг хаана: run хаагдсаны дараа node авахгүй, дараагийн run-тай давхцахгүй
+            abandoned = abandon_site_jobs(run_id, SITE_JOB_ABANDONED)
+            print(f"⏱ Run {run_id}: {abandoned} unfinished site jobs abandoned")
+            feed = None
+            continue
+        time.sleep(SITE_POLL_SEC)
+
+    # new нь сайтын энэ run-ий бүх job-оос (үргэлжлүүлсэн run-д тасалдахаас өмнөх failed job-ууд ч
+    # мөрүүдийг анх оруулсан); job бүрийн result нь өөрийн бүх оролдлогын new-г агуулна
+    new_by_site: Dict[str, int] = {}
+    for j in run_jobs:
+        new_by_site[j["site"]] = new_by_site.get(j["site"], 0) + (j.get("result") or {}).get("new", 0)
+
+    states: Dict[str, Dict] = {}
+    for job in site_jobs:
+        result = job.get("result") or {}
+        stats["per_site"][job["site"]] = result.get("collected", 0)
+        stats["total_collected"] += result.get("collected", 0)
+        stats["new_banners"] += new_by_site.get(job["site"], 0)
+        if job["status"] == "done":
+            states[job["site"]] = dict(result, status="ingested", attempts=job["attempts"],
+                                       new=new_by_site.get(job["site"], 0))
+        elif job["error"] == SITE_JOB_ABANDONED:
+            # Хугацаандаа дуусаагүй (node байхгүй/удаан)
+            states[job["site"]] = {"status": "timeout", "attempts": job["attempts"], "error": job["error"]}
+            update_run_site(run_id, job["site"], dict(states[job["site"]], finished_at=_now()))
+        else:
+            states[job["site"]] = {"status": "failed", "attempts": job["attempts"], "error": job["error"]}
+    return states
+
+
+# =====================================================
+# NODE ТАЛ (site_worker.py)
+# =====================================================
+
+class Lease:
+    """Site job ажиллах хугацаанд lease-ийг тогтмол сунгана. Алдсан бол .lost = True."""
+
+    def __init__(self, job: dict, worker: str, lease_sec: float = SITE_LEASE_SEC,
+                 interval: float = SITE_LEASE_RENEW_SEC):
+        self.job, self.worker, self.lease_sec, self.interval = job, worker, lease_sec, interval
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True, name=f"lease-{job['job_id']}")
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if not renew_site_lease(self.job["job_id"], self.worker, self.lease_sec):
+                    self.lost = True
+                    print(f"⚠ Site job {self.job['job_id']}: lease lost")
+                    return
+            except Exception as e:
+                print(f"Lease Error: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join(timeout=5)
+
+
+def ship_batch(job: dict, worker: str, items: List[Dict]) -> dict:
+    """Capture batch-ийг screenshot-той нь ingest API руу илгээх. Буцаах: {"collected", "new"}."""
+    if not INGEST_URL or not INGEST_TOKEN:
+        raise RuntimeError("INGEST_URL and INGEST_TOKEN must be set on remote workers")
+    payload = []
+    for item in items:
+        item = dict(item)
+        path = item.pop("screenshot_path", "") or ""
+        if path and os.path.isfile(path):
+            with open(path, "rb") as f:
+                item["screenshot_name"] = os.path.basename(path)
+                item["screenshot_b64"] = base64.b64encode(f.read()).decode("ascii")
+        payload.append(item)
+    resp = requests.post(
+        f"{INGEST_URL}/api/ingest",
+        json={"job_id": job["job_id"], "worker": worker, "items": payload},
+        headers={"Authorization": f"Bearer {INGEST_TOKEN}"},
+        timeout=INGEST_TIMEOUT_SEC,
+    )
+    if resp.status_code == 409:
+        raise LeaseLost(job["job_id"])
+    resp.raise_for_status()
+    return resp.json()
+
+
+def run_claimed(job: dict, worker: str, ship: Callable[[dict, str, List[Dict]], dict] = ship_batch) -> Optional[str]:
+    """
+    Claim хийсэн нэг site job-ийг ажиллуулах: scrape_* → capture pipeline → ship().
+    Буцаах: finish_site_job-ийн төлөв ("done" | "queued" | "failed"), lease алдсан бол None.
+    """
+    from core import engine
+    from core.capture import CapturePipeline
+
+    run_id, site = job["run_id"], job["site"]
+    site_conf = engine.site_conf(site)
+    # collected нь оролдлого бүрт тэгээс (бүх capture дахин ingest хийгдэнэ); new нь өмнөх
+    # оролдлогуудынхаас үргэлжилнэ — тэдний оруулсан мөрүүд энэ удаа "хуучин" болж тоологдоно
+    totals = {"collected": 0, "new": (job.get("result") or {}).get("new", 0)}
+    update_run_site(run_id, site, {"status": "running", "attempts": job["attempts"], "worker": worker,
+                                   "started_at": _now()})
+
+    with Lease(job, worker) as lease:
+        def ingest_batch(batch: List[Dict]) -> dict:
+            if lease.lost:
+                raise LeaseLost(job["job_id"])
+            counts = ship(job, worker, batch)
+            totals["collected"] += counts.get("collected", 0)
+            totals["new"] += counts.get("new", 0)
+            update_run_site(run_id, site, dict(totals))
+            return counts
+
+        try:
+            if site_conf is None:
+                raise RuntimeError(f"unknown site: {site}")
+            with CapturePipeline(site, ingest_batch, min_score=int(os.getenv("ADS_MIN_SCORE", "3"))) as pipe:
+                engine.scrape_site(site_conf, emit=pipe.put_many)
+            status, error = "done", None
+        except Exception as e:
+            status, error = "failed", str(e)
+            print(f"❌ Site job {job['job_id']} ({site}): {e}")
+
+    final = finish_site_job(job["job_id"], worker, status, error, totals,
+                            retry_delay=float(os.getenv("SITE_RETRY_DELAY_SEC", "30")))
+    if final is None:
+        print(f"⚠ Site job {job['job_id']} ({site}): lease lost, result dropped")
+        return None
+    state = {"done": "ingested", "queued": "retrying"}.get(final, final)
+    update_run_site(run_id, site, dict(totals, status=state, error=error, finished_at=_now()))
+    return final
+
+
+# =====================================================
+# WEB ТАЛ (/api/ingest)
+# =====================================================
+
+def ingest_remote(job_id: str, worker: str, items: List[Dict]) -> dict:
+    """
+    Node-оос ирсэн batch-ийг хадгалах. Job одоо энэ worker-т (running) байгаа, run нь хаагдаагүй
+    эсэхийг шалгана — lease нь дуусаж өөр node-д шилжсэн эсвэл run дууссан бол LeaseLost.
+    """
+    job = get_site_job(str(job_id or ""))
+    if not job or job["status"] != "running" or job["worker"] != worker:
+        raise LeaseLost(job_id)
+    if get_run_status(job["run_id"]) != "running":
+        raise LeaseLost(job_id)
+
+    day = assets.day_dir(date.today().isoformat())
+    ensure_dir(day)
+    for item in items:
+        name = item.pop("screenshot_name", "") or ""
+        data = item.pop("screenshot_b64", None)
+        item["site"] = item.get("site") or job["site"]
+        item["asset_id"] = item["screenshot_path"] = ""
+        if data and _SHOT_NAME_RE.match(name):
+            with open(os.path.join(day, name), "wb") as f:
+                f.write(base64.b64decode(data, validate=True))
+            item["asset_id"] = assets.asset_id_for_capture(os.path.join(day, name))
+            item["screenshot_path"] = assets.screenshot_path_for(item["asset_id"])
+
+    collected, new = 0, 0
+    for res in upsert_banners(items):
+        if res.get("new"):
+            new += 1
+        collected += 1
+    return {"collected": collected, "new": new}
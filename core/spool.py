@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+# spool.py — Run-ий capture-уудыг диск рүү бичих (тасалдсан run-ийг үргэлжлүүлэхэд)
+#
+#   _spool/<run_id>/<site>.jsonl — scraper-ийн emit хийсэн capture бүр (зургийн bytes-гүй metadata)
+#   _spool/<run_id>/<site>.done  — scraper бүрэн дууссан: дахин эхлэхэд browser нээлгүй
+#                                  spool-оос download → hash → classify → upsert-ийг л давтана
+#
+# Screenshot файлууд banner_screenshots/ дотор аль хэдийн байгаа; upsert нь idempotent тул
+# хэсэгчлэн ingest хийгдсэн capture-уудыг дахин оруулахад давхардахгүй.
+# Run дуусахад (finish_run) тэр run-ий хавтсыг устгана.
+
+import os
+import json
+import shutil
+from typing import Dict, Iterable, Iterator
+
+from core.assets import BASE_DIR
+
+SPOOL_DIR = os.getenv("SPOOL_DIR", os.path.join(BASE_DIR, "_spool"))
+
+
+def _dump(cap: Dict) -> str:
+    cap = dict(cap)
+    # Татсан bytes-ийг хадгалахгүй (дахин татна); b"" = татах шаардлагагүй гэсэн тэмдэг
+    img_bytes = cap.get("img_bytes")
+    cap["img_bytes"] = "" if img_bytes == b"" else None
+    return json.dumps(cap, ensure_ascii=False, default=str)
+
+
+def _load(line: str) -> Dict:
+    cap = json.loads(line)
+    if cap.get("img_bytes") == "":
+        cap["img_bytes"] = b""
+    return cap
+
+
+class RunSpool:
+    """Нэг run-ий сайт тус бүрийн spool файлууд."""
+
+    def __init__(self, run_id: str, root: str = SPOOL_DIR):
+        self.run_id = str(run_id)
+        self.dir = os.path.join(root, self.run_id)
+
+    def _path(self, site: str, ext: str) -> str:
+        return os.path.join(self.dir, f"{site}.{ext}")
+
+    def start(self, site: str):
+        """Шинэ scrape оролдлого: өмнөх (дутуу) spool-ийг цэвэрлэнэ."""
+        os.makedirs(self.dir, exist_ok=True)
+        open(self._path(site, "jsonl"), "w", encoding="utf-8").close()
+        if os.path.exists(self._path(site, "done")):
+            os.remove(self._path(site, "done"))
+
+    def append(self, site: str, caps: Iterable[Dict]):
+        with open(self._path(site, "jsonl"), "a", encoding="utf-8") as f:
+            for cap in caps:
+                f.write(_dump(cap) + "\n")
+
+    def complete(self, site: str):
+        """Scraper бүрэн дууссан (бүх capture spool-д бичигдсэн)."""
+        open(self._path(site, "done"), "w").close()
+
+    def is_complete(self, site: str) -> bool:
+        return os.path.exists(self._path(site, "done")) and os.path.exists(self._path(site, "jsonl"))
+
+    def read(self, site: str) -> Iterator[Dict]:
+        with open(self._path(site, "jsonl"), encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield _load(line)
+
+    def remove(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
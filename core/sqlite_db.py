@@ -0,0 +1,1053 @@
+# -*- coding: utf-8 -*-
+# sqlite_db.py — Embedded SQLite backend (STORAGE_BACKEND=sqlite)
+#
+# Mongo сервергүйгээр (offline run, тест, benchmark) бүх pipeline болон
+# dashboard-ийг нэг машин дээр ажиллуулах зориулалттай.
+# - WAL горим: dashboard уншиж байх үед pipeline бичиж чадна
+# - Thread бүр өөрийн connection-той (threading.local)
+# - upsert_banners() нэг transaction дотор batch-аар бичнэ
+
+import os
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from core import assets
+from core.storage import (
+    BANNER_LIST_FIELDS, BULK_ACTIONS, FACET_DIMENSIONS, FACET_LIMIT, SITE_JOB_KIND, SORTABLE_FIELDS, SOV_GROUPINGS,
+    StorageBackend, facet_result,
+)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SQLITE_PATH = os.getenv("SQLITE_PATH", os.path.join(BASE_DIR, "banner_db.sqlite3"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS banners (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    site TEXT NOT NULL DEFAULT '',
+    src TEXT NOT NULL,
+    first_seen_date TEXT,
+    last_seen_date TEXT,
+    days_seen INTEGER DEFAULT 1,
+    landing_url TEXT,
+    screenshot_path TEXT,
+    width INTEGER,
+    height INTEGER,
+    ad_score INTEGER DEFAULT 0,
+    ad_reason TEXT DEFAULT '',
+    notes TEXT DEFAULT '',
+    hidden INTEGER NOT NULL DEFAULT 0,
+    is_archived INTEGER NOT NULL DEFAULT 0,
+    status TEXT,
+    created_at TEXT,
+    updated_at TEXT,
+    UNIQUE (site, src)
+);
+CREATE INDEX IF NOT EXISTS idx_banners_hidden_last ON banners (hidden, last_seen_date DESC);
+CREATE INDEX IF NOT EXISTS idx_banners_first ON banners (first_seen_date);
+CREATE INDEX IF NOT EXISTS idx_banners_last ON banners (last_seen_date);
+CREATE INDEX IF NOT EXISTS idx_banners_updated ON banners (updated_at);
+
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT,
+    status TEXT,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_timestamp ON runs (timestamp);
+
+CREATE TABLE IF NOT EXISTS daily_stats (
+    date TEXT PRIMARY KEY,
+    total_collected INTEGER,
+    new_banners INTEGER,
+    per_site TEXT,
+    last_updated TEXT
+);
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    source TEXT,
+    status TEXT NOT NULL,
+    worker TEXT,
+    requested_at TEXT,
+    started_at TEXT,
+    finished_at TEXT,
+    error TEXT,
+    result TEXT
+);
+
+CREATE TABLE IF NOT EXISTS job_locks (
+    kind TEXT PRIMARY KEY,
+    state TEXT NOT NULL DEFAULT 'idle',
+    job_id TEXT,
+    source TEXT,
+    worker TEXT,
+    heartbeat_at REAL,
+    event_seq_start INTEGER,
+    pending INTEGER NOT NULL DEFAULT 0,
+    progress TEXT
+);
+
+CREATE TABLE IF NOT EXISTS job_events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL,
+    data TEXT,
+    created_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS site_schedule (
+    site TEXT PRIMARY KEY,
+    due_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS admins (
+    username TEXT PRIMARY KEY,
+    password_hash TEXT NOT NULL,
+    created_at TEXT,
+    updated_at TEXT
+);
+"""
+
+# Хожим нэмэгдсэн баганууд: хуучин DB файл дээр ALTER TABLE-аар нэмнэ
+EXTRA_BANNER_COLUMNS = [
+    ("asset_id", "TEXT DEFAULT ''"),
+    ("brand", "TEXT DEFAULT ''"),
+    ("size_bucket", "TEXT DEFAULT ''"),
+    ("phash", "TEXT DEFAULT ''"),
+]
+EXTRA_JOB_LOCK_COLUMNS = [
+    ("pending", "INTEGER NOT NULL DEFAULT 0"),
+    ("progress", "TEXT"),
+]
+# Site job (lease queue) — цаг нь time.time() секунд (job_locks.heartbeat_at-тай адил)
+EXTRA_JOB_COLUMNS = [
+    ("run_id", "TEXT"),
+    ("site", "TEXT"),
+    ("attempts", "INTEGER NOT NULL DEFAULT 0"),
+    ("max_attempts", "INTEGER NOT NULL DEFAULT 1"),
+    ("priority", "INTEGER NOT NULL DEFAULT 0"),
+    ("available_at", "REAL"),
+    ("lease_expires_at", "REAL"),
+    ("heartbeat_at", "REAL"),
+    ("sites", "TEXT"),   # scrape job-ийн сайтын жагсаалт (JSON), NULL бол бүгд
+]
+
+# Нэмэгдсэн баганууд дээрх index-үүд (багана нэмэгдсэний дараа үүсгэнэ)
+EXTRA_BANNER_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_banners_site_first ON banners (site, first_seen_date);
+CREATE INDEX IF NOT EXISTS idx_banners_brand_first ON banners (brand, first_seen_date);
+CREATE INDEX IF NOT EXISTS idx_banners_size_first ON banners (size_bucket, first_seen_date);
+CREATE INDEX IF NOT EXISTS idx_banners_score ON banners (ad_score);
+CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (kind, status, priority DESC, available_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_run ON jobs (run_id);
+"""
+
+# Dashboard/тайлан руу буцаах баганууд (Mongo-ийн {"_id": 0} projection-той ижил)
+BANNER_COLUMNS = [
+    "site", "src", "first_seen_date", "last_seen_date", "days_seen",
+    "landing_url", "brand", "screenshot_path", "asset_id", "width", "height", "size_bucket",
+    "ad_score", "ad_reason", "notes", "hidden", "is_archived", "status",
+    "created_at", "updated_at",
+]
+_BOOL_COLUMNS = ("hidden", "is_archived")
+
+# job_events хүснэгтэд хадгалах хамгийн олон мөр (хуучныг нь устгана)
+JOB_EVENTS_KEEP = 5000
+
+
+def _now_iso() -> str:
+    return datetime.utcnow().isoformat()
+
+
+def _banner_row_to_dict(row: sqlite3.Row) -> dict:
+    d = {k: row[k] for k in row.keys() if k != "id"}
+    for k in _BOOL_COLUMNS:
+        if k in d:
+            d[k] = bool(d[k])
+    # Mongo-той адил: утгагүй талбарыг буцаахгүй
+    return {k: v for k, v in d.items() if v is not None}
+
+
+class SQLiteBackend(StorageBackend):
+    """SQLite (WAL) дээрх хэрэгжүүлэлт."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str = SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        d = os.path.dirname(os.path.abspath(path))
+        os.makedirs(d, exist_ok=True)
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        self._migrate(conn)
+        print(f"✅ Using SQLite storage: {self.path}")
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection):
+        for table, columns in (("banners", EXTRA_BANNER_COLUMNS), ("job_locks", EXTRA_JOB_LOCK_COLUMNS),
+                               ("jobs", EXTRA_JOB_COLUMNS)):
+            existing = {r["name"] for r in conn.execute(f"PRAGMA table_info({table})")}
+            for name, decl in columns:
+                if name not in existing:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+        conn.executescript(EXTRA_BANNER_INDEXES)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _tx(self):
+        """BEGIN IMMEDIATE ... COMMIT (алдаа гарвал ROLLBACK)."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @contextmanager
+    def _read(self):
+        """Олон SELECT-д нэг snapshot (WAL дээр бичигчийг хориглохгүй)."""
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        finally:
+            conn.execute("COMMIT")
+
+    # ---------------- Connection ----------------
+    def check_connection(self) -> bool:
+        try:
+            self._conn().execute("SELECT 1")
+            return True
+        except Exception as e:
+            print(f"❌ SQLite Connection Error: {e}")
+            return False
+
+    # ---------------- Pipeline ----------------
+    def _upsert_one(self, conn: sqlite3.Connection, item: dict, today_str: str) -> dict:
+        src = item.get("src")
+        site = item.get("site") or ""
+        if not src:
+            return {"status": "skipped", "reason": "no_src"}
+
+        now = _now_iso()
+        existing = conn.execute(
+            "SELECT last_seen_date, days_seen FROM banners WHERE site = ? AND src = ?",
+            (site, src),
+        ).fetchone()
+
+        if existing:
+            days_seen = existing["days_seen"] or 1
+            # days_seen: Зөвхөн өөр өдөр бол нэмэгдүүлнэ
+            if (existing["last_seen_date"] or "") != today_str:
+                days_seen += 1
+            conn.execute(
+                """UPDATE banners SET last_seen_date = ?, landing_url = ?, brand = ?, width = ?, height = ?,
+                       size_bucket = ?, days_seen = ?, updated_at = ?
+                   WHERE site = ? AND src = ?""",
+                (today_str, item.get("landing_url"), self.brand_for(item), item.get("width"), item.get("height"),
+                 self.size_bucket_for(item), days_seen, now, site, src),
+            )
+            # Screenshot амжилтгүй болсон бол хуучин asset-аа хадгална
+            if item.get("asset_id"):
+                conn.execute(
+                    "UPDATE banners SET asset_id = ?, screenshot_path = ? WHERE site = ? AND src = ?",
+                    (item["asset_id"], item.get("screenshot_path"), site, src),
+                )
+            if item.get("phash"):
+                conn.execute("UPDATE banners SET phash = ? WHERE site = ? AND src = ?", (item["phash"], site, src))
+            return {"status": "success", "new": False}
+
+        conn.execute(
+            """INSERT INTO banners (site, src, first_seen_date, last_seen_date, days_seen,
+                   landing_url, brand, screenshot_path, asset_id, phash, width, height, size_bucket, ad_score, ad_reason,
+                   notes, created_at, updated_at)
+               VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (site, src, today_str, today_str, item.get("landing_url"), self.brand_for(item), item.get("screenshot_path"),
+             item.get("asset_id", ""), item.get("phash", ""), item.get("width"), item.get("height"),
+             self.size_bucket_for(item),
+             item.get("ad_score", 0),
+             item.get("ad_reason", ""), item.get("notes", ""), now, now),
+        )
+        return {"status": "success", "new": True}
+
+    def upsert_banner(self, item: dict) -> dict:
+        return self.upsert_banners([item])[0]
+
+    def upsert_banners(self, items: Iterable[dict]) -> List[dict]:
+        items = list(items)
+        if not items:
+            return []
+        today_str = datetime.now().strftime("%Y-%m-%d")
+        results = []
+        try:
+            with self._tx() as conn:
+                for item in items:
+                    results.append(self._upsert_one(conn, item, today_str))
+            return results
+        except Exception as e:
+            print(f"DB Upsert Error: {e}")
+            return [{"status": "error", "error": str(e)} for _ in items]
+
+    def save_run(self, record: dict):
+        try:
+            with self._tx() as conn:
+                conn.execute(
+                    "INSERT INTO runs (timestamp, status, doc) VALUES (?, ?, ?)",
+                    (record.get("timestamp"), record.get("status"),
+                     json.dumps(record, ensure_ascii=False, default=str)),
+                )
+        except Exception as e:
+            print(f"Failed to save run log: {e}")
+
+    def start_run(self, record: dict) -> Optional[str]:
+        try:
+            with self._tx() as conn:
+                cur = conn.execute(
+                    "INSERT INTO runs (timestamp, status, doc) VALUES (?, ?, ?)",
+                    (record.get("timestamp"), record.get("status"),
+                     json.dumps(record, ensure_ascii=False, default=str)),
+                )
+            return str(cur.lastrowid)
+        except Exception as e:
+            print(f"Failed to save run log: {e}")
+            return None
+
+    # json_patch (RFC 7396): зөвхөн өгсөн түлхүүрүүдийг солино — зэрэг ажиллаж буй сайтууд бие биенийхээ төлөвийг дарахгүй
+    def update_run_site(self, run_id: str, site: str, fields: dict):
+        try:
+            with self._tx() as conn:
+                conn.execute(
+                    "UPDATE runs SET doc = json_patch(doc, ?) WHERE id = ?",
+                    (json.dumps({"sites": {site: fields}}, ensure_ascii=False, default=str), int(run_id)),
+                )
+        except Exception as e:
+            print(f"Failed to update run site {site}: {e}")
+
+    def finish_run(self, run_id: str, fields: dict):
+        try:
+            with self._tx() as conn:
+                conn.execute(
+                    "UPDATE runs SET doc = json_patch(doc, ?), status = COALESCE(?, status) WHERE id = ?",
+                    (json.dumps(fields, ensure_ascii=False, default=str), fields.get("status"), int(run_id)),
+                )
+        except Exception as e:
+            print(f"Failed to save run log: {e}")
+
+    def list_unfinished_runs(self) -> List[dict]:
+        rows = self._conn().execute(
+            "SELECT id, doc FROM runs WHERE status = 'running' ORDER BY timestamp DESC, id DESC"
+        ).fetchall()
+        return [dict(json.loads(row["doc"]), run_id=str(row["id"])) for row in rows]
+
+    def get_run_status(self, run_id: str) -> Optional[str]:
+        if not str(run_id).isdigit():
+            return None
+        row = self._conn().execute("SELECT status FROM runs WHERE id = ?", (int(run_id),)).fetchone()
+        return row["status"] if row else None
+
+    # Mongo-ийн $inc-тэй ижил: тоонуудыг SQL дотор нэмнэ (Python-д уншиж дахин бичихгүй)
+    def update_daily_summary(self, date_key: str, total_collected: int, new_banners: int, per_site: dict):
+        try:
+            with self._tx() as conn:
+                conn.execute(
+                    """INSERT INTO daily_stats (date, total_collected, new_banners, per_site, last_updated)
+                       VALUES (?, ?, ?, '{}', ?)
+                       ON CONFLICT(date) DO UPDATE SET
+                           total_collected = COALESCE(total_collected, 0) + excluded.total_collected,
+                           new_banners = COALESCE(new_banners, 0) + excluded.new_banners,
+                           last_updated = excluded.last_updated""",
+                    (date_key, total_collected, new_banners, _now_iso()),
+                )
+                for site, n in (per_site or {}).items():
+                    path = f'$."{site}"'
+                    conn.execute(
+                        """UPDATE daily_stats
+                           SET per_site = json_set(COALESCE(per_site, '{}'), ?,
+                                                   COALESCE(json_extract(per_site, ?), 0) + ?)
+                           WHERE date = ?""",
+                        (path, path, n, date_key),
+                    )
+        except Exception as e:
+            print(f"Failed to update daily stats: {e}")
+
+    def get_stats(self) -> dict:
+        try:
+            conn = self._conn()
+            total_banners = conn.execute("SELECT COUNT(*) FROM banners").fetchone()[0]
+            last_run = conn.execute("SELECT timestamp FROM runs ORDER BY timestamp DESC LIMIT 1").fetchone()
+            today_str = datetime.now().strftime("%Y-%m-%d")
+            today_stat = conn.execute(
+                "SELECT total_collected FROM daily_stats WHERE date = ?", (today_str,)
+            ).fetchone()
+            return {
+                "total_banners": total_banners,
+                "last_run": last_run[0] if last_run else "Never",
+                "today_collected": (today_stat[0] or 0) if today_stat else 0,
+            }
+        except Exception as e:
+            return {"error": str(e)}
+
+    # ---------------- Archive / maintenance ----------------
+    def archive_single_banner(self, site: str, src: str) -> bool:
+        try:
+            with self._tx() as conn:
+                cur = conn.execute(
+                    "UPDATE banners SET is_archived = 1, status = 'MANUAL_HIDDEN', updated_at = ? WHERE site = ? AND src = ?",
+                    (_now_iso(), site, src),
+                )
+                return cur.rowcount > 0
+        except Exception as e:
+            print(f"Archive Single Error: {e}")
+            return False
+
+    def archive_old_banners(self, days_threshold: int = 7) -> int:
+        cutoff_date = (datetime.now() - timedelta(days=days_threshold)).strftime("%Y-%m-%d")
+        try:
+            with self._tx() as conn:
+                cur = conn.execute(
+                    "UPDATE banners SET is_archived = 1, status = 'ARCHIVED', updated_at = ? "
+                    "WHERE last_seen_date < ? AND is_archived = 0",
+                    (_now_iso(), cutoff_date),
+                )
+                return cur.rowcount
+        except Exception as e:
+            print(f"Archive Error: {e}")
+            return 0
+
+    def recalculate_days_seen(self) -> int:
+        """Mongo-ийн pipeline update-тэй ижил: нэг UPDATE хуулбар DB дотор тооцоолно."""
+        try:
+            with self._tx() as conn:
+                cur = conn.execute(
+                    """UPDATE banners
+                       SET days_seen = CAST(julianday(last_seen_date) - julianday(first_seen_date) AS INTEGER) + 1,
+                           updated_at = ?
+                       WHERE julianday(first_seen_date) IS NOT NULL
+                         AND julianday(last_seen_date) IS NOT NULL
+                         AND days_seen IS NOT
+                             CAST(julianday(last_seen_date) - julianday(first_seen_date) AS INTEGER) + 1""",
+                    (_now_iso(),),
+                )
+                print(f"✅ Recalculated days_seen for {cur.rowcount} banners")
+                return cur.rowcount
+        except Exception as e:
+            print(f"Recalculate Error: {e}")
+            return 0
+
+    def backfill_asset_ids(self, resolve: Callable[[str], Optional[str]]) -> int:
+        rows = self._conn().execute(
+            "SELECT id, screenshot_path FROM banners WHERE asset_id IS NULL OR asset_id = ''"
+        ).fetchall()
+        updates, now = [], _now_iso()
+        for r in rows:
+            asset_id = resolve(r["screenshot_path"] or "")
+            if asset_id:
+                updates.append((asset_id, assets.screenshot_path_for(asset_id), now, r["id"]))
+        if updates:
+            with self._tx() as conn:
+                conn.executemany(
+                    "UPDATE banners SET asset_id = ?, screenshot_path = ?, updated_at = ? WHERE id = ?", updates
+                )
+        return len(updates)
+
+    def backfill_brands(self) -> int:
+        # ALTER TABLE-аар нэмэгдсэн багана тул хуучин мөрүүд '' (эсвэл NULL) байна
+        rows = self._conn().execute(
+            "SELECT id, landing_url, src FROM banners WHERE brand IS NULL OR brand = ''"
+        ).fetchall()
+        now = _now_iso()
+        updates = [(self.brand_for(dict(r)), now, r["id"]) for r in rows]
+        updates = [u for u in updates if u[0]]
+        if updates:
+            with self._tx() as conn:
+                conn.executemany("UPDATE banners SET brand = ?, updated_at = ? WHERE id = ?", updates)
+        return len(updates)
+
+    def backfill_size_buckets(self) -> int:
+        rows = self._conn().execute(
+            "SELECT id, width, height FROM banners WHERE size_bucket IS NULL OR size_bucket = ''"
+        ).fetchall()
+        now = _now_iso()
+        updates = [(self.size_bucket_for(dict(r)), now, r["id"]) for r in rows]
+        if updates:
+            with self._tx() as conn:
+                conn.executemany("UPDATE banners SET size_bucket = ?, updated_at = ? WHERE id = ?", updates)
+        return len(updates)
+
+    # ---------------- Dashboard ----------------
+    def find_banners(self, start_date: str = "", end_date: str = "") -> List[dict]:
+        sql = f"SELECT {', '.join(BANNER_COLUMNS)} FROM banners WHERE hidden = 0"
+        params: list = []
+        if start_date:
+            sql += " AND first_seen_date >= ?"
+            params.append(start_date)
+        if end_date:
+            sql += " AND first_seen_date <= ?"
+            params.append(end_date)
+        sql += " ORDER BY last_seen_date DESC"
+        return [_banner_row_to_dict(r) for r in self._conn().execute(sql, params)]
+
+    @staticmethod
+    def _dimension_where(filters: dict) -> dict:
+        """Facet хэмжигдэхүүн тус бүрийн (нөхцөл, параметрүүд): {"site": (sql, [..]), ...}"""
+        conds = {}
+        if filters.get("site"):
+            conds["site"] = ("site = ?", [filters["site"]])
+        if filters.get("brand"):
+            conds["brand"] = ("brand = ?", [filters["brand"]])
+        if filters.get("size") == "unknown":
+            # migrate хийгдээгүй (size_bucket хоосон) мөрүүд ч энд орно
+            conds["size"] = ("(size_bucket IS NULL OR size_bucket IN ('', 'unknown'))", [])
+        elif filters.get("size"):
+            conds["size"] = ("size_bucket = ?", [filters["size"]])
+        today = filters.get("today")
+        if today and filters.get("status") == "active":
+            conds["status"] = ("last_seen_date = ?", [today])
+        elif today and filters.get("status") == "ended":
+            conds["status"] = ("(last_seen_date IS NULL OR last_seen_date != ?)", [today])
+        return conds
+
+    @classmethod
+    def _list_where(cls, filters: dict, exclude=()):
+        where, params = ["hidden = 0"], []
+        if filters.get("start"):
+            where.append("first_seen_date >= ?")
+            params.append(filters["start"])
+        if filters.get("end"):
+            where.append("first_seen_date <= ?")
+            params.append(filters["end"])
+        if filters.get("score_min") is not None:
+            where.append("ad_score >= ?")
+            params.append(filters["score_min"])
+        if filters.get("score_max") is not None:
+            where.append("ad_score <= ?")
+            params.append(filters["score_max"])
+        if filters.get("q"):
+            like = "%" + filters["q"].replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            where.append("(site LIKE ? ESCAPE '\\' OR brand LIKE ? ESCAPE '\\' "
+                         "OR landing_url LIKE ? ESCAPE '\\' OR src LIKE ? ESCAPE '\\')")
+            params += [like, like, like, like]
+        for key, (cond, args) in cls._dimension_where(filters).items():
+            if key not in exclude:
+                where.append(cond)
+                params += args
+        return where, params
+
+    def list_banners_page(self, filters: dict, sort: str = "last_seen_date", direction: int = -1,
+                          limit: int = 100, after: Optional[dict] = None) -> Tuple[List[dict], Optional[dict]]:
+        if sort not in SORTABLE_FIELDS:
+            sort = "last_seen_date"
+        desc = direction < 0
+        where, params = self._list_where(filters)
+
+        if after:
+            # (sort, id) keyset. SQLite-д NULL хамгийн бага: DESC-д сүүлд, ASC-д эхэнд ирнэ
+            value, last_id = after.get("v"), int(after["id"])
+            op = "<" if desc else ">"
+            if value is None:
+                where.append(f"({sort} IS NULL AND id {op} ?)" if desc
+                             else f"({sort} IS NOT NULL OR ({sort} IS NULL AND id {op} ?))")
+                params.append(last_id)
+            else:
+                null_tail = f" OR {sort} IS NULL" if desc else ""
+                where.append(f"({sort} {op} ? OR ({sort} = ? AND id {op} ?){null_tail})")
+                params += [value, value, last_id]
+
+        order = "DESC" if desc else "ASC"
+        sql = (
+            f"SELECT id, {', '.join(BANNER_LIST_FIELDS)} FROM banners WHERE {' AND '.join(where)} "
+            f"ORDER BY {sort} {order}, id {order} LIMIT ?"
+        )
+        rows = self._conn().execute(sql, params + [limit + 1]).fetchall()
+
+        next_after = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_after = {"v": rows[-1][sort], "id": str(rows[-1]["id"])}
+        docs = []
+        for r in rows:
+            d = _banner_row_to_dict(r)
+            d["id"] = str(r["id"])
+            docs.append(d)
+        return docs, next_after
+
+    def iter_banners(self, filters: dict, fields: Sequence[str] = BANNER_LIST_FIELDS, sort: str = "last_seen_date",
+                     direction: int = -1, batch_size: int = 1000) -> Iterator[dict]:
+        if sort not in SORTABLE_FIELDS:
+            sort = "last_seen_date"
+        columns = [f for f in fields if f in BANNER_COLUMNS]
+        order = "DESC" if direction < 0 else "ASC"
+        where, params = self._list_where(filters)
+        cur = self._conn().execute(
+            f"SELECT {', '.join(columns)} FROM banners WHERE {' AND '.join(where)} "
+            f"ORDER BY {sort} {order}, id {order}",
+            params,
+        )
+        try:
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                for r in rows:
+                    yield _banner_row_to_dict(r)
+        finally:
+            cur.close()
+
+    def list_sites(self) -> List[str]:
+        rows = self._conn().execute("SELECT DISTINCT site FROM banners WHERE hidden = 0 AND site != '' ORDER BY site")
+        return [r[0] for r in rows]
+
+    def banner_facets(self, filters: dict, limit: int = FACET_LIMIT) -> dict:
+        # SQLite-д $facet байхгүй: нэг read transaction дотор хэмжигдэхүүн бүрт GROUP BY
+        conn = self._conn()
+        today = filters.get("today") or datetime.now().strftime("%Y-%m-%d")
+
+        def where_for(skip):
+            exclude = tuple(d for d in FACET_DIMENSIONS if d == skip)
+            where, params = self._list_where(filters, exclude)
+            return " AND ".join(where), params
+
+        def group(column, skip, top=None):
+            where, params = where_for(skip)
+            sql = f"SELECT {column}, COUNT(*) FROM banners WHERE {where} GROUP BY {column} ORDER BY 2 DESC, 1"
+            if top:
+                sql += f" LIMIT {int(top)}"
+            return [tuple(r) for r in conn.execute(sql, params)]
+
+        with self._read():
+            site = group("site", "site", limit)
+            brand = group("brand", "brand", limit)
+            size = group("size_bucket", "size")
+            where, params = where_for("status")
+            status = {"active": 0, "ended": 0}
+            for is_active, count in conn.execute(
+                f"SELECT last_seen_date = ?, COUNT(*) FROM banners WHERE {where} GROUP BY 1", [today] + params
+            ):
+                status["active" if is_active else "ended"] += count
+            where, params = where_for(None)
+            total = conn.execute(
+                f"SELECT COUNT(*), MIN(ad_score), MAX(ad_score) FROM banners WHERE {where}", params
+            ).fetchone()
+        return facet_result(total[0], total[1], total[2], site, brand, size, status)
+
+    @staticmethod
+    def _active_window(start: str, end: str, site: str = "") -> Tuple[str, list]:
+        """MongoBackend._active_window-тэй ижил: [start, end] цонхонд идэвхтэй баннерын CTE (d_from, d_to, days)."""
+        sql = """active AS (
+            SELECT site, brand, d_from, d_to, CAST(julianday(d_to) - julianday(d_from) AS INTEGER) + 1 AS days
+            FROM (
+                SELECT site, COALESCE(brand, '') AS brand,
+                       MAX(first_seen_date, ?) AS d_from, MIN(last_seen_date, ?) AS d_to
+                FROM banners
+                WHERE hidden = 0 AND first_seen_date <= ? AND last_seen_date >= ?
+                  AND date(first_seen_date) IS NOT NULL AND date(last_seen_date) IS NOT NULL{site}
+            )
+            WHERE d_to >= d_from
+        )""".format(site=" AND site = ?" if site else "")
+        return sql, [start, end, end, start] + ([site] if site else [])
+
+    def brand_presence(self, start: str, end: str, site: str = "") -> List[dict]:
+        # Өдрүүдийг recursive CTE-ээр үүсгэж идэвхтэй мужтай нь join хийнэ; collected нь daily_stats.per_site (JSON)
+        active, params = self._active_window(start, end, site)
+        sql = f"""
+            WITH RECURSIVE days(d) AS (
+                SELECT date(?) UNION ALL SELECT date(d, '+1 day') FROM days WHERE d < date(?)
+            ),
+            {active},
+            presence AS (
+                SELECT days.d AS date, a.site, a.brand, COUNT(*) AS banners
+                FROM active a JOIN days ON days.d BETWEEN a.d_from AND a.d_to
+                GROUP BY 1, 2, 3
+            ),
+            rollup AS (
+                SELECT s.date, j.key AS site, j.value AS collected
+                FROM daily_stats s, json_each(s.per_site) j
+                WHERE s.date BETWEEN ? AND ? AND json_valid(s.per_site)
+            )
+            SELECT p.date, p.site, p.brand, p.banners,
+                   SUM(p.banners) OVER (PARTITION BY p.date, p.site) AS site_banners, r.collected
+            FROM presence p LEFT JOIN rollup r ON r.date = p.date AND r.site = p.site
+            ORDER BY p.date, p.site, p.banners DESC, p.brand
+        """
+        rows = []
+        with self._read() as conn:
+            for date, site_, brand, banners, site_banners, collected in conn.execute(
+                sql, [start, end] + params + [start, end]
+            ):
+                rows.append({
+                    "date": date, "site": site_, "brand": brand, "banners": banners, "site_banners": site_banners,
+                    "share": banners / site_banners, "collected": collected,
+                })
+        return rows
+
+    def share_of_voice(self, start: str, end: str, by: str = "site", site: str = "") -> List[dict]:
+        if by not in SOV_GROUPINGS:
+            raise ValueError(f"unknown grouping: {by}")
+        active, params = self._active_window(start, end, site)
+        site_col = "site" if by == "site" else "NULL"
+        sql = f"""
+            WITH {active}
+            SELECT {site_col} AS site, brand, COUNT(*) AS banners, SUM(days) AS banner_days,
+                   SUM(SUM(days)) OVER (PARTITION BY {site_col}) AS total
+            FROM active
+            GROUP BY 1, 2
+            ORDER BY 1, 4 DESC, 2
+        """
+        return [
+            {"site": site_, "brand": brand, "banners": banners, "banner_days": banner_days, "share": banner_days / total}
+            for site_, brand, banners, banner_days, total in self._conn().execute(sql, params)
+        ]
+
+    def fetch_all_banners(self) -> List[dict]:
+        sql = f"SELECT {', '.join(BANNER_COLUMNS)} FROM banners"
+        return [_banner_row_to_dict(r) for r in self._conn().execute(sql)]
+
+    def fetch_banners_since(self, updated_since: str) -> List[dict]:
+        sql = f"SELECT {', '.join(BANNER_COLUMNS)} FROM banners WHERE updated_at >= ?"
+        return [_banner_row_to_dict(r) for r in self._conn().execute(sql, (updated_since,))]
+
+    def list_banner_keys(self) -> List[Tuple[str, str]]:
+        return [(r[0], r[1]) for r in self._conn().execute("SELECT site, src FROM banners")]
+
+    def hide_banner(self, site: str, src: str) -> bool:
+        with self._tx() as conn:
+            cur = conn.execute(
+                "UPDATE banners SET hidden = 1, updated_at = ? WHERE site = ? AND src = ?", (_now_iso(), site, src)
+            )
+            return cur.rowcount > 0
+
+    def hide_banners_before(self, cutoff_date: str) -> int:
+        with self._tx() as conn:
+            cur = conn.execute(
+                "UPDATE banners SET hidden = 1, updated_at = ? WHERE last_seen_date < ? AND hidden = 0",
+                (_now_iso(), cutoff_date)
+            )
+            return cur.rowcount
+
+    def delete_banner(self, site: str, src: str) -> bool:
+        with self._tx() as conn:
+            cur = conn.execute("DELETE FROM banners WHERE site = ? AND src = ?", (site, src))
+            return cur.rowcount > 0
+
+    _BULK_SQL = {
+        "hide": "UPDATE banners SET hidden = 1, updated_at = ?",
+        "archive": "UPDATE banners SET hidden = 1, is_archived = 1, status = 'MANUAL_HIDDEN', updated_at = ?",
+        "delete": "DELETE FROM banners",
+    }
+
+    def bulk_moderate_ids(self, action: str, ids: Sequence[str]) -> Dict[str, bool]:
+        if action not in BULK_ACTIONS:
+            raise ValueError(f"unknown action: {action}")
+        keys = {}
+        for i in ids:
+            try:
+                keys[i] = int(i)
+            except (TypeError, ValueError):
+                pass
+        found = set()
+        values = list(set(keys.values()))
+        lead = [] if action == "delete" else [_now_iso()]   # updated_at
+        with self._tx() as conn:
+            # SQLite-ийн параметрийн хязгаараас (999) хэтрэхгүйгээр хэсэглэнэ
+            for n in range(0, len(values), 500):
+                chunk = values[n:n + 500]
+                marks = ", ".join("?" * len(chunk))
+                found.update(r[0] for r in conn.execute(f"SELECT id FROM banners WHERE id IN ({marks})", chunk))
+                conn.execute(f"{self._BULK_SQL[action]} WHERE id IN ({marks})", lead + chunk)
+        return {i: keys.get(i) in found for i in ids}
+
+    def bulk_moderate_filter(self, action: str, filters: dict) -> int:
+        if action not in BULK_ACTIONS:
+            raise ValueError(f"unknown action: {action}")
+        where, params = self._list_where(filters)
+        # Зөвхөн "hidden = 0" бол шүүлтүүр огт хэрэгжээгүй (буруу утгууд хаягдсан) гэсэн үг
+        if len(where) == 1:
+            raise ValueError("filters required")
+        lead = [] if action == "delete" else [_now_iso()]   # updated_at
+        with self._tx() as conn:
+            return conn.execute(f"{self._BULK_SQL[action]} WHERE {' AND '.join(where)}", lead + params).rowcount
+
+    # ---------------- Jobs ----------------
+    def request_job(self, kind: str, source: str, stale_sec: float,
+                    sites: Optional[List[str]] = None) -> Optional[dict]:
+        now = time.time()
+        # BEGIN IMMEDIATE: бичих lock-ийг шууд авдаг тул шалгах+авах нь атомар
+        with self._tx() as conn:
+            lock = conn.execute("SELECT state, job_id, heartbeat_at FROM job_locks WHERE kind = ?", (kind,)).fetchone()
+            if lock and lock["state"] != "idle":
+                if (lock["heartbeat_at"] or 0) >= now - stale_sec:
+                    return None
+                # Хариу өгөхөө больсон worker-ийн job
+                conn.execute(
+                    "UPDATE jobs SET status = 'abandoned', finished_at = ? WHERE id = ? AND status IN ('queued', 'running')",
+                    (_now_iso(), lock["job_id"]),
+                )
+            cur = conn.execute(
+                "INSERT INTO jobs (kind, source, sites, status, requested_at) VALUES (?, ?, ?, 'queued', ?)",
+                (kind, source, None if sites is None else json.dumps(sites), _now_iso()),
+            )
+            job_id = str(cur.lastrowid)
+            conn.execute(
+                """INSERT INTO job_locks (kind, state, job_id, source, worker, heartbeat_at, event_seq_start)
+                   VALUES (?, 'queued', ?, ?, NULL, ?, NULL)
+                   ON CONFLICT(kind) DO UPDATE SET state = 'queued', job_id = excluded.job_id,
+                       source = excluded.source, worker = NULL, heartbeat_at = excluded.heartbeat_at,
+                       event_seq_start = NULL, pending = 0, progress = NULL""",
+                (kind, job_id, source, now),
+            )
+        return {"job_id": job_id, "kind": kind, "source": source, "sites": sites}
+
+    def claim_job(self, kind: str, worker: str, event_seq_start: int = 0) -> Optional[dict]:
+        with self._tx() as conn:
+            lock = conn.execute(
+                """SELECT l.job_id, l.source, j.sites FROM job_locks l LEFT JOIN jobs j ON j.id = l.job_id
+                   WHERE l.kind = ? AND l.state = 'queued'""", (kind,)
+            ).fetchone()
+            if not lock:
+                return None
+            conn.execute(
+                "UPDATE job_locks SET state = 'running', worker = ?, heartbeat_at = ?, event_seq_start = ? WHERE kind = ?",
+                (worker, time.time(), event_seq_start, kind),
+            )
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, started_at = ? WHERE id = ?",
+                (worker, _now_iso(), lock["job_id"]),
+            )
+        return {"job_id": lock["job_id"], "kind": kind, "source": lock["source"],
+                "sites": json.loads(lock["sites"]) if lock["sites"] else None}
+
+    def heartbeat_job(self, kind: str, job_id: str, progress: Optional[str] = None) -> bool:
+        with self._tx() as conn:
+            cur = conn.execute(
+                """UPDATE job_locks SET heartbeat_at = ?, progress = COALESCE(?, progress)
+                   WHERE kind = ? AND job_id = ? AND state = 'running'""",
+                (time.time(), progress, kind, job_id),
+            )
+            return cur.rowcount > 0
+
+    def defer_job(self, kind: str) -> bool:
+        with self._tx() as conn:
+            cur = conn.execute("UPDATE job_locks SET pending = 1 WHERE kind = ? AND state = 'running'", (kind,))
+            return cur.rowcount > 0
+
+    def finish_job(self, kind: str, job_id: str, status: str, error: Optional[str] = None,
+                   result: Optional[dict] = None):
+        with self._tx() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, error = ?, result = ? WHERE id = ?",
+                (status, _now_iso(), error, json.dumps(result, ensure_ascii=False, default=str) if result else None,
+                 job_id),
+            )
+            conn.execute(
+                "UPDATE job_locks SET state = 'idle', heartbeat_at = ? WHERE kind = ? AND job_id = ?",
+                (time.time(), kind, job_id),
+            )
+
+    # ---------------- Site jobs (lease queue) ----------------
+    _SITE_JOB_COLUMNS = "id, run_id, site, status, worker, attempts, max_attempts, priority, error, result"
+
+    @staticmethod
+    def _site_job(row: sqlite3.Row) -> dict:
+        return {
+            "job_id": str(row["id"]), "run_id": row["run_id"], "site": row["site"], "status": row["status"],
+            "worker": row["worker"], "attempts": row["attempts"], "max_attempts": row["max_attempts"],
+            "priority": row["priority"], "error": row["error"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+        }
+
+    def enqueue_site_jobs(self, run_id: str, sites: Sequence[dict]) -> List[str]:
+        now, now_iso = time.time(), _now_iso()
+        ids = []
+        with self._tx() as conn:
+            for s in sites:
+                cur = conn.execute(
+                    """INSERT INTO jobs (kind, source, status, requested_at, run_id, site, attempts, max_attempts,
+                           priority, available_at)
+                       VALUES (?, ?, 'queued', ?, ?, ?, 0, ?, ?, ?)""",
+                    (SITE_JOB_KIND, run_id, now_iso, run_id, s["site"], int(s.get("max_attempts", 1)),
+                     int(s.get("priority", 0)), now),
+                )
+                ids.append(str(cur.lastrowid))
+        return ids
+
+    def claim_site_job(self, worker: str, lease_sec: float) -> Optional[dict]:
+        now = time.time()
+        with self._tx() as conn:
+            row = conn.execute(
+                """SELECT id FROM jobs
+                   WHERE kind = ? AND attempts < max_attempts
+                     AND ((status = 'queued' AND available_at <= ?)
+                          OR (status = 'running' AND lease_expires_at < ?))
+                     AND run_id IN (SELECT CAST(id AS TEXT) FROM runs WHERE status = 'running')
+                   ORDER BY priority DESC, available_at LIMIT 1""",
+                (SITE_JOB_KIND, now, now),
+            ).fetchone()
+            if not row:
+                return None
+            conn.execute(
+                """UPDATE jobs SET status = 'running', worker = ?, started_at = ?, heartbeat_at = ?,
+                       lease_expires_at = ?, attempts = attempts + 1
+                   WHERE id = ?""",
+                (worker, _now_iso(), now, now + lease_sec, row["id"]),
+            )
+            job = conn.execute(f"SELECT {self._SITE_JOB_COLUMNS} FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+        return self._site_job(job)
+
+    def renew_site_lease(self, job_id: str, worker: str, lease_sec: float) -> bool:
+        now = time.time()
+        with self._tx() as conn:
+            cur = conn.execute(
+                """UPDATE jobs SET heartbeat_at = ?, lease_expires_at = ?
+                   WHERE id = ? AND worker = ? AND status = 'running'""",
+                (now, now + lease_sec, job_id, worker),
+            )
+            return cur.rowcount > 0
+
+    def finish_site_job(self, job_id: str, worker: str, status: str, error: Optional[str] = None,
+                        result: Optional[dict] = None, retry_delay: float = 0) -> Optional[str]:
+        with self._tx() as conn:
+            row = conn.execute(
+                "SELECT attempts, max_attempts FROM jobs WHERE id = ? AND worker = ? AND status = 'running'",
+                (job_id, worker),
+            ).fetchone()
+            if not row:
+                return None
+            if status == "failed" and row["attempts"] < row["max_attempts"]:
+                # Оролдлого үлдсэн бол дахин дараалалд
+                conn.execute(
+                    """UPDATE jobs SET status = 'queued', worker = NULL, lease_expires_at = NULL, error = ?,
+                           result = ?, available_at = ? WHERE id = ?""",
+                    (error, json.dumps(result, ensure_ascii=False, default=str) if result else None,
+                     time.time() + retry_delay, job_id),
+                )
+                return "queued"
+            conn.execute(
+                """UPDATE jobs SET status = ?, finished_at = ?, error = ?, result = ?, lease_expires_at = NULL
+                   WHERE id = ?""",
+                (status, _now_iso(), error,
+                 json.dumps(result, ensure_ascii=False, default=str) if result else None, job_id),
+            )
+        return status
+
+    def get_site_job(self, job_id: str) -> Optional[dict]:
+        row = self._conn().execute(
+            f"SELECT {self._SITE_JOB_COLUMNS} FROM jobs WHERE id = ? AND kind = ?", (job_id, SITE_JOB_KIND)
+        ).fetchone()
+        return self._site_job(row) if row else None
+
+    def list_site_jobs(self, run_id: str) -> List[dict]:
+        rows = self._conn().execute(
+            f"SELECT {self._SITE_JOB_COLUMNS} FROM jobs WHERE kind = ? AND run_id = ? ORDER BY site",
+            (SITE_JOB_KIND, run_id),
+        ).fetchall()
+        return [self._site_job(r) for r in rows]
+
+    def expire_site_jobs(self) -> int:
+        with self._tx() as conn:
+            cur = conn.execute(
+                """UPDATE jobs SET status = 'failed', finished_at = ?, error = 'lease expired', lease_expires_at = NULL
+                   WHERE kind = ? AND status = 'running' AND lease_expires_at < ? AND attempts >= max_attempts""",
+                (_now_iso(), SITE_JOB_KIND, time.time()),
+            )
+            return cur.rowcount
+
+    def abandon_site_jobs(self, run_id: str, error: str) -> int:
+        with self._tx() as conn:
+            cur = conn.execute(
+                """UPDATE jobs SET status = 'failed', finished_at = ?, error = ?, lease_expires_at = NULL
+                   WHERE kind = ? AND run_id = ? AND status IN ('queued', 'running')""",
+                (_now_iso(), error, SITE_JOB_KIND, run_id),
+            )
+            return cur.rowcount
+
+    def get_job_state(self, kind: str, stale_sec: float) -> dict:
+        lock = self._conn().execute("SELECT * FROM job_locks WHERE kind = ?", (kind,)).fetchone()
+        lock = dict(lock) if lock else {}
+        state = lock.get("state") or "idle"
+        fresh = (lock.get("heartbeat_at") or 0) >= time.time() - stale_sec
+        return {
+            "running": state in ("queued", "running") and fresh,
+            "state": state,
+            "job_id": lock.get("job_id"),
+            "source": lock.get("source"),
+            "event_seq_start": lock.get("event_seq_start"),
+            "pending": bool(lock.get("pending")),
+            "progress": lock.get("progress"),
+        }
+
+    # ---------------- Job events ----------------
+    def append_event(self, event_type: str, data: dict) -> int:
+        with self._tx() as conn:
+            cur = conn.execute(
+                "INSERT INTO job_events (type, data, created_at) VALUES (?, ?, ?)",
+                (event_type, json.dumps(data or {}, ensure_ascii=False, default=str), _now_iso()),
+            )
+            seq = cur.lastrowid
+            if seq % 500 == 0:
+                conn.execute("DELETE FROM job_events WHERE seq <= ?", (seq - JOB_EVENTS_KEEP,))
+        return seq
+
+    def events_since(self, seq: int, limit: int = 500) -> List[dict]:
+        rows = self._conn().execute(
+            "SELECT seq, type, data FROM job_events WHERE seq > ? ORDER BY seq LIMIT ?", (seq, limit)
+        ).fetchall()
+        return [{"seq": r["seq"], "type": r["type"], "data": json.loads(r["data"] or "{}")} for r in rows]
+
+    def latest_event_seq(self) -> int:
+        row = self._conn().execute("SELECT MAX(seq) FROM job_events").fetchone()
+        return row[0] or 0
+
+    # ---------------- Site schedule ----------------
+    def get_site_due(self) -> Dict[str, float]:
+        return {r["site"]: r["due_at"] for r in self._conn().execute("SELECT site, due_at FROM site_schedule")}
+
+    def set_site_due(self, site: str, due_at: float, expected: Optional[float] = None) -> bool:
+        with self._tx() as conn:
+            if expected is None:
+                cur = conn.execute("INSERT OR IGNORE INTO site_schedule (site, due_at) VALUES (?, ?)", (site, due_at))
+            else:
+                cur = conn.execute(
+                    "UPDATE site_schedule SET due_at = ? WHERE site = ? AND due_at = ?", (due_at, site, expected)
+                )
+            return cur.rowcount > 0
+
+    # ---------------- Admin users ----------------
+    def get_admin(self, username: str) -> Optional[Dict]:
+        row = self._conn().execute("SELECT * FROM admins WHERE username = ?", (username,)).fetchone()
+        return dict(row) if row else None
+
+    def create_admin(self, username: str, password_hash: str) -> bool:
+        now = _now_iso()
+        with self._tx() as conn:
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO admins (username, password_hash, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                (username, password_hash, now, now),
+            )
+            return cur.rowcount > 0
+
+    def update_admin_password(self, username: str, password_hash: str) -> bool:
+        with self._tx() as conn:
+            cur = conn.execute(
+                "UPDATE admins SET password_hash = ?, updated_at = ? WHERE username = ?",
+                (password_hash, _now_iso(), username),
+            )
+            return cur.rowcount > 0
@@ -0,0 +1,457 @@
+# -*- coding: utf-8 -*-
+# storage.py — Storage backend interface
+#
+# core.db доторх нийтийн функцууд (upsert_banner, save_run, ...) нь
+# STORAGE_BACKEND тохиргооноос хамаарч доорх интерфейсийн аль нэг
+# хэрэгжүүлэлт рүү дамжина:
+#   STORAGE_BACKEND=mongo  → core.db.MongoBackend (default)
+#   STORAGE_BACKEND=sqlite → core.sqlite_db.SQLiteBackend (Mongo сервергүй ажиллана)
+
+from abc import ABC, abstractmethod
+from datetime import date, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from core.brands import detect_brand
+
+
+# Dashboard-ийн жагсаалтад буцаах талбарууд (projection)
+BANNER_LIST_FIELDS = [
+    "site", "brand", "src", "landing_url", "first_seen_date", "last_seen_date", "days_seen",
+    "ad_score", "width", "height", "asset_id", "screenshot_path", "size_bucket",
+]
+
+# Server-side эрэмбэлэх боломжтой талбарууд (keyset: (талбар, id))
+SORTABLE_FIELDS = ("last_seen_date", "first_seen_date", "days_seen", "ad_score")
+
+# Баннерын хэлбэрийн ангилал (ingest үед size_bucket талбарт хадгална, facet/шүүлтүүрт ашиглана)
+SIZE_BUCKETS = ("leaderboard", "skyscraper", "rectangle", "unknown")
+
+# Төлөвийн шүүлтүүр: active = өнөөдөр харагдсан, ended = бусад
+STATUS_FILTERS = ("active", "ended")
+
+# Facet-аар тоологдох хэмжигдэхүүнүүд. Facet бүрийн тоонд өөрийнхөө шүүлтүүрийг
+# оруулахгүй (жнь: site=A сонгосон ч бусад сайтын тоо харагдсаар байна).
+FACET_DIMENSIONS = ("site", "brand", "size", "status")
+FACET_LIMIT = 50   # site/brand facet-д буцаах хамгийн олон утга
+
+# Олноор нь (bulk) хийх moderation үйлдлүүд:
+#   hide    — dashboard-оос нуух (тайланд үлдэнэ)
+#   archive — гараар архивласан (is_archived, status=MANUAL_HIDDEN) + нуух
+#   delete  — DB-ээс бүр мөсөн устгах
+BULK_ACTIONS = ("hide", "archive", "delete")
+BULK_MAX_IDS = 1000
+
+# Share of voice (SOV) тайлан. Баннер first_seen_date..last_seen_date хооронд өдөр бүр
+# идэвхтэй гэж тооцогдоно (days_seen-тэй ижил загвар); нуугдсан баннер орохгүй.
+#   presence — өдөр × сайт × брэнд: идэвхтэй баннерын тоо, тухайн сайтын тэр өдрийн хувь
+#   SOV      — [start, end] цонхонд брэндийн баннер-өдрийн нийлбэр ба хувь (сайтаар эсвэл нийтээр)
+SOV_GROUPINGS = ("site", "total")
+SOV_DEFAULT_DAYS = 30    # start/end өгөөгүй бол өнөөдрөөр дуусах цонх
+SOV_MAX_DAYS = 366
+
+# Олон машин дээрх scrape worker-уудын сайт тус бүрийн job (jobs коллекц, kind="site").
+# Lease: claim хийсэн worker lease_expires_at хүртэл эзэмшинэ, heartbeat-ээр сунгана;
+# node унавал lease дуусмагц өөр worker дахин авна (attempts < max_attempts бол).
+SITE_JOB_KIND = "site"
+SITE_JOB_DONE_STATES = ("done", "failed")
+
+
+def size_bucket(width, height) -> str:
+    """Өргөн/өндрөөс баннерын хэлбэр: 728x90 → leaderboard, 300x600 → skyscraper, 300x250 → rectangle."""
+    try:
+        w, h = int(width or 0), int(height or 0)
+    except (TypeError, ValueError):
+        return "unknown"
+    if w <= 0 or h <= 0:
+        return "unknown"
+    if w >= h * 3:
+        return "leaderboard"
+    if h >= w * 2:
+        return "skyscraper"
+    return "rectangle"
+
+
+def facet_result(total: int, score_min, score_max, site, brand, size, status) -> dict:
+    """Backend-ийн group-by үр дүнг (утга, тоо)-ны жагсаалтуудаас нэг хэлбэрт оруулах."""
+    def pairs(rows):
+        return [{"value": v, "count": c} for v, c in rows]
+
+    sizes: Dict[str, int] = {}
+    for v, c in size:
+        key = v if v in SIZE_BUCKETS else "unknown"
+        sizes[key] = sizes.get(key, 0) + c
+    return {
+        "total": total,
+        "ad_score": {"min": score_min, "max": score_max},
+        "site": pairs((v, c) for v, c in site if v),
+        "brand": pairs((v, c) for v, c in brand if v),
+        "size": pairs((b, sizes[b]) for b in SIZE_BUCKETS if sizes.get(b)),
+        "status": dict(status),
+    }
+
+
+def sov_window(start: str = "", end: str = "", today: Optional[date] = None) -> Tuple[str, str]:
+    """
+    SOV тайлангийн [start, end] цонх ('YYYY-MM-DD'). Хоосон бол end = өнөөдөр,
+    start = end - (SOV_DEFAULT_DAYS - 1). Буруу огноо / хэт урт цонх бол ValueError.
+    """
+    try:
+        end_day = date.fromisoformat(end) if end else (today or date.today())
+        start_day = date.fromisoformat(start) if start else end_day - timedelta(days=SOV_DEFAULT_DAYS - 1)
+    except ValueError:
+        raise ValueError("start/end must be YYYY-MM-DD")
+    if start_day > end_day:
+        raise ValueError("start must be <= end")
+    if (end_day - start_day).days >= SOV_MAX_DAYS:
+        raise ValueError(f"window must be at most {SOV_MAX_DAYS} days")
+    return start_day.isoformat(), end_day.isoformat()
+
+
+class StorageBackend(ABC):
+    """
+    Pipeline болон dashboard-д хэрэгтэй бүх DB үйлдлүүд.
+    abstractmethod бүрийг хэрэгжүүлэх ёстой (дутуу бол instance үүсгэхэд TypeError);
+    upsert_banners, ensure_indexes нь default-тай.
+    """
+
+    name = "base"
+
+    # ---------------- Connection ----------------
+    @abstractmethod
+    def check_connection(self) -> bool:
+        raise NotImplementedError
+
+    # ---------------- Pipeline ----------------
+    @staticmethod
+    def brand_for(item: dict) -> str:
+        """Ingest үед нэг удаа тооцоолох брэнд (capture-д брэнд ирсэн бол түүнийг)."""
+        return item.get("brand") or detect_brand(item.get("landing_url") or "", item.get("src") or "")
+
+    @staticmethod
+    def size_bucket_for(item: dict) -> str:
+        return size_bucket(item.get("width"), item.get("height"))
+
+    @abstractmethod
+    def upsert_banner(self, item: dict) -> dict:
+        raise NotImplementedError
+
+    def upsert_banners(self, items: Iterable[dict]) -> List[dict]:
+        """Олон баннерыг нэг дор хадгалах. Default: нэг нэгээр нь upsert_banner."""
+        return [self.upsert_banner(item) for item in items]
+
+    @abstractmethod
+    def save_run(self, record: dict):
+        raise NotImplementedError
+
+    # Run-ий бичлэг pipeline эхлэхэд үүсч, сайт бүрийн төлөв явцын дунд шинэчлэгдэнэ:
+    #   {"timestamp", "status": "running",
+    #    "sites": {name: {"status", "checkpoint", "attempts", "scraped", "downloaded", "collected", "new", ...}}}
+    # checkpoint: scraping → scraped (бүх capture spool-д) → ingested — тасалдсан run-ийг үргэлжлүүлэхэд
+    @abstractmethod
+    def start_run(self, record: dict) -> Optional[str]:
+        """Шинэ run бичих. Буцаах: run_id (алдаа гарвал None)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_run_site(self, run_id: str, site: str, fields: dict):
+        """run.sites[site]-д fields-ийг нэгтгэх (бусад сайтын төлөвт хүрэхгүй)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def finish_run(self, run_id: str, fields: dict):
+        """Run-ий эцсийн талбаруудыг (status, stats, duration_seconds, ...) нэгтгэх."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_unfinished_runs(self) -> List[dict]:
+        """status="running" хэвээр үлдсэн run-ууд (шинэ нь эхэнд), бичлэг бүрт "run_id" түлхүүртэй."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_run_status(self, run_id: str) -> Optional[str]:
+        """Run-ий status ("running", "success", ...). Run байхгүй бол None."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_daily_summary(self, date_key: str, total_collected: int, new_banners: int, per_site: dict):
+        """
+        Run-ий дүнг өдрийн тоймд нэмэх: total_collected, new_banners, per_site[site] бүгд атомараар
+        нэмэгдэнэ (өдөрт хэдэн ч run — бүх сайтын, зарим сайтын, үргэлжлүүлсэн — нэг л утгатай).
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_stats(self) -> dict:
+        raise NotImplementedError
+
+    # ---------------- Archive / maintenance ----------------
+    @abstractmethod
+    def archive_single_banner(self, site: str, src: str) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def archive_old_banners(self, days_threshold: int = 7) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def recalculate_days_seen(self) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def backfill_asset_ids(self, resolve: Callable[[str], Optional[str]]) -> int:
+        """
+        asset_id-гүй баннеруудад resolve(screenshot_path) → asset_id оноох (нэг удаагийн migration).
+        Буцаах: шинэчлэгдсэн баримтын тоо.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def backfill_brands(self) -> int:
+        """brand талбаргүй (ingest-ээс өмнөх) баннеруудад брэнд тооцоолж хадгалах. Буцаах: шинэчлэгдсэн тоо."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def backfill_size_buckets(self) -> int:
+        """size_bucket талбаргүй баннеруудад width/height-ээс ангилал оноох. Буцаах: шинэчлэгдсэн тоо."""
+        raise NotImplementedError
+
+    # ---------------- Dashboard ----------------
+    @abstractmethod
+    def find_banners(self, start_date: str = "", end_date: str = "") -> List[dict]:
+        """Нуугдаагүй баннерууд, last_seen_date-ээр буурахаар эрэмбэлсэн."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_banners_page(self, filters: dict, sort: str = "last_seen_date", direction: int = -1,
+                          limit: int = 100, after: Optional[dict] = None) -> Tuple[List[dict], Optional[dict]]:
+        """
+        Keyset pagination: (sort талбар, id)-аар эрэмбэлж after-аас хойшхи limit мөрийг буцаана.
+        filters: start, end (first_seen_date), site, brand, size (SIZE_BUCKETS), score_min, score_max,
+                 status ('active'/'ended'), today, q.
+        after: өмнөх хуудасны сүүлийн мөрийн {"v": sort утга, "id": id}.
+        Буцаах: (мөрүүд — "id" талбартай, дараагийн хуудасны after эсвэл None)
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_banners(self, filters: dict, fields: Sequence[str] = BANNER_LIST_FIELDS, sort: str = "last_seen_date",
+                     direction: int = -1, batch_size: int = 1000) -> Iterator[dict]:
+        """
+        list_banners_page-тэй ижил filters-ээр бүх мөрийг cursor-оос дараалан буцаана
+        (export-д: бүгдийг санах ойд ачаалахгүй, batch_size-аар татна).
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_sites(self) -> List[str]:
+        """Нуугдаагүй баннертай сайтуудын жагсаалт."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def banner_facets(self, filters: dict, limit: int = FACET_LIMIT) -> dict:
+        """
+        list_banners_page-тэй ижил filters-ийн facet тоо (facet_result хэлбэрээр):
+        total, ad_score {min, max}, site/brand/size [{"value", "count"}], status {"active", "ended"}.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def brand_presence(self, start: str, end: str, site: str = "") -> List[dict]:
+        """
+        [start, end] ('YYYY-MM-DD') цонхны өдөр бүрийн brand × site presence:
+        [{"date", "site", "brand", "banners", "site_banners", "share", "collected"}]
+        share = banners / site_banners; collected = daily_stats.per_site-ийн тухайн өдрийн тоо (байхгүй бол None).
+        Эрэмбэ: date, site, banners буурах, brand.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def share_of_voice(self, start: str, end: str, by: str = "site", site: str = "") -> List[dict]:
+        """
+        [start, end] цонхны share of voice: [{"site", "brand", "banners", "banner_days", "share"}]
+        banner_days = цонхонд идэвхтэй байсан өдрүүдийн нийлбэр, share = тухайн сайтын (by="total" бол
+        бүх сайтын, site=None) нийт banner_days-д эзлэх хувь. Эрэмбэ: site, banner_days буурах, brand.
+        """
+        raise NotImplementedError
+
+    def ensure_indexes(self):
+        """Dashboard query-нд хэрэгтэй index-үүдийг үүсгэх (idempotent)."""
+        pass
+
+    @abstractmethod
+    def fetch_all_banners(self) -> List[dict]:
+        """Тайланд зориулсан бүх баннер (нуугдсаныг оруулаад)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def fetch_banners_since(self, updated_since: str) -> List[dict]:
+        """updated_at >= updated_since (ISO) баннерууд — incremental тайланд (fetch_all_banners-тэй ижил хэлбэр)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_banner_keys(self) -> List[Tuple[str, str]]:
+        """Бүх баннерын (site, src) — incremental тайланд устгагдсан мөрийг илрүүлэхэд."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def hide_banner(self, site: str, src: str) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def hide_banners_before(self, cutoff_date: str) -> int:
+        """last_seen_date < cutoff_date баннеруудыг dashboard-оос нуух."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_banner(self, site: str, src: str) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def bulk_moderate_ids(self, action: str, ids: Sequence[str]) -> Dict[str, bool]:
+        """
+        BULK_ACTIONS-ийн нэгийг id-нуудад нэг write-аар хийх.
+        Буцаах: {id: олдсон эсэх} (буруу/олдоогүй id → False).
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def bulk_moderate_filter(self, action: str, filters: dict) -> int:
+        """
+        list_banners_page-ийн filters-т тохирох бүх баннерт үйлдлийг хийх. Буцаах: хамрагдсан тоо.
+        filters нэг ч нөхцөл үүсгэхгүй бол (бүх хүснэгтэд нөлөөлөх) ValueError.
+        """
+        raise NotImplementedError
+
+    # ---------------- Jobs (worker process ↔ web) ----------------
+    @abstractmethod
+    def request_job(self, kind: str, source: str, stale_sec: float,
+                    sites: Optional[List[str]] = None) -> Optional[dict]:
+        """
+        kind төрлийн job-ийг дараалалд оруулах. Идэвхтэй (queued/running, heartbeat шинэ) job
+        байвал None (busy). sites — зөвхөн эдгээр сайтыг scrape хийх (None бол бүгд).
+        Буцаах: {"job_id", "kind", "source", "sites"}.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def claim_job(self, kind: str, worker: str, event_seq_start: int = 0) -> Optional[dict]:
+        """Дараалалд байгаа job-ийг worker-т оноох (queued → running). Байхгүй бол None. request_job-той ижил түлхүүрүүд."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def heartbeat_job(self, kind: str, job_id: str, progress: Optional[str] = None) -> bool:
+        """
+        Ажиллаж буй job-ийн heartbeat-ийг шинэчлэх (progress өгвөл lock-д хадгална).
+        Lock өөр job-д шилжсэн бол False.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def defer_job(self, kind: str) -> bool:
+        """
+        Ажиллаж буй (running) job-д "дууссаны дараа дахин ажиллуулах" тэмдэг тавих (coalescing).
+        Lock running биш бол False — дуудагч request_job-ийг дахин оролдоно.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def finish_job(self, kind: str, job_id: str, status: str, error: Optional[str] = None,
+                   result: Optional[dict] = None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_job_state(self, kind: str, stale_sec: float) -> dict:
+        """{"running", "state", "job_id", "source", "event_seq_start", "pending", "progress"}"""
+        raise NotImplementedError
+
+    # ---------------- Site jobs (lease queue) ----------------
+    # Job dict: {"job_id", "run_id", "site", "status", "worker", "attempts", "max_attempts", "priority",
+    #            "error", "result"}; status: queued → running → done | failed (эсвэл дахин queued)
+    @abstractmethod
+    def enqueue_site_jobs(self, run_id: str, sites: Sequence[dict]) -> List[str]:
+        """run-ий сайт бүрт queued job үүсгэх. sites: [{"site", "max_attempts", "priority"}]. Буцаах: job_id-ууд."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def claim_site_job(self, worker: str, lease_sec: float) -> Optional[dict]:
+        """
+        Атомараар нэг job авах: queued (available_at өнгөрсөн) эсвэл lease нь дууссан running job,
+        attempts < max_attempts, run нь status="running" хэвээр. priority ихээс, хуучнаас нь. attempts +1.
+        Байхгүй бол None.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def renew_site_lease(self, job_id: str, worker: str, lease_sec: float) -> bool:
+        """Lease сунгах. Job өөр worker-т шилжсэн (lease алдсан) бол False."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def finish_site_job(self, job_id: str, worker: str, status: str, error: Optional[str] = None,
+                        result: Optional[dict] = None, retry_delay: float = 0) -> Optional[str]:
+        """
+        status: "done" | "failed". failed үед оролдлого үлдсэн бол retry_delay-ийн дараа дахин queued.
+        result нь queued үед ч хадгалагдана: дараагийн оролдлого job["result"]-аас new-г үргэлжлүүлнэ.
+        Буцаах: эцсийн төлөв ("done" | "failed" | "queued"), lease алдсан бол None.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_site_job(self, job_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_site_jobs(self, run_id: str) -> List[dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def expire_site_jobs(self) -> int:
+        """Lease нь дууссан, оролдлого дууссан running job-уудыг failed болгох. Буцаах: тоо."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def abandon_site_jobs(self, run_id: str, error: str) -> int:
+        """run-ий дуусаагүй (queued/running) job-уудыг failed болгох (coordinator хүлээхээ больсон). Буцаах: тоо."""
+        raise NotImplementedError
+
+    # ---------------- Job events (SSE relay) ----------------
+    @abstractmethod
+    def append_event(self, event_type: str, data: dict) -> int:
+        """Worker-ийн event-ийг DB-д нэмэх. Буцаах: өсөх дугаар (seq)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def events_since(self, seq: int, limit: int = 500) -> List[dict]:
+        """seq-ээс хойшхи event-үүд: [{"seq", "type", "data"}], seq өсөхөөр."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def latest_event_seq(self) -> int:
+        raise NotImplementedError
+
+    # ---------------- Site schedule (SCHEDULE_MODE=interval) ----------------
+    @abstractmethod
+    def get_site_due(self) -> Dict[str, float]:
+        """Сайт бүрийн дараагийн scrape хугацаа {site: epoch секунд} — бүх worker нэг хуваарьтай."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_site_due(self, site: str, due_at: float, expected: Optional[float] = None) -> bool:
+        """
+        Compare-and-set: одоогийн утга нь expected байвал л due_at болгоно (expected=None — бичлэг
+        байхгүй үед л үүсгэнэ). Буцаах: амжилттай эсэх (өөр worker түрүүлсэн бол False).
+        """
+        raise NotImplementedError
+
+    # ---------------- Admin users ----------------
+    @abstractmethod
+    def get_admin(self, username: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def create_admin(self, username: str, password_hash: str) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_admin_password(self, username: str, password_hash: str) -> bool:
+        raise NotImplementedError
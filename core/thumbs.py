@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+# thumbs.py — Screenshot-ын content hash (ETag) болон WebP thumbnail cache
+#
+# /banners/<asset_id> route-д зориулсан:
+# - content_hash(): файлын sha1 (mtime/size-аар cache-лэнэ, файл өөрчлөгдөөгүй бол дахин уншихгүй)
+# - thumbnail_path(): ?w=240 гэх мэт хүсэлтэд WebP thumbnail-ийг нэг удаа үүсгээд
+#   banner_screenshots/_thumbs/w<өргөн>/ дотор хадгална (дараагийн хүсэлтүүд дискнээс шууд)
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from PIL import Image
+
+from core import assets
+
+THUMB_ROOT = os.path.join(assets.SCREENSHOT_ROOT, "_thumbs")
+THUMB_WIDTHS = (120, 240, 480)
+THUMB_QUALITY = int(os.getenv("THUMB_QUALITY", "80"))
+HASH_CACHE_SIZE = int(os.getenv("ASSET_HASH_CACHE_SIZE", "8192"))
+
+_hash_cache: "OrderedDict[str, tuple]" = OrderedDict()
+_hash_lock = threading.Lock()
+_thumb_lock = threading.Lock()
+
+
+def content_hash(path: str) -> str:
+    """Файлын агуулгын sha1 (ETag). (mtime, size) өөрчлөгдөөгүй бол cache-аас."""
+    st = os.stat(path)
+    sig = (st.st_mtime_ns, st.st_size)
+    with _hash_lock:
+        cached = _hash_cache.get(path)
+        if cached and cached[0] == sig:
+            _hash_cache.move_to_end(path)
+            return cached[1]
+
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+
+    with _hash_lock:
+        _hash_cache[path] = (sig, digest)
+        _hash_cache.move_to_end(path)
+        while len(_hash_cache) > HASH_CACHE_SIZE:
+            _hash_cache.popitem(last=False)
+    return digest
+
+
+def normalize_width(w) -> Optional[int]:
+    """Хүссэн өргөнийг зөвшөөрөгдсөн хэмжээнд оруулах (дурын хэмжээгээр дискийг дүүргэхгүй)."""
+    try:
+        w = int(w)
+    except (TypeError, ValueError):
+        return None
+    if w <= 0:
+        return None
+    return min(THUMB_WIDTHS, key=lambda t: (t < w, abs(t - w)))
+
+
+def thumbnail_path(asset_id: str, source: str, width: int) -> str:
+    """
+    asset_id-ийн width өргөнтэй WebP thumbnail-ийн зам. Байхгүй эсвэл эх файлаас хуучин бол үүсгэнэ.
+    Эх зураг width-ээс жижиг бол томруулахгүй.
+    """
+    base = os.path.splitext(asset_id)[0]
+    target = os.path.join(THUMB_ROOT, f"w{width}", base + ".webp")
+
+    src_mtime = os.stat(source).st_mtime
+    try:
+        if os.stat(target).st_mtime >= src_mtime:
+            return target
+    except OSError:
+        pass
+
+    with _thumb_lock:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with Image.open(source) as img:
+            img.load()
+            if img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+            if img.width > width:
+                height = max(1, round(img.height * width / img.width))
+                img = img.resize((width, height), Image.LANCZOS)
+            tmp = f"{target}.{os.getpid()}.tmp"
+            img.save(tmp, "WEBP", quality=THUMB_QUALITY, method=4)
+        os.replace(tmp, target)
+    return target
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+migrate_asset_ids.py — Хуучин баннеруудад canonical asset_id оноох нэг удаагийн скрипт
+====================================================================================
+
+Энэ скрипт нь:
+1. banner_screenshots хавтсыг НЭГ удаа гүйлгэж filename → asset_id индекс үүсгэнэ (core.assets.AssetIndex)
+2. asset_id-гүй баннер бүрийн screenshot_path-аас (Windows 'C:\\Scraper\\...' зам,
+   зөвхөн filename, daily folder-тэй зам гэх мэт) filename-ийг салгаж индексээс хайна
+3. Олдсон бол asset_id болон canonical screenshot_path-ыг bulk update-аар хадгална
+
+Үүний дараа dashboard нь хүсэлт бүрт файл хайхгүй, зөвхөн asset_id ашиглана.
+
+Ашиглалт:
+    python migrate_asset_ids.py
+"""
+
+import sys
+
+from core import assets
+from core.db import check_connection, backfill_asset_ids
+
+def main():
+    print("=" * 60)
+    print("🖼  ASSET_ID MIGRATION")
+    print("=" * 60)
+    print()
+
+    if not check_connection():
+        print("❌ DB холбогдож чадсангүй")
+        sys.exit(1)
+
+    index = assets.get_index()
+    print(f"📁 {assets.SCREENSHOT_ROOT}: {len(index)} файл индекслэгдлээ")
+
+    # Замд байгаа өдөр + filename яг таарвал түүнийг, үгүй бол filename-аар хамгийн сүүлийнхийг
+    updated = backfill_asset_ids(index.resolve)
+
+    print()
+    print("=" * 60)
+    print(f"  asset_id оноосон баннер: {updated}")
+    print("=" * 60)
+    print("✅ АМЖИЛТТАЙ ДУУСЛАА!")
+    print()
+
+if __name__ == "__main__":
+    main()
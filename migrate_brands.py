@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+migrate_brands.py — Хуучин баннеруудад brand талбар оноох нэг удаагийн скрипт
+============================================================================
+
+Шинэ баннеруудын брэнд ingest (upsert_banner) үед core.brands-аар тооцоологдож
+DB-д хадгалагдана. Энэ скрипт нь түүнээс өмнө хадгалагдсан, brand талбаргүй
+баннеруудад мөн адил брэнд тооцоолж bulk update-аар хадгална.
+
+Үүний дараа dashboard болон тайлан брэндийг дахин тооцоолохгүй, шууд уншина.
+Мөн facet шүүлтүүрт хэрэгтэй size_bucket (баннерын хэлбэр) талбарыг ононо.
+
+Ашиглалт:
+    python migrate_brands.py
+"""
+
+import sys
+
+from core.db import check_connection, backfill_brands, backfill_size_buckets
+
+def main():
+    print("=" * 60)
+    print("🏷  BRAND MIGRATION")
+    print("=" * 60)
+    print()
+
+    if not check_connection():
+        print("❌ DB холбогдож чадсангүй")
+        sys.exit(1)
+
+    updated = backfill_brands()
+    sized = backfill_size_buckets()
+
+    print()
+    print("=" * 60)
+    print(f"  brand оноосон баннер: {updated}")
+    print(f"  size_bucket оноосон баннер: {sized}")
+    print("=" * 60)
+    print("✅ АМЖИЛТТАЙ ДУУСЛАА!")
+    print()
+
+if __name__ == "__main__":
+    main()
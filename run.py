@@ -3,23 +3,34 @@
 run.py — Master Pipeline (Production Version)
 ---------------------------------------------
 Энэ файл нь бүх процессыг удирдана:
-1. Scrape (Parallel)
-2. Save to DB (Upsert)
+1. Scrape (Parallel, сайт бүр тусдаа job, retry-тэй)
+2. Save to DB (Upsert) — capture pipeline-аар batch-аар, scrape явцад
 3. Update Stats
-4. Generate Excel Report
+4. Queue Excel Report job (worker.py-ийн report thread үүсгэнэ)
+
+Сайт бүрийн явц (checkpoint) runs-д бичигдэж, capture-ууд _spool/ руу хадгалагдана:
+процесс унавал run_pipeline(resume=True) нь зөвхөн дуусаагүй сайтуудыг үргэлжлүүлнэ.
 """
 
 import os
 import json
 import logging
 import traceback
-from datetime import datetime, date
+from datetime import datetime, date, timezone
+from typing import Callable, List, Optional, Set
 
 # Өөрсдийн бичсэн модулиуд
 from core import engine       # Parallel scraping engine
-import summarize    # Report generator
+from core import assets       # Screenshot index
+from core import events       # Dashboard-ийн SSE event-үүд
+from core import jobs         # Report job (давхардалгүй дараалал)
+from core import sitejobs     # SCRAPE_MODE=distributed: олон машин дээрх site job-ууд
 from core.common import ensure_dir
-from core.db import upsert_banner, save_run, update_daily_summary, check_connection
+from core.spool import RunSpool   # Checkpoint: тасалдсан run-ийг үргэлжлүүлэх capture spool
+from core.db import (
+    upsert_banners, save_run, start_run, update_run_site, finish_run, update_daily_summary, check_connection,
+    list_unfinished_runs,
+)
 
 # Замууд (Absolute paths)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -38,15 +49,49 @@ logging.basicConfig(
 )
 logger = logging.getLogger("ScraperPipeline")
 
-def run_pipeline() -> dict:
+# Үүнээс хуучин тасалдсан run-ийг үргэлжлүүлэхгүй ("interrupted" болгож хаана)
+RESUME_MAX_AGE_HOURS = float(os.getenv("RESUME_MAX_AGE_HOURS", "12"))
+
+def has_unfinished_run() -> bool:
+    """Өмнөх процесс унаснаас status="running" хэвээр үлдсэн run байгаа эсэх (worker эхлэхэд)."""
+    return bool(list_unfinished_runs())
+
+def _take_unfinished_run() -> Optional[dict]:
+    """
+    Үргэлжлүүлэх run: хамгийн сүүлийн дуусаагүй run (scrape job-ийн lock-ийг барьж байгаа тул
+    өөр run зэрэг ажиллаж байх боломжгүй — "running" run бүр тасалдсан). Хэт хуучин болон
+    илүү үлдсэнийг "interrupted" болгож spool-ийг нь устгана.
+    """
+    resumable = None
+    for run in list_unfinished_runs():
+        try:
+            age_h = (datetime.utcnow() - datetime.fromisoformat(run.get("timestamp") or "")).total_seconds() / 3600
+        except ValueError:
+            age_h = float("inf")
+        if resumable is None and age_h <= RESUME_MAX_AGE_HOURS:
+            resumable = run
+            continue
+        finish_run(run["run_id"], {"status": "interrupted", "finished_at": datetime.utcnow().isoformat()})
+        RunSpool(run["run_id"]).remove()
+        logger.info(f"⚠ Run {run['run_id']} marked interrupted (not resumed)")
+    return resumable
+
+def run_pipeline(sites: Optional[List[str]] = None, resume: bool = False,
+                 feed: Optional[Callable[[int, Set[str]], List[str]]] = None) -> dict:
     """
     Бүх процессыг дарааллаар нь ажиллуулах үндсэн функц.
     Server.py доторх Scheduler үүнийг дуудна.
+    sites — зөвхөн эдгээр сайтыг scrape хийх (SCHEDULE_MODE=interval-ийн job), None бол бүгд.
+    resume — тасалдсан run-ийн дуусаагүй сайтуудыг л үргэлжлүүлэх (бүрэн scrape хийгдсэн сайтыг spool-оос).
+    feed — ажиллах явцад шинээр due болсон сайтуудыг run-д нэмэх (engine.run_site_jobs-ийн feed).
     """
     start_time = datetime.now()
     ensure_dir(SCREENSHOT_DIR)
     
-    logger.info("▶ PIPELINE STARTED: Starting full scrape job...")
+    if resume:
+        logger.info("▶ PIPELINE STARTED: Resuming interrupted run...")
+    else:
+        logger.info(f"▶ PIPELINE STARTED: Starting {'full' if sites is None else ', '.join(sites)} scrape job...")
 
     if not check_connection():
         msg = "❌ Database connection failed! Aborting pipeline."
@@ -63,62 +108,84 @@ def run_pipeline() -> dict:
     
     current_date_key = date.today().isoformat()
 
+    if resume:
+        resumed = _take_unfinished_run()
+        if not resumed:
+            logger.info("ℹ No interrupted run to resume")
+            return {"status": "skipped", "stats": stats}
+        run_id = resumed["run_id"]
+        # Өдрийн тойм run эхэлсэн өдөрт бичигдэнэ (timestamp нь UTC, date_key нь локал огноо)
+        started = datetime.fromisoformat(resumed["timestamp"]).replace(tzinfo=timezone.utc).astimezone()
+        current_date_key = started.date().isoformat()
+        previous = resumed.get("sites") or {}
+        for site_name, state in previous.items():
+            if state.get("status") == "ingested":
+                stats["new_banners"] += state.get("new", 0)
+                stats["per_site"][site_name] = state.get("collected", 0)
+                stats["total_collected"] += state.get("collected", 0)
+            elif sitejobs.SCRAPE_MODE != "distributed":
+                # Тасалдсан сайтын аль хэдийн орсон шинэ баннерууд дахин ingest хийхэд "хуучин" болно
+                # (distributed: run_distributed нь site job-уудын result-аас тооцно)
+                stats["new_banners"] += state.get("new", 0)
+        site_confs = [c for c in engine.SITES_CONFIG
+                      if c["name"] in previous and previous[c["name"]].get("status") != "ingested"]
+        finish_run(run_id, {"resumed_at": datetime.utcnow().isoformat()})
+        logger.info(f"♻ Resuming run {run_id}: {', '.join(c['name'] for c in site_confs) or 'nothing left'}")
+    else:
+        site_confs = engine.SITES_CONFIG if sites is None else [c for c in engine.SITES_CONFIG if c["name"] in sites]
+
+        # Run-ий бичлэг эхэнд нь: сайт бүрийн төлөв явцын дунд runs-д харагдана
+        run_id = start_run({
+            "timestamp": datetime.utcnow().isoformat(),
+            "status": "running",
+            "sites": {site["name"]: {"status": "pending", "attempts": 0} for site in site_confs},
+        })
+    # Capture-уудыг диск рүү: процесс унавал дараагийн эхлэлд scrape хийгдсэн сайтыг дахин browser-оор уншихгүй
+    spool = RunSpool(run_id) if run_id else None
+
+    def ingest(site_name: str, items: list) -> dict:
+        """
+        Нэг сайтын capture-уудын batch-ийг DB-д хадгалах (engine-ийн capture pipeline-аас дуудна).
+        stats-ийг энд нэмэхгүй: retry нь ижил мөрүүдийг дахин ingest хийдэг тул сайтын эцсийн
+        төлөвөөс (run_site_jobs-ийн collected/new) нэг удаа тооцно.
+        """
+        collected, new = 0, 0
+        for res in upsert_banners(items):
+            # Шинэ эсвэл хуучин эсэхийг тоолох
+            if res.get("new"):
+                new += 1
+            collected += 1
+        logger.info(f"💾 {site_name}: saved batch of {collected} (new: {new})")
+        return {"collected": collected, "new": new}
+
+    def on_site_status(site_name: str, changes: dict):
+        if run_id:
+            update_run_site(run_id, site_name, changes)
+
     try:
         # ---------------------------------------------------------
-        # АЛХАМ 1: БҮХ САЙТААС ЗЭРЭГ МЭДЭЭЛЭЛ ТАТАХ (Parallel Scrape)
+        # АЛХАМ 1-2: САЙТ БҮР ТУСДАА JOB — SCRAPE → ШУУД DB-Д ХАДГАЛАХ
         # ---------------------------------------------------------
         logger.info("... Requesting data from Engine ...")
         
-        # engine.py доторх scrape_all_sites функц нь ThreadPool ашиглан
-        # бүх сайтыг зэрэг уншиж, үр дүнгээ Dict хэлбэрээр буцаана.
-        raw_data = engine.scrape_all_sites()
+        # engine.run_site_jobs нь сайт бүрийг (retry-тэй) зэрэг уншиж,
+        # capture-уудыг scrape хийх явцад нь batch-аар ingest() руу өгнө.
+        if sitejobs.SCRAPE_MODE == "distributed":
+            # Олон node: сайт бүр jobs коллекцид орж site_worker.py-ууд scrape хийнэ (ingest API-аар)
+            site_states = sitejobs.run_distributed(run_id, stats, site_confs, feed=feed)
+        else:
+            site_states = engine.run_site_jobs(ingest, on_status=on_site_status, sites=site_confs, spool=spool,
+                                               feed=feed)
+            for site_name, state in site_states.items():
+                stats["per_site"][site_name] = state.get("collected", 0)
+                stats["total_collected"] += state.get("collected", 0)
+                stats["new_banners"] += state.get("new", 0)
 
-        # ---------------------------------------------------------
-        # АЛХАМ 2: ӨГӨГДЛИЙН САНД ХАДГАЛАХ (MongoDB Upsert)
-        # ---------------------------------------------------------
-        logger.info("... Saving data to MongoDB ...")
-        
-        for site_name, items in raw_data.items():
-            count = len(items)
-            stats["per_site"][site_name] = count
-            
-            for item in items:
-                try:
-                    # ✅ ЗАСВАРЛАСАН: Daily folder замыг хадгалах
-                    if "screenshot_path" in item and item["screenshot_path"]:
-                        orig_path = item["screenshot_path"]
-                        
-                        # Хэрэв absolute path байвал relative болгох
-                        if os.path.isabs(orig_path):
-                            # Absolute path-аас banner_screenshots/ хэсгийг олох
-                            if "banner_screenshots" in orig_path:
-                                idx = orig_path.find("banner_screenshots")
-                                item["screenshot_path"] = orig_path[idx:]
-                        else:
-                            # Relative path бол banner_screenshots/ эхэлдэг эсэхийг шалгах
-                            if not orig_path.startswith("banner_screenshots"):
-                                # Daily folder байгаа эсэхийг шалгах (YYYY-MM-DD format)
-                                parts = orig_path.replace("\\", "/").split("/")
-                                
-                                # Хэрэв эхний хэсэг нь огноо бол (2025-12-24)
-                                if len(parts) >= 2 and len(parts[0]) == 10 and parts[0][4] == '-':
-                                    # Daily folder + filename
-                                    item["screenshot_path"] = f"banner_screenshots/{orig_path}"
-                                else:
-                                    # Зөвхөн filename
-                                    item["screenshot_path"] = f"banner_screenshots/{orig_path}"
-                            
-                    # DB руу хадгалах
-                    res = upsert_banner(item)
-                    
-                    # Шинэ эсвэл хуучин эсэхийг тоолох
-                    if res.get("new"):
-                        stats["new_banners"] += 1
-                    stats["total_collected"] += 1
-                    
-                except Exception as e:
-                    logger.error(f"❌ DB Save Error on {site_name}: {e}")
-                    stats["errors"].append(f"{site_name} item error: {str(e)}")
+        for site_name, state in site_states.items():
+            stats["per_site"].setdefault(site_name, 0)
+            if state.get("status") != "ingested":
+                logger.error(f"❌ {site_name}: {state.get('status')} ({state.get('error')})")
+                stats["errors"].append(f"{site_name} {state.get('status')}: {state.get('error')}")
 
         # ---------------------------------------------------------
         # АЛХАМ 3: АЖИЛЛАГААНЫ ТҮҮХ БОЛОН ӨДРИЙН ТОЙМ ХАДГАЛАХ
@@ -126,14 +193,19 @@ def run_pipeline() -> dict:
         duration = (datetime.now() - start_time).total_seconds()
         
         run_record = {
-            "timestamp": datetime.utcnow().isoformat(),
+            "finished_at": datetime.utcnow().isoformat(),
             "stats": stats,
             "duration_seconds": duration,
-            "status": "success"
+            "status": "partial" if stats["errors"] else "success"
         }
-        save_run(run_record)
+        if run_id:
+            finish_run(run_id, run_record)
+            spool.remove()
+        else:
+            save_run(dict(run_record, timestamp=run_record["finished_at"], sites=site_states))
 
-        # Өдрийн нэгдсэн статистикийг шинэчлэх (Dashboard-д зориулж)
+        # Өдрийн нэгдсэн статистикт энэ run-ий дүнг нэмэх (Dashboard-д зориулж). Тасалдсан run тоймд
+        # юу ч бичээгүй тул үргэлжлүүлсэн run өмнөх сайтуудынхаа дүнг оролцуулан нэг удаа нэмнэ.
         update_daily_summary(
             current_date_key, 
             total_collected=stats["total_collected"],
@@ -142,12 +214,20 @@ def run_pipeline() -> dict:
         )
 
         logger.info(f"✔ DB Sync Complete. Duration: {duration:.2f}s")
+        events.publish("db_sync", {
+            "total_collected": stats["total_collected"],
+            "new_banners": stats["new_banners"],
+            "duration_seconds": duration,
+        })
+
+        # Шинэ screenshot-уудыг dashboard-ийн индекст нэмэх
+        assets.refresh_index()
 
         # ---------------------------------------------------------
-        # АЛХАМ 4: EXCEL ТАЙЛАН ҮҮСГЭХ (Summarize)
+        # АЛХАМ 4: EXCEL ТАЙЛАН — тусдаа report job (worker.py-ийн report thread)
         # ---------------------------------------------------------
-        logger.info("📊 Generating Excel Summary Report...")
-        summarize.main() # summarize.py файлыг ажиллуулна
+        report = jobs.request_report("Pipeline")
+        logger.info(f"📊 Report job {report['status']} ({report['job_id']})")
         
         logger.info(f"🏁 PIPELINE FINISHED SUCCESSFULLY. Total: {stats['total_collected']}, New: {stats['new_banners']}")
         return run_record
@@ -159,12 +239,16 @@ def run_pipeline() -> dict:
         logger.error(traceback.format_exc())
         
         # Алдааны мэдээллийг DB-д хадгалах
-        save_run({
-            "timestamp": datetime.utcnow().isoformat(),
+        failed = {
             "stats": stats,
             "status": "failed",
             "error": error_msg
-        })
+        }
+        if run_id:
+            finish_run(run_id, dict(failed, finished_at=datetime.utcnow().isoformat()))
+            spool.remove()
+        else:
+            save_run(dict(failed, timestamp=datetime.utcnow().isoformat()))
         return {"status": "failed", "error": error_msg}
 
 if __name__ == "__main__":
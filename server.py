@@ -1,24 +1,28 @@
 # server.py — Fixed Brand Detection Logic + Date Filter + Cleanup + LOGIN
 import os
+import json
+import hmac
+import base64
 import threading
-import logging
 import datetime
 import secrets
-import glob
+from collections import deque
 from functools import wraps
 from datetime import timedelta
-from urllib.parse import urlparse
-from flask import Flask, jsonify, render_template, send_from_directory, url_for, request, redirect, session, flash
+from flask import Flask, Response, stream_with_context, jsonify, render_template, send_file, send_from_directory, url_for, request, redirect, session, flash, abort
 from werkzeug.security import generate_password_hash, check_password_hash
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.cron import CronTrigger
 
-import run
-from core.db import banners_col, db
+from core import assets, cache, events, exports, jobs, sitejobs, thumbs
+from core.brands import detect_brand
+from core.storage import BULK_ACTIONS, BULK_MAX_IDS, SIZE_BUCKETS, SOV_GROUPINGS, STATUS_FILTERS, sov_window
+from core.db import (
+    check_connection, list_banners_page, iter_banners, list_sites, banner_facets, ensure_indexes, get_stats, hide_banner, hide_banners_before, delete_banner as db_delete_banner,
+    bulk_moderate_ids, bulk_moderate_filter, brand_presence, share_of_voice, recalculate_days_seen, get_admin, create_admin, update_admin_password as db_update_admin_password,
+    append_event, events_since, latest_event_seq, STORAGE_BACKEND,
+)
 
 # Setup
 app = Flask(__name__, template_folder="templates", static_folder="static")
-logging.getLogger('apscheduler').setLevel(logging.WARNING)
 
 # =====================================================
 # АЮУЛГҮЙ БАЙДЛЫН ТОХИРГОО (LOGIN)
@@ -37,34 +41,18 @@ app.config.update(
 # MONGODB-Д ADMIN ХЭРЭГЛЭГЧ УДИРДАХ
 # =====================================================
 
-admins_col = db["admins"] if db is not None else None
-
-def get_admin(username):
-    if admins_col is None:
-        return None
-    return admins_col.find_one({"username": username})
-
-def create_default_admin():
-    if admins_col is None:
-        return
-    existing = admins_col.find_one({"username": "admin"})
-    if not existing:
-        admins_col.insert_one({
-            "username": "admin",
-            "password_hash": generate_password_hash("admin123"),
-            "created_at": datetime.datetime.utcnow(),
-            "updated_at": datetime.datetime.utcnow()
-        })
+def create_default_admin() -> bool:
+    if not check_connection():
+        return False
+    if get_admin("admin") is None:
+        create_admin("admin", generate_password_hash("admin123"))
         print("✅ Default admin user created (username: admin, password: admin123)")
+    return True
 
 def update_admin_password(username, new_password):
-    if admins_col is None:
+    if not check_connection():
         return False
-    result = admins_col.update_one(
-        {"username": username},
-        {"$set": {"password_hash": generate_password_hash(new_password), "updated_at": datetime.datetime.utcnow()}}
-    )
-    return result.modified_count > 0
+    return db_update_admin_password(username, generate_password_hash(new_password))
 
 def verify_admin(username, password):
     admin = get_admin(username)
@@ -72,7 +60,17 @@ def verify_admin(username, password):
         return True
     return False
 
-create_default_admin()
+# Import үед DB хүлээхгүй: default admin болон index-үүдийг анхны хүсэлт дээр (DB бэлэн болмогц) үүсгэнэ
+_DB_BOOTSTRAPPED = False
+
+@app.before_request
+def ensure_db_bootstrap():
+    global _DB_BOOTSTRAPPED
+    if not _DB_BOOTSTRAPPED:
+        _DB_BOOTSTRAPPED = create_default_admin()
+        if _DB_BOOTSTRAPPED:
+            ensure_indexes()
+            EVENT_RELAY.start()
 
 # =====================================================
 # BRUTE-FORCE ХАМГААЛАЛТ
@@ -193,274 +191,113 @@ def change_password():
 # ХУУЧИН КОД (ӨӨРЧЛӨӨГҮЙ) - Global State
 # =====================================================
 
-SCRAPE_LOCK = threading.Lock()
-IS_RUNNING = False
-LOG_BUFFER = []
-
-# -----------------------------------------------------------
-# БРЭНД ТАНИХ ЛОГИК (САЙЖРУУЛСАН)
-# -----------------------------------------------------------
-BRAND_MAP = {
-    # Банкууд
-    "khanbank": "Хаан Банк", "golomt": "Голомт Банк", "tdbm": "ХХБ (TDB)",
-    "statebank": "Төрийн Банк", "capitron": "Капитрон", "bogdbank": "Богд Банк",
-    "nibs": "ҮХОБ", "transbank": "Тээвэр Хөгжлийн Банк", "xacbank": "Хас Банк",
-    
-    # Төлбөрийн системүүд
-    "qpay": "QPay", "monpay": "MonPay", "socialpay": "SocialPay",
-    "toki": "Toki", "storepay": "StorePay", "lendmn": "LendMN",
-    
-    # Телеком
-    "unitel": "Unitel", "mobicom": "Mobicom", "skytel": "Skytel",
-    "gmobile": "G-Mobile", "ondo": "Ondo",
-    
-    # Мэдээллийн сайтууд
-    "gogo": "GoGo.mn", "univision": "Univision", "news.mn": "News.mn",
-    "ikon": "Ikon.mn", "caak": "Caak.mn",
-    
-    # Дэлгүүрүүд
-    "shoppy": "Shoppy", "uran": "Uran", "bsb": "BSB", "pc-mall": "PC Mall",
-    "next": "Next Electronics", "nomin": "Nomin", "emart": "Emart",
-    "cu-mongolia": "CU", "gs25": "GS25",
-    
-    # Бусад
-    "tavanbogd": "Tavan Bogd", "mcs": "MCS", "apu": "APU",
-    "unegui": "Unegui.mn", "zangia": "Zangia.mn", "ihelp": "iHelp",
-    "koreanair": "Korean Air", "freshpack": "Freshpack", "sain": "Sain Electronics",
-    
-    # Тоглоом/Бооцоо
-    "bet": "Betting", "1xbet": "1xBet", "melbet": "MelBet",
-    
-    # Banner сервисүүд (эдгээрийг skip хийх)
-    "banner.bolor": None,  # Banner redirect URL - skip
-    "bit.ly": None,  # Short URL - skip
-}
-
-def detect_brand(url: str, src: str) -> str:
-    """
-    Landing URL болон src-аас брэндийг таних.
-    Redirect URL (banner.bolor.net/pub/jump) байвал query параметрээс бодит URL-г олох оролдлого хийнэ.
-    """
-    if not url:
-        return ""
-    
-    text_to_check = (str(url) + " " + str(src)).lower()
-    
-    # Эхлээд BRAND_MAP-аас шууд хайх
-    for key, brand_name in BRAND_MAP.items():
-        if brand_name is None:
-            continue  # Skip marker
-        if key in text_to_check:
-            return brand_name
-    
-    # Хэрэв redirect URL бол (banner.bolor.net), query-оос бодит URL олох
-    try:
-        parsed = urlparse(url)
-        if "banner.bolor" in (parsed.hostname or ""):
-            # Query string-аас бодит landing URL олох оролдлого
-            from urllib.parse import parse_qs
-            qs = parse_qs(parsed.query)
-            # Боломжит key-үүд: url, redirect, target, dest
-            for key in ['url', 'redirect', 'target', 'dest', 'u']:
-                if key in qs:
-                    real_url = qs[key][0]
-                    return detect_brand(real_url, "")  # Рекурсив дуудалт
-    except:
-        pass
-    
-    # Хэрэв BRAND_MAP-д байхгүй бол домэйнээс авах оролдлого
-    try:
-        parsed = urlparse(url)
-        hostname = parsed.hostname or ""
-        if hostname:
-            # www. хасах
-            if hostname.startswith("www."):
-                hostname = hostname[4:]
-            
-            # Banner/redirect сервисүүдийг skip
-            skip_hosts = ["banner.bolor", "bit.ly", "goo.gl", "tinyurl", "t.co"]
-            if any(skip in hostname for skip in skip_hosts):
-                return ""
-            
-            # Эхний хэсгийг авах (subdomain-гүй)
-            parts = hostname.split(".")
-            if len(parts) >= 2:
-                # Сүүлийн хоёрыг авах (domain.tld)
-                domain = parts[-2]
-                if len(domain) > 2:  # "mn", "co" гэх мэт богино домэйнүүдийг хасах
-                    return domain.title()  # Capitalize
-    except:
-        pass
-    
-    return ""
+LOG_BUFFER = deque(maxlen=200)
 
 def ui_logger(message: str):
     timestamp = datetime.datetime.now().strftime("%H:%M:%S")
     entry = f"[{timestamp}] {message}"
     print(entry)
-    global LOG_BUFFER
-    LOG_BUFFER.append(entry)
-    if len(LOG_BUFFER) > 200: LOG_BUFFER.pop(0)
-
-def job_runner(source="Auto"):
-    global IS_RUNNING
-    if IS_RUNNING:
-        ui_logger(f"⚠ {source}: Scraper is busy.")
-        return
-    with SCRAPE_LOCK:
-        IS_RUNNING = True
-        global LOG_BUFFER
-        LOG_BUFFER = []
-        ui_logger(f"🚀 {source}: Starting Pipeline...")
-        try:
-            res = run.run_pipeline()
-            if res.get("status") == "failed":
-                ui_logger(f"❌ Failed: {res.get('error')}")
-            else:
-                stats = res.get("stats", {})
-                ui_logger(f"✅ Done. Total: {stats.get('total_collected')}, New: {stats.get('new_banners')}")
-        except Exception as e:
-            ui_logger(f"❌ Error: {e}")
-        finally:
-            IS_RUNNING = False
+    # job_events-ээр: бүх web процессын SSE клиентүүд (болон LOG_BUFFER) EventRelay-ээр авна
+    try:
+        append_event("log", {"line": entry})
+    except Exception as e:
+        print(f"Event write error: {e}")
 
 # =====================================================
-# ✅ SCREENSHOT FINDER - ХУУЧИН/ШИНЭ ЗАМЫГ ДЭМЖИХ
+# SCRAPE JOB — worker.py процесс ажиллуулна
 # =====================================================
+# Scheduler болон pipeline энэ процесст ажиллахгүй: web нь job хүсэлтийг DB-д
+# бичиж, worker-ийн event-үүдийг EventRelay-ээр уншиж SSE клиентүүдэд дамжуулна.
+# Тиймээс server.py-г олон процессоор (gunicorn -w N) ажиллуулж болно.
+
+def _on_job_event(e: dict):
+    data = e["data"]
+    if e["type"] == "log":
+        LOG_BUFFER.append(data.get("line", ""))
+    elif e["type"] == "state":
+        if data.get("running"):
+            LOG_BUFFER.clear()
+        else:
+            # Шинэ дата орсон тул dashboard-ийн cache-ийг хүчингүй болгоно
+            cache.invalidate()
 
-def find_screenshot(screenshot_path: str) -> tuple:
-    """
-    Screenshot файлыг олох функц.
-    Хуучин (daily folder-гүй) болон шинэ (daily folder-тэй) замуудыг дэмжинэ.
-    
-    Returns:
-        tuple: (found_path, relative_path) эсвэл (None, None)
-    """
-    if not screenshot_path:
-        return None, None
-    
-    # 1. Шууд өгөгдсөн замаар шалгах
-    norm_path = os.path.normpath(screenshot_path)
-    if os.path.exists(norm_path):
-        try:
-            rel_path = os.path.relpath(norm_path, "banner_screenshots")
-            rel_path = rel_path.replace("\\", "/")
-            return norm_path, rel_path
-        except ValueError:
-            pass
-    
-    # 2. Filename авч, daily folder-уудаас хайх
-    filename = os.path.basename(screenshot_path)
-    
-    # banner_screenshots дотор бүх daily folder-уудыг шалгах
-    screenshots_dir = "banner_screenshots"
-    if os.path.exists(screenshots_dir):
-        # Эхлээд root-оос хайх (хуучин файлуудын хувьд)
-        root_path = os.path.join(screenshots_dir, filename)
-        if os.path.exists(root_path):
-            return root_path, filename
-        
-        # Дараа нь daily folder-уудаас хайх (шинэ файлуудын хувьд)
-        # glob ашиглан YYYY-MM-DD хэлбэрийн folder-уудыг олох
-        pattern = os.path.join(screenshots_dir, "????-??-??", filename)
-        matches = glob.glob(pattern)
-        if matches:
-            # Хамгийн сүүлийн огноотойг авах (sorted reverse)
-            matches.sort(reverse=True)
-            found_path = matches[0]
-            rel_path = os.path.relpath(found_path, screenshots_dir)
-            rel_path = rel_path.replace("\\", "/")
-            return found_path, rel_path
-    
-    return None, None
+EVENT_RELAY = jobs.EventRelay(on_event=_on_job_event)
+
+# Screenshot индексийг background-д урьдчилан үүсгэх (анхны хүсэлт scan хүлээхгүй)
+threading.Thread(target=assets.get_index, daemon=True).start()
 
 # =====================================================
-# ✅ SCHEDULER - ӨДӨРТ 2 УДАА (09:00 & 18:00)
+# ROUTES
 # =====================================================
-# ЧУХАЛ: Ямар ч нөхцөлгүй шууд эхлүүлнэ - Docker/Production-д ажиллана!
-
-scheduler = BackgroundScheduler()
-
-# Өглөө 09:00 цагт
-scheduler.add_job(
-    job_runner, 
-    CronTrigger(hour=9, minute=0, timezone='Asia/Ulaanbaatar'), 
-    id='morning_scrape',
-    replace_existing=True
-)
 
-# Орой 18:00 цагт
-scheduler.add_job(
-    job_runner, 
-    CronTrigger(hour=18, minute=0, timezone='Asia/Ulaanbaatar'), 
-    id='evening_scrape',
-    replace_existing=True
-)
+API_PAGE_SIZE = 100
+THUMB_WIDTH = 240            # Хүснэгтэд харуулах thumbnail-ийн өргөн
+IMAGE_MAX_AGE = 31536000     # asset_id нь нэг удаа бичигддэг файл тул 1 жил cache-лэнэ
+API_PAGE_SIZE_MAX = 500
 
-scheduler.start()
-print("✅ Scheduler started. Jobs run at 09:00 & 18:00 (Asia/Ulaanbaatar)")
+def present_banner(r: dict, today_str: str) -> dict:
+    """DB мөрийг dashboard-д харуулах хэлбэрт оруулах (Status, Brand, Screenshot URL)"""
+    if r.get("last_seen_date", "") == today_str:
+        r['status'] = '🟢 ИДЭВХТЭЙ'
+    else:
+        r['status'] = '🟠 ДУУССАН'
+
+    # Screenshot: DB-д хадгалсан canonical asset_id (дискэнд хандахгүй).
+    # Migration хийгдээгүй хуучин бичлэгийг санах ой дахь AssetIndex-ээс O(1) хайна.
+    asset_id = r.get("asset_id") or assets.get_index().resolve(r.get("screenshot_path"))
+    r['screenshot_file'] = url_for('serve_banner_image', filename=asset_id) if asset_id else None
+    r['screenshot_thumb'] = url_for('serve_banner_image', filename=asset_id, w=THUMB_WIDTH) if asset_id else None
+
+    # Brand: ingest үед хадгалсан талбар. brand-гүй хуучин бичлэгт л тооцоолно.
+    # Хэрэв брэнд олдохгүй бол сайтын нэрийг ашиглана
+    brand = r.get('brand') or detect_brand(r.get('landing_url', ''), r.get('src', ''))
+    r['brand'] = brand or r.get('site', 'Тодорхойгүй')
+    return r
+
+def encode_cursor(after):
+    if not after:
+        return None
+    raw = json.dumps(after, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
 
-# =====================================================
-# ROUTES
-# =====================================================
+def decode_cursor(token: str):
+    """Клиентээс ирсэн cursor-ыг задлах (буруу бол ValueError)"""
+    try:
+        after = json.loads(base64.urlsafe_b64decode(token.encode("ascii")).decode("utf-8"))
+    except Exception:
+        raise ValueError("invalid cursor")
+    if not isinstance(after, dict) or "id" not in after:
+        raise ValueError("invalid cursor")
+    return after
+
+def parse_filters(args, today_str: str) -> dict:
+    """Dashboard-ийн шүүлтүүрийн query параметрүүд (буруу тоон утга бол ValueError)."""
+    filters = {
+        "start": args.get("start", ""),
+        "end": args.get("end", ""),
+        "site": args.get("site", ""),
+        "brand": args.get("brand", ""),
+        "size": args.get("size", "") if args.get("size") in SIZE_BUCKETS else "",
+        "status": args.get("status", "") if args.get("status") in STATUS_FILTERS else "",
+        "q": args.get("q", "").strip(),
+        "today": today_str,
+    }
+    for key in ("score_min", "score_max"):
+        raw = args.get(key)
+        raw = "" if raw is None else str(raw).strip()
+        try:
+            filters[key] = int(raw) if raw else None
+        except ValueError:
+            raise ValueError(f"invalid {key}")
+    return filters
 
 @app.route("/")
 @login_required
 def index():
-    # 1. Filter Parameters
+    # Мөрүүдийг хуудас хуудсаар /api/banners-аас (scroll хийх үед) татна
     start_date = request.args.get('start', '')
     end_date = request.args.get('end', '')
 
-    # Үндсэн query: Нуугдсан (hidden=True) заруудыг харуулахгүй
-    query = {"hidden": {"$ne": True}}
-
-    # 2. Date Filter Logic
-    if start_date or end_date:
-        date_filter = {}
-        if start_date:
-            date_filter["$gte"] = start_date
-        if end_date:
-            date_filter["$lte"] = end_date
-        if date_filter:
-            query["first_seen_date"] = date_filter
-
-    # 3. Data Fetch
-    rows = []
-    if banners_col is not None:
-        rows = list(banners_col.find(query, {"_id": 0}).sort("last_seen_date", -1))
-
-    # 4. Process Rows (Status & Brand)
-    today_str = datetime.datetime.now().strftime("%Y-%m-%d")
-    processed_rows = []
-
-    for r in rows:
-        last_seen = r.get("last_seen_date", "")
-        if last_seen == today_str:
-            r['status'] = '🟢 ИДЭВХТЭЙ'
-        else:
-            r['status'] = '🟠 ДУУССАН'
-
-        # ✅ ШИНЭ: Screenshot finder ашиглах (хуучин/шинэ зам дэмжинэ)
-        path = r.get("screenshot_path")
-        found_path, rel_path = find_screenshot(path)
-        
-        if found_path and rel_path:
-            r['screenshot_file'] = url_for('serve_banner_image', filename=rel_path)
-        else:
-            r['screenshot_file'] = None
-
-        # Brand detection (САЙЖРУУЛСАН)
-        landing = r.get('landing_url', '')
-        src = r.get('src', '')
-        detected = detect_brand(landing, src)
-        if detected:
-            r['brand'] = detected
-        else:
-            # Хэрэв брэнд олдохгүй бол сайтын нэрийг ашиглана
-            r['brand'] = r.get('site', 'Тодорхойгүй')
-
-        processed_rows.append(r)
-
     # Check Files for Download
     export_dir = os.path.join(os.path.dirname(__file__), "_export")
     xlsx_exists = os.path.exists(os.path.join(export_dir, "summary.xlsx"))
@@ -468,7 +305,7 @@ def index():
 
     return render_template(
         "scraper.html", 
-        rows=processed_rows, 
+        sites=cache.cached("sites", {}, list_sites) if check_connection() else [],
         xlsx_exists=xlsx_exists, 
         tsv_exists=tsv_exists,
         start_date=start_date, 
@@ -476,28 +313,134 @@ def index():
         username=session.get('username', 'Admin')
     )
 
+# --- BANNER LIST API (cursor pagination) ---
+@app.route("/api/banners")
+@login_required
+def api_banners():
+    """
+    Keyset pagination-тэй баннерын жагсаалт.
+    Query: start, end, site, brand, size, score_min, score_max, status (active|ended), q,
+           sort, dir (asc|desc), limit, cursor
+    Хариу: {"rows": [...], "next": дараагийн хуудасны cursor эсвэл null,
+            "facets": эхний хуудсанд л (cursor-гүй) — banner_facets}
+    """
+    if not check_connection():
+        return jsonify({"error": "No DB connection"}), 500
+
+    args = request.args
+    today_str = datetime.datetime.now().strftime("%Y-%m-%d")
+    try:
+        filters = parse_filters(args, today_str)
+        limit = min(max(int(args.get("limit", API_PAGE_SIZE)), 1), API_PAGE_SIZE_MAX)
+        after = decode_cursor(args["cursor"]) if args.get("cursor") else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    sort = args.get("sort", "last_seen_date")
+    direction = 1 if args.get("dir") == "asc" else -1
+
+    def compute():
+        rows, next_after = list_banners_page(filters, sort, direction, limit, after)
+        return {
+            "rows": [present_banner(r, today_str) for r in rows],
+            "next": encode_cursor(next_after),
+        }
+
+    try:
+        # Ижил шүүлтүүр/хуудасны боловсруулсан үр дүнг cache-лэнэ (today нь filters-д орсон)
+        payload = cache.cached("banners", {
+            "filters": filters, "sort": sort, "dir": direction, "limit": limit, "cursor": args.get("cursor", ""),
+        }, compute)
+        if not after:
+            # Facet тоо нь эрэмбэ/хуудаснаас хамаарахгүй тул шүүлтүүрээр нь тусад нь cache-лэнэ
+            facets = cache.cached("facets", {"filters": filters}, lambda: banner_facets(filters))
+            payload = dict(payload, facets=facets)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    return jsonify(payload)
+
+@app.route("/api/stats")
+@login_required
+def api_stats():
+    """Ерөнхий статистик (cache-тэй)"""
+    if not check_connection():
+        return jsonify({"error": "No DB connection"}), 500
+    def compute():
+        stats = get_stats()
+        return None if "error" in stats else stats   # Алдааг cache-лэхгүй
+
+    stats = cache.cached("stats", {"today": datetime.datetime.now().strftime("%Y-%m-%d")}, compute)
+    if stats is None:
+        return jsonify({"error": "Stats unavailable"}), 500
+    return jsonify(stats)
+
+# --- SHARE OF VOICE REPORTS ---
+@app.route("/api/reports/presence")
+@login_required
+def api_presence():
+    """
+    Өдөр × сайт × брэндийн presence (DB aggregation).
+    Query: start, end (YYYY-MM-DD, default: сүүлийн 30 хоног), site
+    """
+    if not check_connection():
+        return jsonify({"error": "No DB connection"}), 500
+    try:
+        start, end = sov_window(request.args.get("start", ""), request.args.get("end", ""))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    site = request.args.get("site", "")
+
+    try:
+        rows = cache.cached("presence", {"start": start, "end": end, "site": site},
+                            lambda: brand_presence(start, end, site))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"start": start, "end": end, "site": site, "rows": rows})
+
+@app.route("/api/reports/share-of-voice")
+@login_required
+def api_share_of_voice():
+    """
+    Брэндийн share of voice (баннер-өдрөөр).
+    Query: start, end, site, by (site | total)
+    """
+    if not check_connection():
+        return jsonify({"error": "No DB connection"}), 500
+    by = request.args.get("by", "site")
+    if by not in SOV_GROUPINGS:
+        return jsonify({"error": f"by must be one of {', '.join(SOV_GROUPINGS)}"}), 400
+    try:
+        start, end = sov_window(request.args.get("start", ""), request.args.get("end", ""))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    site = request.args.get("site", "")
+
+    try:
+        rows = cache.cached("sov", {"start": start, "end": end, "site": site, "by": by},
+                            lambda: share_of_voice(start, end, by, site))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"start": start, "end": end, "site": site, "by": by, "rows": rows})
+
 # --- CLEANUP ROUTE ---
 @app.route("/scraper/cleanup", methods=["POST"])
 @login_required
 def cleanup_old_ads():
-    if banners_col is None:
+    if not check_connection():
         return jsonify({"error": "No DB connection"}), 500
 
     try:
         cutoff_date = datetime.datetime.now() - timedelta(days=7)
         cutoff_str = cutoff_date.strftime("%Y-%m-%d")
 
-        filter_query = {
-            "last_seen_date": {"$lt": cutoff_str},
-            "hidden": {"$ne": True}
-        }
-
-        result = banners_col.update_many(filter_query, {"$set": {"hidden": True}})
+        archived = hide_banners_before(cutoff_str)
+        cache.invalidate()
         
-        msg = f"Archived {result.modified_count} old banners (older than {cutoff_str})."
+        msg = f"Archived {archived} old banners (older than {cutoff_str})."
         ui_logger(msg)
         
-        return jsonify({"status": "success", "archived": result.modified_count})
+        return jsonify({"status": "success", "archived": archived})
 
     except Exception as e:
         ui_logger(f"Cleanup Error: {e}")
@@ -507,7 +450,7 @@ def cleanup_old_ads():
 @app.route("/api/delete_banner", methods=["POST"])
 @login_required
 def delete_banner():
-    if banners_col is None:
+    if not check_connection():
         return jsonify({"error": "No DB connection"}), 500
 
     try:
@@ -518,27 +461,65 @@ def delete_banner():
         if not src or not site:
             return jsonify({"error": "Missing src or site"}), 400
             
-        res = banners_col.delete_one({"src": src, "site": site})
-        
-        if res.deleted_count > 0:
+        if db_delete_banner(site, src):
+            cache.invalidate()
             return jsonify({"status": "success"})
         else:
             return jsonify({"error": "Not found"}), 404
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# --- BULK MODERATION ---
+@app.route("/api/banners/bulk", methods=["POST"])
+@login_required
+def bulk_moderate():
+    """
+    Олон баннерт нэг DB write-аар hide / archive / delete хийх.
+    Body: {"action": ..., "ids": [...]}            → мөр бүрийн үр дүн
+          {"action": ..., "filters": {...}}        → /api/banners-тэй ижил шүүлтүүрт тохирох бүгд
+    """
+    if not check_connection():
+        return jsonify({"error": "No DB connection"}), 500
+
+    data = request.get_json(silent=True) or {}
+    action = data.get("action")
+    if action not in BULK_ACTIONS:
+        return jsonify({"error": f"action must be one of {', '.join(BULK_ACTIONS)}"}), 400
+
+    try:
+        if "ids" in data:
+            ids = [str(i) for i in (data.get("ids") or [])]
+            if not ids or len(ids) > BULK_MAX_IDS:
+                return jsonify({"error": f"ids: 1-{BULK_MAX_IDS} items required"}), 400
+            found = bulk_moderate_ids(action, ids)
+            results = [{"id": i, "ok": ok} if ok else {"id": i, "ok": False, "error": "Not found"}
+                       for i, ok in found.items()]
+            matched = sum(found.values())
+        else:
+            today_str = datetime.datetime.now().strftime("%Y-%m-%d")
+            filters = parse_filters(data.get("filters") or {}, today_str)
+            # Шүүлтүүргүй хүсэлт бүх цуглуулгад нөлөөлөх тул backend ValueError("filters required") шиднэ
+            matched, results = bulk_moderate_filter(action, filters), None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    if matched:
+        cache.invalidate()
+    ui_logger(f"🧹 Bulk {action}: {matched} banner(s)")
+    return jsonify({"status": "success", "action": action, "matched": matched, "results": results})
+
 # --- ARCHIVE ONE ---
 @app.route("/scraper/archive-one", methods=["POST"])
 @login_required
 def archive_one_banner():
-    if banners_col is None: 
+    if not check_connection():
         return jsonify({"error": "No DB"}), 500
     try:
         data = request.json
-        banners_col.update_one(
-            {"src": data.get("src"), "site": data.get("site")},
-            {"$set": {"hidden": True}}
-        )
+        if hide_banner(data.get("site"), data.get("src")):
+            cache.invalidate()
         return jsonify({"status": "success"})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -548,30 +529,12 @@ def archive_one_banner():
 @login_required
 def recalculate_days():
     """Бүх баннеруудын days_seen-ийг дахин тооцоолох"""
-    if banners_col is None:
+    if not check_connection():
         return jsonify({"error": "No DB connection"}), 500
     
     try:
-        fixed_count = 0
-        for banner in banners_col.find({}):
-            first = banner.get("first_seen_date", "")
-            last = banner.get("last_seen_date", "")
-            
-            if first and last:
-                try:
-                    first_dt = datetime.datetime.strptime(first, "%Y-%m-%d")
-                    last_dt = datetime.datetime.strptime(last, "%Y-%m-%d")
-                    correct_days = (last_dt - first_dt).days + 1
-                    
-                    if correct_days != banner.get("days_seen"):
-                        banners_col.update_one(
-                            {"_id": banner["_id"]},
-                            {"$set": {"days_seen": correct_days}}
-                        )
-                        fixed_count += 1
-                except:
-                    pass
-        
+        fixed_count = recalculate_days_seen()
+        cache.invalidate()
         return jsonify({"status": "success", "fixed": fixed_count})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -579,8 +542,40 @@ def recalculate_days():
 @app.route("/banners/<path:filename>")
 @login_required
 def serve_banner_image(filename):
-    """Daily folder-тэй screenshot-уудыг дэмжинэ (жишээ: 2025-12-24/image.png)"""
-    return send_from_directory("banner_screenshots", filename)
+    """
+    asset_id-аар screenshot өгөх (жишээ: 2025-12-24/image.png).
+    ETag = агуулгын hash, If-None-Match таарвал 304. ?w=240 бол WebP thumbnail.
+    """
+    path = assets.resolve_asset(filename)
+    if not path or not os.path.isfile(path):
+        abort(404)
+
+    etag = thumbs.content_hash(path)
+    mimetype = None
+    width = thumbs.normalize_width(request.args.get("w"))
+    if width:
+        # 304 бол thumbnail үүсгэх шаардлагагүй
+        if request.if_none_match.contains(f"{etag}-w{width}"):
+            etag, path = f"{etag}-w{width}", None
+        else:
+            try:
+                path = thumbs.thumbnail_path(filename, path, width)
+                etag, mimetype = f"{etag}-w{width}", "image/webp"
+            except Exception as e:
+                # Thumbnail үүсгэж чадахгүй бол эх зургийг өгнө
+                print(f"Thumbnail Error ({filename}): {e}")
+
+    if path is None:
+        resp = app.response_class(status=304)
+        resp.set_etag(etag)
+    else:
+        resp = send_file(path, mimetype=mimetype, etag=etag, conditional=True, max_age=IMAGE_MAX_AGE)
+    # Login шаарддаг тул зөвхөн browser cache (private)
+    resp.cache_control.private = True
+    resp.cache_control.public = False
+    resp.cache_control.max_age = IMAGE_MAX_AGE
+    resp.cache_control.immutable = True
+    return resp
 
 @app.route("/download/xlsx")
 @login_required
@@ -594,19 +589,187 @@ def download_tsv():
     export_dir = os.path.join(os.path.dirname(__file__), "_export")
     return send_from_directory(export_dir, "summary.tsv", as_attachment=True)
 
+@app.route("/export/<fmt>")
+@login_required
+def export_banners(fmt):
+    """
+    Dashboard-ийн шүүлтүүр, эрэмбээр (/api/banners-тэй ижил query) on-demand export.
+    fmt: tsv | csv | jsonl | xlsx. DB cursor-оос шууд stream хийнэ.
+    """
+    if fmt not in exports.EXPORT_FORMATS:
+        abort(404)
+    if not check_connection():
+        return jsonify({"error": "No DB connection"}), 500
+
+    today_str = datetime.datetime.now().strftime("%Y-%m-%d")
+    try:
+        filters = parse_filters(request.args, today_str)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    sort = request.args.get("sort", "last_seen_date")
+    direction = 1 if request.args.get("dir") == "asc" else -1
+
+    rows = iter_banners(filters, exports.EXPORT_COLUMNS, sort, direction)
+    filename = f"banners_{datetime.datetime.now().strftime('%Y%m%d_%H%M')}.{fmt}"
+    return Response(
+        stream_with_context(exports.stream_export(fmt, rows)),
+        content_type=exports.EXPORT_FORMATS[fmt],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "Cache-Control": "no-store",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
 @app.route("/scraper/scrape-now", methods=["POST"])
 @login_required
 def scrape_now():
-    global IS_RUNNING
-    if IS_RUNNING: 
+    job = jobs.request_scrape("Manual")
+    if not job:
         return jsonify({"status": "busy"})
-    threading.Thread(target=job_runner, args=["Manual"]).start()
-    return jsonify({"status": "started"})
+    ui_logger("📥 Manual: scrape job queued")
+    return jsonify({"status": "started", "job_id": job["job_id"]})
 
 @app.route("/scraper/status")
 @login_required
 def status():
-    return jsonify({"running": IS_RUNNING})
+    state = jobs.scrape_state()
+    return jsonify({"running": state["running"], "state": state["state"], "source": state.get("source")})
+
+# --- REPORT JOB (summarize.py, worker.py-ийн report thread) ---
+@app.route("/reports/build", methods=["POST"])
+@login_required
+def build_report():
+    """Тайлан үүсгэх хүсэлт. Дараалалд байгаа/ажиллаж буй build-тэй нэгтгэгдэнэ (queued|coalesced|deferred)."""
+    report = jobs.request_report("Manual")
+    ui_logger(f"📊 Manual: report job {report['status']}")
+    return jsonify(report)
+
+@app.route("/reports/status")
+@login_required
+def report_status():
+    """Report job-ийн төлөв (scrape-ийн /scraper/status-аас тусдаа) + сүүлийн тайлангийн огноо."""
+    state = jobs.report_state()
+    xlsx_path = os.path.join(os.path.dirname(__file__), "_export", "summary.xlsx")
+    generated_at = None
+    if os.path.exists(xlsx_path):
+        generated_at = datetime.datetime.fromtimestamp(os.path.getmtime(xlsx_path)).isoformat(timespec="seconds")
+    return jsonify({
+        "running": state["running"],
+        "state": state["state"],
+        "source": state.get("source"),
+        "progress": state.get("progress") if state["state"] == "running" else None,
+        "pending": state.get("pending", False),
+        "generated_at": generated_at,
+    })
+
+@app.route("/healthz")
+def healthz():
+    """Login шаардахгүй health probe (docker/load balancer-т зориулсан)"""
+    ok = check_connection()
+    return jsonify({"ok": ok, "storage": STORAGE_BACKEND}), (200 if ok else 503)
+
+@app.route("/api/ingest", methods=["POST"])
+def ingest_api():
+    """
+    site_worker.py node-уудын capture batch (session биш, INGEST_TOKEN-оор нэвтэрнэ).
+    Body: {"job_id", "worker", "items": [capture + screenshot_name/screenshot_b64]}
+    409 — job-ийн lease өөр worker-т шилжсэн.
+    """
+    if not sitejobs.INGEST_TOKEN:
+        abort(404)
+    if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {sitejobs.INGEST_TOKEN}"):
+        return jsonify({"error": "unauthorized"}), 401
+    data = request.get_json(silent=True) or {}
+    items = data.get("items")
+    if not isinstance(items, list) or not all(isinstance(i, dict) for i in items):
+        return jsonify({"error": "items must be a list of objects"}), 400
+    try:
+        counts = sitejobs.ingest_remote(data.get("job_id"), data.get("worker"), items)
+    except sitejobs.LeaseLost:
+        return jsonify({"error": "lease_lost"}), 409
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    cache.invalidate()
+    return jsonify(counts)
+
+SSE_KEEPALIVE_SEC = 15
+SSE_BACKLOG_PAGE = 500
+
+def _event_backlog(seq: int):
+    """
+    job_events-ээс seq-ээс хойшхи бүх event (энэ процессын bus-д байхгүй хэсгийг нөхөх).
+    EventRelay-ийн эцэслэсэн seq хүртэл л уншина: түүнээс хойшхи завсар нь commit хүлээж буй event байж болно.
+    Буцаах: (events, reset) — reset=True бол seq-ийн дараах event-үүд DB-ээс ч устсан.
+    """
+    upto = EVENT_RELAY.seq
+    backlog = []
+    while upto is not None:
+        page = events_since(backlog[-1]["seq"] if backlog else seq, SSE_BACKLOG_PAGE)
+        backlog += [e for e in page if e["seq"] <= upto]
+        if len(page) < SSE_BACKLOG_PAGE or page[-1]["seq"] >= upto:
+            break
+    return backlog, bool(backlog) and backlog[0]["seq"] > seq + 1
+
+def _sse(event_type: str, data: dict, seq: int = None) -> str:
+    head = f"id: {seq}\n" if seq is not None else ""
+    return f"{head}event: {event_type}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+@app.route("/scraper/events")
+@login_required
+def scraper_events():
+    """
+    Server-Sent Events: лог мөр болон төлөвийн шилжилтүүд.
+    id нь job_events.seq: дахин холбогдоход browser Last-Event-ID илгээж (өөр gunicorn worker дээр ч)
+    зөвхөн шинэ event-үүдийг авна. Алга болсон event-үүдийг нөхөх боломжгүй бол "reset" event.
+    """
+    last_id = request.headers.get("Last-Event-ID") or request.args.get("since")
+    try:
+        seq = int(last_id) if last_id else None
+    except ValueError:
+        seq = None
+    EVENT_RELAY.start()
+    state = jobs.scrape_state()
+    running = state["running"]
+    if seq is None:
+        # Шинэ клиент: ажиллаж буй run байвал түүний логийг эхнээс нь, үгүй бол зөвхөн шинийг
+        start = state.get("event_seq_start") if running else None
+        if start is None:
+            # Relay-ийн эцэслэсэн цэгээс (latest_event_seq нь commit хүлээж буй seq-ийг давж болно)
+            start = EVENT_RELAY.seq if EVENT_RELAY.seq is not None else latest_event_seq()
+        seq = start
+
+    def catch_up(seq):
+        # Bus-д хараахан/аль хэдийн байхгүй event-үүдийг job_events-ээс. Буцаах: сүүлийн seq
+        backlog, reset = _event_backlog(seq)
+        if reset:
+            yield _sse("reset", {"running": jobs.scrape_state()["running"]})
+        for e in backlog:
+            seq = e["seq"]
+            yield _sse(e["type"], e["data"], seq)
+        return seq
+
+    def stream(seq):
+        # Холбогдох бүрт одоогийн төлөвийн snapshot (id-гүй: Last-Event-ID-д нөлөөлөхгүй)
+        yield "retry: 3000\n" + _sse("hello", {"running": running, "seq": seq})
+        seq = yield from catch_up(seq)
+        while True:
+            batch = events.bus.wait(seq, SSE_KEEPALIVE_SEC)
+            if not batch:
+                yield ": keepalive\n\n"
+                continue
+            if batch[0]["seq"] > seq + 1:
+                # Bus-ийн буферээс гарсан (эсвэл relay өөр цэгээс эхэлсэн) завсар: DB-ээс нөхнө
+                seq = yield from catch_up(seq)
+                batch = [e for e in batch if e["seq"] > seq]
+            for e in batch:
+                seq = e["seq"]
+                yield _sse(e["type"], e["data"], seq)
+
+    return Response(stream(seq), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",   # nginx proxy buffering унтраах
+    })
 
 @app.route("/_debug/last-log")
 @login_required
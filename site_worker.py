@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+site_worker.py — Олон машин дээр ажиллах scrape node (SCRAPE_MODE=distributed)
+===============================================================================
+
+worker.py (coordinator) scrape job бүрт сайт тус бүрийн job-ийг jobs коллекцид оруулна.
+Энэ процесс:
+  - Дараалалд байгаа (эсвэл lease нь дууссан) site job-ийг lease-тэй авна
+  - scrape_* функцийг ажиллуулж, capture-уудыг batch-аар ingest API руу илгээнэ
+  - Ажиллах хугацаанд lease-ээ SITE_LEASE_RENEW_SEC тутам сунгана
+Node унавал lease дуусмагц өөр node тэр сайтыг дахин авна — node нэмэх тусам throughput өснө.
+
+Шаардлагатай env: MONGO_URI (jobs/runs), INGEST_URL (dashboard-ийн хаяг), INGEST_TOKEN
+
+Ашиглалт:
+    python site_worker.py
+"""
+
+import time
+import signal
+
+from core import sitejobs
+from core.db import check_connection, claim_site_job
+from core.jobs import WORKER_ID
+
+_STOP = False
+
+
+def _handle_stop(signum, frame):
+    global _STOP
+    _STOP = True
+    print("🛑 Stop signal received, finishing current site job...")
+
+
+def main():
+    print("=" * 60)
+    print(f"🛰  SITE WORKER ({WORKER_ID}) → {sitejobs.INGEST_URL or 'INGEST_URL not set!'}")
+    print("=" * 60)
+
+    while not check_connection():
+        print("⏳ DB холбогдохыг хүлээж байна...")
+        time.sleep(5)
+
+    signal.signal(signal.SIGTERM, _handle_stop)
+    signal.signal(signal.SIGINT, _handle_stop)
+
+    while not _STOP:
+        try:
+            job = claim_site_job(WORKER_ID, sitejobs.SITE_LEASE_SEC)
+        except Exception as e:
+            print(f"Site Worker Error: {e}")
+            job = None
+        if not job:
+            time.sleep(sitejobs.SITE_POLL_SEC)
+            continue
+        print(f"🚀 {job['site']} (job {job['job_id']}, attempt {job['attempts']}/{job['max_attempts']})")
+        status = sitejobs.run_claimed(job, WORKER_ID)
+        print(f"🏁 {job['site']}: {status or 'lease lost'}")
+
+    print("👋 Site worker stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,9 @@ import time
 import hashlib
 import logging
 import urllib.parse
-from typing import List, Dict, Set
+from typing import Callable, List, Dict, Optional, Set
 from playwright.sync_api import sync_playwright
-from core.common import ensure_dir, http_get_bytes, classify_ad
+from core.common import ensure_dir, classify_ad
 
 HOME = "https://bolor-toli.com"
 
@@ -71,16 +71,18 @@ def _collect_bolortoli(page, output_dir: str, seen: Set[str], ads_only: bool, mi
                 continue
             
             el.screenshot(path=shot_path)
-            img_bytes = http_get_bytes(src, referer=HOME)
-            out.append({"site": site_host, "src": src, "landing_url": landing, "img_bytes": img_bytes, "width": w, "height": hgt, "screenshot_path": shot_path, "notes": "onpage"})
+            out.append({"site": site_host, "src": src, "landing_url": landing, "img_bytes": None, "referer": HOME, "width": w, "height": hgt, "screenshot_path": shot_path, "notes": "onpage"})
         except Exception:
             continue
     return out
 
-def scrape_bolortoli(output_dir: str, dwell_seconds: int = 35, headless: bool = True, ads_only: bool = True, min_score: int = 3) -> List[Dict]:
+def scrape_bolortoli(output_dir: str, dwell_seconds: int = 35, headless: bool = True, ads_only: bool = True, min_score: int = 3,
+                     emit: Optional[Callable[[List[Dict]], None]] = None) -> List[Dict]:
+    # emit өгвөл capture-ууд цуглуулах бүрт шууд дамжина (core.capture), үгүй бол жагсаалтаар буцна
     ensure_dir(output_dir)
     seen: Set[str] = set()
     out: List[Dict] = []
+    emit = emit or out.extend
     with sync_playwright() as p:
         br = p.chromium.launch(headless=headless)
         try:
@@ -89,7 +91,7 @@ def scrape_bolortoli(output_dir: str, dwell_seconds: int = 35, headless: bool =
             pg.wait_for_timeout(3000)
 
             _prime_page(pg)
-            out.extend(_collect_bolortoli(pg, output_dir, seen, ads_only, min_score))
+            emit(_collect_bolortoli(pg, output_dir, seen, ads_only, min_score))
 
             if dwell_seconds > 5:
                 logging.info(f"Starting active sampling for {dwell_seconds} seconds to catch rotating ads...")
@@ -98,7 +100,7 @@ def scrape_bolortoli(output_dir: str, dwell_seconds: int = 35, headless: bool =
                     time.sleep(step)
                     waited += step
                     logging.info(f"-> Resampling page... ({waited}/{dwell_seconds}s)")
-                    out.extend(_collect_bolortoli(pg, output_dir, seen, ads_only, min_score))
+                    emit(_collect_bolortoli(pg, output_dir, seen, ads_only, min_score))
         finally:
             br.close()
 
@@ -4,9 +4,9 @@ import os
 import time
 import hashlib
 import urllib.parse
-from typing import List, Dict, Set
+from typing import Callable, List, Dict, Optional, Set
 from playwright.sync_api import sync_playwright, Error as PlaywrightError
-from core.common import ensure_dir, http_get_bytes, classify_ad
+from core.common import ensure_dir, classify_ad
 
 HOME = "https://www.caak.mn/"
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
@@ -119,11 +119,9 @@ def _collect_caak(page, output_dir: str, seen: Set[str], ads_only: bool, min_sco
             try: el.screenshot(path=shot_path)
             except: pass
             
-            img_bytes = http_get_bytes(src, referer=HOME)
-            
             out.append({
                 "site": site_host, "src": src, "landing_url": landing,
-                "img_bytes": img_bytes, "width": w, "height": h,
+                "img_bytes": None, "referer": HOME, "width": w, "height": h,
                 "screenshot_path": shot_path, "notes": notes, 
                 "ad_score": score, "ad_reason": reason
             })
@@ -132,10 +130,13 @@ def _collect_caak(page, output_dir: str, seen: Set[str], ads_only: bool, min_sco
     return out
 
 def scrape_caak(output_dir: str, dwell_seconds: int = 45, headless: bool = True,
-                ads_only: bool = True, min_score: int = 3) -> List[Dict]:
+                ads_only: bool = True, min_score: int = 3,
+                emit: Optional[Callable[[List[Dict]], None]] = None) -> List[Dict]:
+    # emit өгвөл capture-ууд цуглуулах бүрт шууд дамжина (core.capture), үгүй бол жагсаалтаар буцна
     ensure_dir(output_dir)
     seen: Set[str] = set()
     out: List[Dict] = []
+    emit = emit or out.extend
 
     with sync_playwright() as p:
         br = p.chromium.launch(headless=headless)
@@ -152,12 +153,12 @@ def scrape_caak(output_dir: str, dwell_seconds: int = 45, headless: bool = True,
                     time.sleep(5)
             
             _prime_page(pg)
-            out.extend(_collect_caak(pg, output_dir, seen, ads_only, min_score))
+            emit(_collect_caak(pg, output_dir, seen, ads_only, min_score))
 
             if dwell_seconds > 0:
                 time.sleep(dwell_seconds)
                 _prime_page(pg)
-                out.extend(_collect_caak(pg, output_dir, seen, ads_only, min_score))
+                emit(_collect_caak(pg, output_dir, seen, ads_only, min_score))
         except Exception as e:
             print(f"Caak scraper error: {e}")
         finally:
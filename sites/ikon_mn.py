@@ -6,7 +6,7 @@ import time
 import hashlib
 import logging
 from urllib.parse import urljoin, urlparse
-from typing import List, Dict, Set, Optional, Tuple
+from typing import Callable, List, Dict, Set, Optional, Tuple
 
 from playwright.sync_api import sync_playwright, Page, BrowserContext, TimeoutError as PWTimeout
 from core.common import ensure_dir, http_get_bytes # Таны common.py-аас импорт хийнэ
@@ -148,10 +148,14 @@ def watch_and_capture_variants(context: BrowserContext, ad_url: str, output_dir:
     return captures
 
 # --- ҮНДСЭН ФУНКЦ ---
-def scrape_ikon(output_dir: str, dwell_seconds: int = 45, headless: bool = True, ads_only: bool = True, min_score: int = 3) -> List[Dict]:
+def scrape_ikon(output_dir: str, dwell_seconds: int = 45, headless: bool = True, ads_only: bool = True, min_score: int = 3,
+                emit: Optional[Callable[[List[Dict]], None]] = None) -> List[Dict]:
+    # emit өгвөл capture-ууд цуглуулах бүрт шууд дамжина (core.capture), үгүй бол жагсаалтаар буцна
+    # (ikon: зураг татагдсан эсэхээр capture-ийг шийддэг тул bytes-ийг энд татсан хэвээр)
     ensure_dir(output_dir)
     seen: Set[str] = set()
     results: List[Dict] = []
+    emit = emit or results.extend
 
     with sync_playwright() as p:
         browser = p.chromium.launch(headless=headless)
@@ -171,7 +175,7 @@ def scrape_ikon(output_dir: str, dwell_seconds: int = 45, headless: bool = True,
                 for ad_url in ad_links:
                     logging.info(f"-> Watching ad page: {ad_url} for ~{watch_seconds_per_link}s...")
                     captures = watch_and_capture_variants(context, ad_url, output_dir, seen, watch_seconds_per_link)
-                    results.extend(captures)
+                    emit(captures)
 
         except Exception as e:
             logging.error(f"An error occurred during ikon.mn scrape: {e}")
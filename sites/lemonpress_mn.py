@@ -5,9 +5,9 @@ import time
 import hashlib
 import logging
 import urllib.parse
-from typing import List, Dict, Set
+from typing import Callable, List, Dict, Optional, Set
 from playwright.sync_api import sync_playwright
-from core.common import ensure_dir, http_get_bytes, classify_ad
+from core.common import ensure_dir, classify_ad
 
 HOME = "https://lemonpress.mn"
 CAT_URL = "https://lemonpress.mn/category/surtalchilgaa"
@@ -141,13 +141,12 @@ def _collect_lemonpress(page, output_dir: str, seen: Set[str], ads_only: bool, m
                 el.screenshot(path=shot_path)
             except: pass
             
-            img_bytes = http_get_bytes(src, referer=page.url)
-            
             out.append({
                 "site": site_host, 
                 "src": src, 
                 "landing_url": landing, 
-                "img_bytes": img_bytes, 
+                "img_bytes": None, 
+                "referer": page.url, 
                 "width": w, 
                 "height": h, 
                 "screenshot_path": shot_path, 
@@ -159,10 +158,13 @@ def _collect_lemonpress(page, output_dir: str, seen: Set[str], ads_only: bool, m
         
     return out
 
-def scrape_lemonpress(output_dir: str, dwell_seconds: int = 0, headless: bool = True, ads_only: bool = True, min_score: int = 3, max_pages: int = 2) -> List[Dict]:
+def scrape_lemonpress(output_dir: str, dwell_seconds: int = 0, headless: bool = True, ads_only: bool = True, min_score: int = 3, max_pages: int = 2,
+                      emit: Optional[Callable[[List[Dict]], None]] = None) -> List[Dict]:
+    # emit өгвөл capture-ууд цуглуулах бүрт шууд дамжина (core.capture), үгүй бол жагсаалтаар буцна
     ensure_dir(output_dir)
     seen: Set[str] = set()
     out: List[Dict] = []
+    emit = emit or out.extend
     
     with sync_playwright() as p:
         # Browser Launch options
@@ -193,7 +195,7 @@ def scrape_lemonpress(output_dir: str, dwell_seconds: int = 0, headless: bool =
 
             _scroll_full_page(pg)
             
-            out.extend(_collect_lemonpress(pg, output_dir, seen, ads_only, min_score))
+            emit(_collect_lemonpress(pg, output_dir, seen, ads_only, min_score))
             
             # Category page scrape
             if max_pages > 0:
@@ -207,7 +209,7 @@ def scrape_lemonpress(output_dir: str, dwell_seconds: int = 0, headless: bool =
                         except: pass
                         
                         _scroll_full_page(pg)
-                        out.extend(_collect_lemonpress(pg, output_dir, seen, ads_only, min_score))
+                        emit(_collect_lemonpress(pg, output_dir, seen, ads_only, min_score))
                         
                         # Pagination Check
                         next_btn = pg.locator("a[rel='next'], a:has-text('Next'), a:has-text('Дараах')").first
@@ -1,8 +1,8 @@
 # -*- coding: utf-8 -*-
 import os, time, hashlib
-from typing import List, Dict, Set
+from typing import Callable, List, Dict, Optional, Set
 from playwright.sync_api import sync_playwright
-from core.common import ensure_dir, http_get_bytes, classify_ad
+from core.common import ensure_dir, classify_ad
 
 HOME = "https://news.mn"
 
@@ -46,28 +46,30 @@ def _collect_imgs(page, output_dir, seen:Set[str], ads_only:bool, min_score:int)
         if os.path.exists(shot):
             continue
 
-        img_bytes = http_get_bytes(src, referer=HOME)
         try: el.screenshot(path=shot)
         except Exception: shot = ""
         out.append({
             "site":"news.mn","src":src,"landing_url":landing,
-            "img_bytes":img_bytes,"width":int(bbox["width"]),"height":int(bbox["height"]),
+            "img_bytes":None,"referer":HOME,"width":int(bbox["width"]),"height":int(bbox["height"]),
             "screenshot_path":shot,"notes":("video_poster" if tag=="video" else ("iframe" if tag=="iframe" else "onpage")),
         })
     return out
 
-def scrape_news(output_dir: str, dwell_seconds:int=45, headless:bool=True, ads_only:bool=True, min_score:int=2) -> List[Dict]:
+def scrape_news(output_dir: str, dwell_seconds:int=45, headless:bool=True, ads_only:bool=True, min_score:int=2,
+                emit: Optional[Callable[[List[Dict]], None]] = None) -> List[Dict]:
+    # emit өгвөл capture-ууд цуглуулах бүрт шууд дамжина (core.capture), үгүй бол жагсаалтаар буцна
     ensure_dir(output_dir)
     seen: Set[str] = set(); out: List[Dict] = []
+    emit = emit or out.extend
     with sync_playwright() as p:
         br = p.chromium.launch(headless=headless)
         pg = br.new_page(viewport={"width":1600,"height":1200})
         pg.goto(HOME, timeout=90000, wait_until="domcontentloaded")
-        out += _collect_imgs(pg, output_dir, seen, ads_only, min_score)
+        emit(_collect_imgs(pg, output_dir, seen, ads_only, min_score))
         waited, step = 0, 6
         while waited < dwell_seconds:
             time.sleep(step); waited += step
-            try: out += _collect_imgs(pg, output_dir, seen, ads_only, min_score)
+            try: emit(_collect_imgs(pg, output_dir, seen, ads_only, min_score))
             except Exception: pass
         br.close()
     return out
\ No newline at end of file
@@ -1,9 +1,9 @@
 # -*- coding: utf-8 -*-
 # ublife_mn.py — FAST scraper for https://www.ublife.mn/
 import os, time, hashlib
-from typing import List, Dict, Set
+from typing import Callable, List, Dict, Optional, Set
 from playwright.sync_api import sync_playwright
-from core.common import ensure_dir, http_get_bytes, classify_ad
+from core.common import ensure_dir, classify_ad
 
 HOME = "https://ublife.mn/"
 
@@ -77,7 +77,6 @@ def _collect_imgs(page, output_dir: str, seen: Set[str], ads_only: bool, min_sco
         if os.path.exists(shot):
             continue
 
-        img_bytes = http_get_bytes(src, referer=HOME)
         try:
             el.screenshot(path=shot)
         except Exception:
@@ -87,7 +86,8 @@ def _collect_imgs(page, output_dir: str, seen: Set[str], ads_only: bool, min_sco
             "site": "ublife.mn",
             "src": src,
             "landing_url": landing,
-            "img_bytes": img_bytes,
+            "img_bytes": None,
+            "referer": HOME,
             "width": w,
             "height": h,
             "screenshot_path": shot,
@@ -96,16 +96,19 @@ def _collect_imgs(page, output_dir: str, seen: Set[str], ads_only: bool, min_sco
     return out
 
 def scrape_ublife(output_dir: str, dwell_seconds: int = 45, headless: bool = True,
-                  ads_only: bool = True, min_score: int = 3) -> List[Dict]:
+                  ads_only: bool = True, min_score: int = 3,
+                  emit: Optional[Callable[[List[Dict]], None]] = None) -> List[Dict]:
     """
     Ашиглах жишээ:
         from sites.ublife_mn import scrape_ublife
         items = scrape_ublife("./banner_screenshots/2025-10-10",
                               dwell_seconds=45, headless=True, ads_only=True, min_score=3)
+    emit өгвөл capture-ууд цуглуулах бүрт шууд дамжина (core.capture), үгүй бол жагсаалтаар буцна.
     """
     ensure_dir(output_dir)
     seen: Set[str] = set()
     out: List[Dict] = []
+    emit = emit or out.extend
 
     with sync_playwright() as p:
         br = p.chromium.launch(headless=headless)
@@ -113,14 +116,14 @@ def scrape_ublife(output_dir: str, dwell_seconds: int = 45, headless: bool = Tru
         pg.goto(HOME, timeout=90000, wait_until="domcontentloaded")
 
         # Initial grab
-        out += _collect_imgs(pg, output_dir, seen, ads_only, min_score)
+        emit(_collect_imgs(pg, output_dir, seen, ads_only, min_score))
 
         # Short dwell loop
         waited, step = 0, 6
         while waited < dwell_seconds:
             time.sleep(step); waited += step
             try:
-                out += _collect_imgs(pg, output_dir, seen, ads_only, min_score)
+                emit(_collect_imgs(pg, output_dir, seen, ads_only, min_score))
             except Exception:
                 pass
 
@@ -6,16 +6,55 @@ summarize.py — MongoDB to Excel Reporter
 1. MongoDB-ээс цугларсан баннерын өгөгдлийг татах.
 2. Pandas ашиглан цэгцлэх.
 3. Мэргэжлийн түвшний Excel (XLSX) тайлан үүсгэх.
+
+Incremental горим (default):
+- _export/snapshot/banners.parquet — өмнөх run-ий бүх мөрийн columnar snapshot
+- _export/snapshot/state.json — watermark (уншиж эхэлсэн хугацаа − REPORT_WATERMARK_LAG_SEC)
+- DB-ээс зөвхөн updated_at >= watermark мөрүүдийг татаж snapshot-д (site, src)-ээр нэгтгэнэ,
+  устгагдсан мөрүүдийг (site, src) түлхүүрийн жагсаалтаар хасна. Lag-ийн давхцлаар дахин
+  ирсэн мөрүүд (site, src) merge-ээр давхардахгүй
+- Тайлангууд (XLSX, TSV) snapshot-оос үүснэ
+
+Analytics-д зориулсан Parquet dataset (_export/dataset/):
+- first_seen_month=YYYY-MM/site=<site>/ гэсэн hive партицтай, төрөлтэй баганууд
+  (width/height/days_seen/ad_score → int64, first/last_seen_date → date)
+- Incremental run-д зөвхөн өөрчлөгдсөн мөрүүдийн партицуудыг дахин бичнэ
+
+Share of voice хуудсууд (Presence, SOV by Site, SOV Total):
+- DB дээрх aggregation-оор (core.db.brand_presence / share_of_voice) сүүлийн
+  REPORT_SOV_DAYS хоногоор тооцоолно — бүтэн dump pandas руу татахгүй
+- Мөн dashboard-оос /api/reports/presence, /api/reports/share-of-voice JSON-оор авна
+
+Ашиглалт:
+    python summarize.py          # incremental
+    python summarize.py --full   # snapshot-ыг бүтэн дахин үүсгэх
 """
 
 import os
+import re
+import json
+import shutil
 import logging
+import argparse
+import numpy as np
 import pandas as pd
-from datetime import datetime
-from urllib.parse import urlparse
-import pymongo
+from datetime import datetime, timedelta
+from urllib.parse import quote
 from dotenv import load_dotenv
 
+from core.brands import BRAND_MAP, REDIRECT_KEYS, brand_by_priority, brand_for_host, iter_brand_matches, real_landing_url
+from core.db import (
+    check_connection, fetch_all_banners, fetch_banners_since, list_banner_keys, brand_presence, share_of_voice,
+)
+from core.storage import sov_window
+
+try:
+    import pyarrow  # optional: байхгүй бол snapshot/dataset-гүйгээр үргэлж бүтэн тайлан үүсгэнэ
+    import pyarrow.compute as pc
+    import pyarrow.dataset as pads
+except ImportError:
+    pyarrow = pc = pads = None
+
 # 1. LOGGING SETUP
 logging.basicConfig(
     level=logging.INFO,
@@ -25,89 +64,301 @@ logger = logging.getLogger("Summarizer")
 
 # 2. CONFIGURATION
 load_dotenv()
-# Docker дотор 'mongo', local дээр 'localhost'
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/banner_db")
 
 # Гаралт (Output) хавтас
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 EXPORT_DIR = os.path.join(BASE_DIR, "_export")
+SNAPSHOT_DIR = os.path.join(EXPORT_DIR, "snapshot")
+SNAPSHOT_PATH = os.path.join(SNAPSHOT_DIR, "banners.parquet")
+SNAPSHOT_STATE = os.path.join(SNAPSHOT_DIR, "state.json")
+SNAPSHOT_VERSION = 1
+DATASET_DIR = os.path.join(EXPORT_DIR, "dataset")
 
-# 3. BRAND MAP - Landing URL-аас брэнд таних
-BRAND_MAP = {
-    # Банкууд
-    "khanbank": "Хаан Банк", "golomt": "Голомт Банк", "tdbm": "ХХБ (TDB)",
-    "statebank": "Төрийн Банк", "capitron": "Капитрон", "bogdbank": "Богд Банк",
-    "nibs": "ҮХОБ", "transbank": "Тээвэр Хөгжлийн Банк", "xacbank": "Хас Банк",
-    
-    # Төлбөрийн системүүд
-    "qpay": "QPay", "monpay": "MonPay", "socialpay": "SocialPay",
-    "toki": "Toki", "storepay": "StorePay", "lendmn": "LendMN",
-    
-    # Телеком
-    "unitel": "Unitel", "mobicom": "Mobicom", "skytel": "Skytel",
-    "gmobile": "G-Mobile", "ondo": "Ondo",
-    
-    # Мэдээллийн сайтууд
-    "gogo": "GoGo.mn", "univision": "Univision", "news.mn": "News.mn",
-    "ikon": "Ikon.mn", "caak": "Caak.mn",
-    
-    # Дэлгүүрүүд
-    "shoppy": "Shoppy", "uran": "Uran", "bsb": "BSB", "pc-mall": "PC Mall",
-    "next": "Next Electronics", "nomin": "Nomin", "emart": "Emart",
-    "cu-mongolia": "CU", "gs25": "GS25",
-    
-    # Бусад
-    "tavanbogd": "Tavan Bogd", "mcs": "MCS", "apu": "APU",
-    "unegui": "Unegui.mn", "zangia": "Zangia.mn", "ihelp": "iHelp",
-    "koreanair": "Korean Air", "freshpack": "Freshpack", "sain": "Sain Electronics",
-    
-    # Тоглоом/Бооцоо
-    "bet": "Betting", "1xbet": "1xBet", "melbet": "MelBet",
-}
+KEY_COLUMNS = ["site", "src"]
+INT_COLUMNS = ["width", "height", "days_seen", "ad_score"]
+BOOL_COLUMNS = ["hidden", "is_archived"]
+DATETIME_COLUMNS = ["created_at", "updated_at"]
+DATE_COLUMNS = ["first_seen_date", "last_seen_date"]
+PARTITION_COLUMNS = ["first_seen_month", "site"]
+EMPTY_COLUMNS = ["site", "brand", "src", "landing_url", "first_seen_date", "last_seen_date", "days_seen"]
 
-def detect_brand(landing_url: str, src: str = "") -> str:
-    """Landing URL болон src-аас брэндийг таних"""
-    text_to_check = (str(landing_url) + " " + str(src)).lower()
-    
-    for key, brand_name in BRAND_MAP.items():
-        if key in text_to_check:
-            return brand_name
-    
-    # Хэрэв BRAND_MAP-д байхгүй бол домэйнээс авах оролдлого
-    try:
-        parsed = urlparse(landing_url)
-        hostname = parsed.hostname or ""
-        if hostname:
-            # www. хасах
-            if hostname.startswith("www."):
-                hostname = hostname[4:]
-            # Эхний хэсгийг авах (subdomain-гүй)
-            parts = hostname.split(".")
-            if len(parts) >= 2:
-                return parts[0].title()  # Capitalize
-    except:
-        pass
-    
-    return ""
+# Баганын өргөнийг бүх мөрөөс биш санамсаргүй түүврээс тооцно (тогтмол seed → тогтвортой өргөн)
+WIDTH_SAMPLE_ROWS = int(os.getenv("REPORT_WIDTH_SAMPLE_ROWS", "5000"))
+MAX_COL_WIDTH = 60
+
+REPORT_SOV_DAYS = int(os.getenv("REPORT_SOV_DAYS", "30"))
+# updated_at-ийг commit-оос өмнө олон thread/процесс онооно: watermark-ийг уншиж эхэлсэн
+# хугацаанаас энэ хэмжээгээр хойш тавьж, хоцорч commit хийгдсэн бичилтийг алгасахгүй
+REPORT_WATERMARK_LAG_SEC = float(os.getenv("REPORT_WATERMARK_LAG_SEC", "300"))
+PRESENCE_COLUMNS = ["date", "site", "brand", "banners", "site_banners", "share", "collected"]
+SOV_COLUMNS = ["site", "brand", "banners", "banner_days", "share"]
+
+# urlparse(...).hostname-тэй ижил: scheme://[userinfo@]host[:port] → host
+HOST_RE = r"^(?:[A-Za-z][A-Za-z0-9+.-]*:)?//(?:[^/?#]*@)?([^:/?#]*)"
+# Query-д бодит landing URL агуулсан redirect (core.brands.real_landing_url-ийн урьдчилсан шүүлт)
+REDIRECT_RE = re.compile(r"[?&;](?:%s)=http" % "|".join(REDIRECT_KEYS))
 
 def get_mongo_data():
-    """MongoDB-ээс бүх баннерыг татаж DataFrame болгох"""
+    """DB-ээс (STORAGE_BACKEND: mongo/sqlite) бүх баннерыг татах"""
     try:
-        client = pymongo.MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
-        db = client.get_database()
-        col = db["banners"]
-        
-        # _id талбарыг хасч татах
-        data = list(col.find({}, {"_id": 0}))
-        return data
+        if not check_connection():
+            raise RuntimeError("storage backend unavailable")
+        return fetch_all_banners()
     except Exception as e:
         logger.error(f"❌ Database connection failed: {e}")
         return []
 
-def main():
+def _brand_priority(text: pd.Series) -> pd.Series:
     """
-    run.py-аас дуудагддаг үндсэн функц.
+    BRAND_MAP-ийн хамгийн өндөр эрэмбэтэй таарсан түлхүүрийн priority (таараагүй бол NaN, жижиг үсгээр).
+    Давхардаагүй утгуудыг "\\n"-ээр залгаж matcher-ийг нэг л удаа гүйлгээд,
+    таарцын байрлалыг searchsorted-оор мөрд буцааж ононо.
+    """
+    uniq = pd.unique(text)
+    if not len(uniq):
+        return pd.Series(index=text.index, dtype=float)
+    lowered = pd.Series(uniq, dtype=object).str.lower()
+    lengths = lowered.str.len().to_numpy() + 1
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    found = list(iter_brand_matches("\n".join(lowered)))
+    if not found:
+        return pd.Series(index=text.index, dtype=float)
+    pos, prio = np.array(found).T
+    best = pd.Series(prio).groupby(np.searchsorted(starts, pos, side="right") - 1).min()
+    return text.map(pd.Series(best.reindex(range(len(uniq))).to_numpy(), index=uniq))
+
+def detect_brands(landing: pd.Series, src: pd.Series) -> pd.Series:
     """
+    core.brands.detect_brand-ийн vectorized хувилбар (үр дүн ижил):
+    1. landing_url болон src-ийн давхардаагүй утгуудаас BRAND_MAP түлхүүр хайна
+    2. Redirect URL-тай мөрүүдэд бодит URL-аас дахин хайна
+    3. Host-ыг str.extract-аар гаргаж, давхардаагүй host → брэнд mapping-аар join хийнэ
+    """
+    landing = landing.fillna("").astype(str)
+    src = src.fillna("").astype(str)
+    # Түлхүүрт зай байхгүй тул "landing src" текстийн хамгийн сайн таарц = хоёр талынх нь min
+    prio = pd.concat([_brand_priority(landing), _brand_priority(src)], axis=1).min(axis=1)
+
+    brand_of = {i: brand_by_priority(i) for i in range(len(BRAND_MAP))}
+    brands = prio.map(brand_of)
+
+    # 2-3 нь зөвхөн landing_url-аас хамаарна → давхардаагүй URL бүрт нэг удаа тооцоод join хийнэ
+    need = brands.isna() & landing.ne("")
+    if need.any():
+        urls = pd.Series(landing[need].unique(), dtype=object)
+        real = urls.copy()
+        redirect = urls.str.contains(REDIRECT_RE)
+        real[redirect] = urls[redirect].map(real_landing_url)
+        fallback = pd.Series(index=urls.index, dtype=object)
+        rematch = real.ne(urls)
+        fallback[rematch] = _brand_priority(real[rematch]).map(brand_of)
+        by_host = fallback.isna()
+        hosts = real[by_host].str.extract(HOST_RE, expand=False).fillna("").str.lower()
+        fallback[by_host] = hosts.map({h: brand_for_host(h) for h in hosts.unique()})
+        brands[need] = landing[need].map(pd.Series(fallback.to_numpy(), index=urls.to_numpy()))
+    return brands.fillna("")
+
+def fill_brands(df: pd.DataFrame) -> pd.DataFrame:
+    """Brand: ingest үед хадгалсан талбар. Хоосон (хуучин) мөрүүдэд л тооцоолно."""
+    if 'brand' not in df.columns:
+        df['brand'] = ""
+    missing = df['brand'].fillna("").astype(str).eq("")
+    if missing.any():
+        landing = df.get('landing_url', pd.Series("", index=df.index))
+        src = df.get('src', pd.Series("", index=df.index))
+        df.loc[missing, 'brand'] = detect_brands(landing[missing], src[missing])
+    # times_seen баганыг хасах (хэрэв байвал)
+    if 'times_seen' in df.columns:
+        df = df.drop(columns=['times_seen'])
+    return df
+
+def column_widths(df: pd.DataFrame, sample_rows: int = WIDTH_SAMPLE_ROWS) -> list:
+    """Баганын Excel өргөн: түүвэрлэсэн мөрүүдийн хамгийн урт утга (+2), MAX_COL_WIDTH-ээр хязгаарлана."""
+    sample = df.sample(n=sample_rows, random_state=0) if len(df) > sample_rows else df
+    widths = []
+    for col in df.columns:
+        longest = sample[col].astype(str).str.len().max() if len(sample) else 0
+        widths.append(int(min(max(longest, len(str(col))) + 2, MAX_COL_WIDTH)))
+    return widths
+
+def normalize_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Parquet-д хадгалахуйц төрөлтэй болгох (холимог object баганыг string болгоно)."""
+    for col in df.columns:
+        if col in INT_COLUMNS:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int64")
+        elif col in BOOL_COLUMNS:
+            df[col] = df[col].astype("boolean")
+        elif col in DATETIME_COLUMNS:
+            df[col] = pd.to_datetime(df[col], errors="coerce", format="mixed")
+        elif df[col].dtype == object:
+            df[col] = df[col].map(lambda v: v if v is None or isinstance(v, str) else str(v)).astype("string")
+    return df
+
+def _row_keys(df: pd.DataFrame) -> pd.MultiIndex:
+    return pd.MultiIndex.from_arrays([df[c].fillna("").astype(str) for c in KEY_COLUMNS])
+
+def _partition_keys(df: pd.DataFrame) -> set:
+    """Мөрүүдийн (first_seen_month, site) партицууд."""
+    if df is None or df.empty:
+        return set()
+    month = df["first_seen_date"].astype("string").str[:7].fillna("unknown")
+    site = df["site"].astype("string").fillna("unknown")
+    return set(zip(month, site))
+
+def load_snapshot():
+    """(DataFrame, watermark) эсвэл snapshot байхгүй/хуучин хувилбар бол (None, None)"""
+    if pyarrow is None or not (os.path.exists(SNAPSHOT_PATH) and os.path.exists(SNAPSHOT_STATE)):
+        return None, None
+    try:
+        with open(SNAPSHOT_STATE, encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("version") != SNAPSHOT_VERSION or not state.get("watermark"):
+            return None, None
+        return pd.read_parquet(SNAPSHOT_PATH), state["watermark"]
+    except Exception as e:
+        logger.warning(f"⚠ Snapshot уншиж чадсангүй, бүтэн дахин үүсгэнэ: {e}")
+        return None, None
+
+def save_snapshot(df: pd.DataFrame, watermark: str):
+    if pyarrow is None:
+        return
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    tmp = SNAPSHOT_PATH + ".tmp"
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, SNAPSHOT_PATH)
+    with open(SNAPSHOT_STATE, "w", encoding="utf-8") as f:
+        json.dump({"version": SNAPSHOT_VERSION, "watermark": watermark, "rows": len(df),
+                   "saved_at": datetime.now().isoformat()}, f)
+
+def dataset_table(df: pd.DataFrame):
+    """Dataset-д бичих arrow хүснэгт: огноо → date32, first_seen_month партицын багана нэмнэ."""
+    frame = df.assign(first_seen_month=df["first_seen_date"].astype("string").str[:7].fillna("unknown"),
+                      site=df["site"].astype("string").fillna("unknown"))
+    for col in DATE_COLUMNS:
+        if col in frame.columns:
+            frame[col] = pd.to_datetime(frame[col], errors="coerce", format="%Y-%m-%d")
+    table = pyarrow.Table.from_pandas(frame, preserve_index=False)
+    for col in DATE_COLUMNS:
+        if col in table.column_names:
+            i = table.schema.get_field_index(col)
+            table = table.set_column(i, col, pc.cast(table[col], pyarrow.date32()))
+    return table
+
+def _partition_dir(root: str, month: str, site: str) -> str:
+    # pyarrow-ийн hive партицын URI encoding-той ижил
+    return os.path.join(root, f"first_seen_month={quote(month, safe='')}", f"site={quote(site, safe='')}")
+
+def write_dataset(df: pd.DataFrame, partitions=None):
+    """
+    _export/dataset/ руу бичих. partitions=None бол бүтэн dataset-ийг түр хавтсанд
+    бичээд солино; үгүй бол зөвхөн тэдгээр партицуудыг дахин бичнэ (хоосорсныг устгана).
+    """
+    if pads is None:
+        return
+    if partitions is not None and not partitions:
+        logger.info("✔ Dataset: өөрчлөгдсөн партиц алга.")
+        return
+
+    if partitions is not None:
+        df = df[[key in partitions for key in zip(
+            df["first_seen_date"].astype("string").str[:7].fillna("unknown"),
+            df["site"].astype("string").fillna("unknown"))]]
+    partitioning = pads.partitioning(
+        pyarrow.schema([(c, pyarrow.string()) for c in PARTITION_COLUMNS]), flavor="hive")
+    options = dict(format="parquet", partitioning=partitioning, basename_template="part-{i}.parquet")
+
+    if partitions is None:
+        tmp, old = DATASET_DIR + ".tmp", DATASET_DIR + ".old"
+        shutil.rmtree(tmp, ignore_errors=True)
+        shutil.rmtree(old, ignore_errors=True)
+        pads.write_dataset(dataset_table(df), tmp, **options)
+        if os.path.exists(DATASET_DIR):
+            os.replace(DATASET_DIR, old)
+        os.replace(tmp, DATASET_DIR)
+        shutil.rmtree(old, ignore_errors=True)
+        logger.info(f"✅ Parquet dataset rebuilt: {DATASET_DIR}")
+        return
+
+    if not df.empty:
+        # delete_matching: зөвхөн бичиж буй партицуудын хуучин файлуудыг устгана
+        pads.write_dataset(dataset_table(df), DATASET_DIR, existing_data_behavior="delete_matching", **options)
+    for month, site in partitions - _partition_keys(df):
+        shutil.rmtree(_partition_dir(DATASET_DIR, month, site), ignore_errors=True)
+        month_dir = os.path.dirname(_partition_dir(DATASET_DIR, month, site))
+        if os.path.isdir(month_dir) and not os.listdir(month_dir):
+            os.rmdir(month_dir)
+    logger.info(f"✅ Parquet dataset: {len(partitions)} partition(s) rewritten.")
+
+def format_sheet(worksheet, frame: pd.DataFrame, header_format, percent_format=None):
+    """Header бичих & баганын өргөн тохируулах (түүврээс ойролцоогоор); share багана хувиар."""
+    for col_num, (value, width) in enumerate(zip(frame.columns.values, column_widths(frame))):
+        worksheet.write(0, col_num, value, header_format)
+        worksheet.set_column(col_num, col_num, width, percent_format if value == "share" else None)
+
+def sov_frames(days: int = REPORT_SOV_DAYS) -> dict:
+    """Share of voice хуудсууд {sheet: DataFrame}. Тооцоолол DB-д, энд зөвхөн жижиг үр дүн ирнэ."""
+    today = datetime.now()
+    start, end = sov_window((today - timedelta(days=days - 1)).strftime("%Y-%m-%d"), today.strftime("%Y-%m-%d"))
+    logger.info(f"📈 Share of voice: {start} → {end}")
+    return {
+        "Presence": pd.DataFrame(brand_presence(start, end), columns=PRESENCE_COLUMNS),
+        "SOV by Site": pd.DataFrame(share_of_voice(start, end, "site"), columns=SOV_COLUMNS),
+        "SOV Total": pd.DataFrame(share_of_voice(start, end, "total"), columns=SOV_COLUMNS).drop(columns="site"),
+    }
+
+def build_frame(full: bool = False):
+    """
+    Тайлангийн DataFrame. Snapshot байвал зөвхөн өөрчлөгдсөн мөрүүдийг татаж нэгтгэнэ.
+    Буцаах: (df, watermark, partitions) — partitions: өөрчлөгдсөн dataset партицууд
+    (None = бүгдийг дахин бичих)
+    """
+    snapshot, watermark = (None, None) if full else load_snapshot()
+    # Уншсан мөрүүдийн max(updated_at) биш: түүнээс хуучин timestamp-тай бичилт дараа нь commit
+    # хийгдэж болно. Давхцсан мөрүүд (site, src)-ээр нэгтгэгдэх тул дахин татахад хохиролгүй.
+    read_watermark = (datetime.utcnow() - timedelta(seconds=REPORT_WATERMARK_LAG_SEC)).isoformat()
+
+    if snapshot is None:
+        data = get_mongo_data()
+        if not data:
+            return None, None, None
+        df = normalize_frame(fill_brands(pd.DataFrame(data)))
+        partitions = None
+        logger.info(f"✔ Loaded {len(df)} records from DB (full).")
+        watermark = read_watermark
+    else:
+        changed = fetch_banners_since(watermark)
+        live = {(site or "", src or "") for site, src in list_banner_keys()}
+        logger.info(f"✔ Incremental: {len(changed)} changed records since {watermark}.")
+
+        df = snapshot
+        partitions = set()
+        if changed:
+            delta = normalize_frame(fill_brands(pd.DataFrame(changed)))
+            # Шинэ болон хуучин байрлал хоёулаа (first_seen_date өөрчлөгдсөн бол)
+            partitions |= _partition_keys(delta)
+            partitions |= _partition_keys(snapshot[_row_keys(snapshot).isin(set(_row_keys(delta)))])
+            df = pd.concat([df, delta], ignore_index=True)
+            df = df.drop_duplicates(subset=KEY_COLUMNS, keep="last")
+        # Хоёр тайлан зэрэг ажилласан ч watermark ухрахгүй
+        watermark = max(watermark, read_watermark)
+        # DB-ээс устгагдсан мөрүүдийг хасна
+        alive = _row_keys(df).isin(live)
+        partitions |= _partition_keys(df[~alive])
+        df = df[alive]
+
+    # DB-д оруулсан дарааллаар (full болон incremental ижил дараалалтай байна)
+    if "created_at" in df.columns:
+        df = df.sort_values("created_at", kind="stable", na_position="first")
+    return df.reset_index(drop=True), watermark, partitions
+
+def main(full: bool = False, progress=None) -> dict:
+    """
+    worker.py-ийн report job-оос дуудагддаг үндсэн функц.
+    full=True: snapshot-ыг үл тооцож бүх баннерыг DB-ээс дахин татна.
+    progress: алхам бүрийн нэрийг хүлээн авах callback (job-ийн явц).
+    Буцаах: {"rows", "watermark"}
+    """
+    step = progress or (lambda name: None)
     logger.info("📊 Report Generation Started...")
     
     # Хавтас үүсгэх
@@ -115,25 +366,26 @@ def main():
         os.makedirs(EXPORT_DIR)
 
     # Өгөгдөл татах
-    data = get_mongo_data()
-    
-    if not data:
-        logger.warning("⚠ No data found in MongoDB. Report will be empty.")
+    step("load")
+    df, watermark, partitions = build_frame(full)
+
+    if df is not None and watermark:
+        # Dataset-ийг snapshot-оос өмнө: snapshot хадгалагдаагүй бол дараагийн run ижил партицуудыг дахин бичнэ
+        step("dataset")
+        try:
+            write_dataset(df, partitions if os.path.isdir(DATASET_DIR) else None)
+        except Exception as e:
+            logger.error(f"❌ Failed to write Parquet dataset: {e}")
+            shutil.rmtree(DATASET_DIR, ignore_errors=True)   # дараагийн run бүтэн дахин үүсгэнэ
+        try:
+            save_snapshot(df, watermark)
+        except Exception as e:
+            logger.error(f"❌ Failed to save snapshot: {e}")
+
+    if df is None or df.empty:
+        logger.warning("⚠ No data found in DB. Report will be empty.")
         # Хоосон ч гэсэн файл үүсгэх (алдаа өгөхгүйн тулд)
-        df = pd.DataFrame(columns=["site", "brand", "src", "landing_url", "first_seen_date", "last_seen_date", "days_seen"])
-    else:
-        df = pd.DataFrame(data)
-        logger.info(f"✔ Loaded {len(df)} records from MongoDB.")
-        
-        # Brand баганыг нэмэх/шинэчлэх
-        df['brand'] = df.apply(
-            lambda row: detect_brand(row.get('landing_url', ''), row.get('src', '')),
-            axis=1
-        )
-        
-        # times_seen баганыг хасах (хэрэв байвал)
-        if 'times_seen' in df.columns:
-            df = df.drop(columns=['times_seen'])
+        df = pd.DataFrame(columns=EMPTY_COLUMNS)
 
     # Баганын дарааллыг цэгцлэх (Уншихад хялбар болгох)
     preferred_order = [
@@ -147,6 +399,7 @@ def main():
         "landing_url", 
         "src", 
         "screenshot_path",
+        "asset_id",
         "ad_score",
         "ad_reason"
     ]
@@ -156,7 +409,16 @@ def main():
     other_cols = [c for c in df.columns if c not in existing_cols]
     df = df[existing_cols + other_cols]
 
+    # Share of voice (DB дээрх aggregation)
+    step("share_of_voice")
+    try:
+        sov = sov_frames()
+    except Exception as e:
+        logger.error(f"❌ Failed to build share of voice sheets: {e}")
+        sov = {}
+
     # Excel файл руу бичих
+    step("xlsx")
     output_path = os.path.join(EXPORT_DIR, "summary.xlsx")
     
     try:
@@ -177,14 +439,13 @@ def main():
                 'border': 1
             })
             
-            # Header бичих & Баганын өргөн тохируулах
-            for col_num, value in enumerate(df.columns.values):
-                worksheet.write(0, col_num, value, header_format)
-                
-                # Data width calculation
-                # (Ойролцоогоор тооцоолох, хэт урт баганыг 50-аар хязгаарлах)
-                column_len = max(df[value].astype(str).map(len).max(), len(str(value))) + 2
-                worksheet.set_column(col_num, col_num, min(column_len, 60))
+            percent_format = workbook.add_format({'num_format': '0.0%'})
+            format_sheet(worksheet, df, header_format)
+
+            # Share of voice хуудсууд
+            for name, frame in sov.items():
+                frame.to_excel(writer, sheet_name=name, index=False)
+                format_sheet(writer.sheets[name], frame, header_format, percent_format)
         
         logger.info(f"✅ Excel report successfully generated at: {output_path}")
         
@@ -200,6 +461,7 @@ def main():
             pass
     
     # TSV файл бас үүсгэх
+    step("tsv")
     tsv_path = os.path.join(EXPORT_DIR, "summary.tsv")
     try:
         df.to_csv(tsv_path, sep='\t', index=False, encoding='utf-8')
@@ -207,5 +469,9 @@ def main():
     except Exception as e:
         logger.error(f"❌ Failed to write TSV file: {e}")
 
+    return {"rows": len(df), "watermark": watermark}
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Banner report generator")
+    parser.add_argument("--full", action="store_true", help="snapshot-ыг бүтэн дахин үүсгэх")
+    main(full=parser.parse_args().full)
\ No newline at end of file
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+worker.py — Scheduler болон scrape pipeline-ийг ажиллуулах тусдаа процесс
+=========================================================================
+
+server.py (web) нь зөвхөн job хүсэлт DB-д бичнэ ("Scrape now" товч).
+Энэ процесс:
+  - 09:00 & 18:00 (Asia/Ulaanbaatar) цагт scrape job дараалалд оруулна
+    (SCHEDULE_MODE=interval үед сайт бүр өөрийн interval/jitter/priority-гоор — core/schedule.py)
+  - Дараалалд орсон job-ийг авч run.run_pipeline()-ийг ажиллуулна
+  - Эхлэхдээ өмнөх процесс унаснаас дуусаагүй үлдсэн run байвал "Resume" job оруулж,
+    зөвхөн дуусаагүй сайтуудыг нь үргэлжлүүлнэ (scrape хийгдсэн capture-уудыг _spool/-оос)
+    (SCRAPE_MODE=distributed үед сайт бүрийг site job болгож site_worker.py node-уудад өгнө)
+  - Тайлангийн (report) job-уудыг тусдаа thread-д summarize.main()-ээр үүсгэнэ:
+    REPORT_COALESCE_SEC хугацаанд ирсэн trigger-үүд нэг build болно
+  - Лог болон төлөвийн event-үүдийг DB (job_events) руу бичнэ → dashboard SSE
+
+Job lock нь DB-д байдаг тул олон worker ажиллуулсан ч нэг job зэрэг хоёр
+удаа ажиллахгүй (cron хоёуланд нь тохирсон ч нэг нь л дараалалд оруулна).
+SCHEDULE_MODE=interval-ийн хуваарь ч DB-д (site_schedule) тул сайт нэг интервалд нэг л удаа
+дараалалд орно.
+
+Ашиглалт:
+    python worker.py
+"""
+
+import time
+import signal
+import threading
+import logging
+import datetime
+from typing import List, Optional, Set
+
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+
+import run
+import summarize
+from core import events
+from core import engine
+from core.schedule import SCHEDULE_MODE, SCHEDULE_TICK_SEC, SiteScheduler
+from core.db import check_connection, ensure_indexes, claim_job, finish_job, latest_event_seq
+from core.jobs import (
+    REPORT_COALESCE_SEC, REPORT_JOB, RESUME_SOURCE, SCRAPE_JOB, WORKER_ID, Heartbeat, forward_events_to_db,
+    report_state, request_report, request_scrape,
+)
+
+WORKER_POLL_SEC = 2
+SCHEDULE_SOURCE = "Schedule"
+logging.getLogger('apscheduler').setLevel(logging.WARNING)
+
+_STOP = False
+# SCHEDULE_MODE=interval үед main() үүсгэнэ
+site_scheduler: Optional[SiteScheduler] = None
+
+
+def worker_log(message: str):
+    timestamp = datetime.datetime.now().strftime("%H:%M:%S")
+    entry = f"[{timestamp}] {message}"
+    print(entry)
+    events.publish("log", {"line": entry})
+
+
+class EventLogHandler(logging.Handler):
+    """Pipeline-ийн logger-ийн мөрүүдийг dashboard-ийн лог руу дамжуулна."""
+
+    def emit(self, record):
+        try:
+            events.publish("log", {"line": self.format(record)})
+        except Exception:
+            self.handleError(record)
+
+
+def enqueue(source: str = "Auto"):
+    job = request_scrape(source)
+    if job:
+        print(f"📥 {source}: scrape job queued ({job['job_id']})")
+    else:
+        print(f"⚠ {source}: Scraper is busy.")
+
+
+def enqueue_due():
+    """SCHEDULE_MODE=interval: хугацаа нь болсон сайтуудыг (MAX_BROWSERS хүртэл) нэг job болгох."""
+    names = site_scheduler.take_due(limit=engine.MAX_BROWSERS)
+    if not names:
+        return
+    job = request_scrape(SCHEDULE_SOURCE, sites=names)
+    if job:
+        print(f"📥 Schedule: {', '.join(names)} queued ({job['job_id']})")
+    else:
+        # Busy: сайтууд due хэвээр — ажиллаж буй scheduled run slot чөлөөлөгдөхөд авна, эсвэл дараагийн tick
+        site_scheduler.release(names)
+
+
+def schedule_feed(limit: int, in_run: Set[str]) -> List[str]:
+    """Ажиллаж буй scheduled run-д шинээр due болсон сайтуудыг нэмэх (engine.run_site_jobs feed)."""
+    return site_scheduler.take_due(limit=limit, exclude=in_run)
+
+
+def enqueue_resume() -> bool:
+    """
+    Дуусаагүй run-ийг үргэлжлүүлэх job оруулах. Буцаах: True бол дахин оролдох шаардлагагүй.
+    Унасан процессын lock JOB_STALE_SEC болтол busy харагдах тул False бол дараа нь дахин оролдоно.
+    """
+    if not run.has_unfinished_run():
+        return True
+    job = request_scrape(RESUME_SOURCE)
+    if job:
+        print(f"📥 Interrupted run found: resume job queued ({job['job_id']})")
+    return bool(job)
+
+
+def run_job(job: dict):
+    source = job.get("source") or "Auto"
+    events.publish("state", {"running": True, "source": source, "job_id": job["job_id"]})
+    worker_log(f"🚀 {source}: Starting Pipeline{' (' + ', '.join(job['sites']) + ')' if job.get('sites') else ''}...")
+    error, result = None, None
+    with Heartbeat(SCRAPE_JOB, job["job_id"]):
+        try:
+            feed = schedule_feed if site_scheduler is not None and source == SCHEDULE_SOURCE else None
+            res = run.run_pipeline(sites=job.get("sites"), resume=source == RESUME_SOURCE, feed=feed)
+            if res.get("status") == "failed":
+                error = res.get("error")
+                worker_log(f"❌ Failed: {error}")
+            else:
+                stats = res.get("stats", {})
+                result = {"stats": stats}
+                worker_log(f"✅ Done. Total: {stats.get('total_collected')}, New: {stats.get('new_banners')}")
+        except Exception as e:
+            error = str(e)
+            worker_log(f"❌ Error: {e}")
+    # Lock-ийг эхлээд чөлөөлнө: idle event ирэхэд /scraper/status аль хэдийн idle байна
+    finish_job(SCRAPE_JOB, job["job_id"], "failed" if error else "success", error=error, result=result)
+    events.publish("state", {"running": False, "source": source, "error": error})
+
+
+def run_report(job: dict):
+    """Нэг report job: summarize.main(). Явц нь lock-ийн progress болон "report" event-ээр харагдана."""
+    job_id, source = job["job_id"], job.get("source") or "Auto"
+    events.publish("report", {"state": "running", "job_id": job_id, "source": source})
+    worker_log(f"📊 Report build started ({source})")
+    error, result = None, None
+    with Heartbeat(REPORT_JOB, job_id) as hb:
+        try:
+            result = summarize.main(progress=hb.progress)
+        except Exception as e:
+            error = str(e)
+            worker_log(f"❌ Report Error: {e}")
+    finish_job(REPORT_JOB, job_id, "failed" if error else "success", error=error, result=result)
+    events.publish("report", {"state": "failed" if error else "success", "job_id": job_id, "error": error})
+    if not error:
+        events.publish("report_done", result or {})
+        worker_log(f"✅ Report ready ({(result or {}).get('rows', 0)} rows)")
+
+    # Build ажиллаж байх хооронд ирсэн trigger-үүд → нэг удаа дахин
+    if report_state().get("pending"):
+        request_report("Coalesced")
+
+
+def report_loop():
+    """Report job-уудыг scrape-аас үл хамааран авна (queued болсноос REPORT_COALESCE_SEC-ийн дараа)."""
+    queued_since = None
+    while not _STOP:
+        try:
+            state = report_state()
+            if state["state"] != "queued":
+                queued_since = None
+            elif queued_since is None:
+                queued_since = time.monotonic()
+            elif time.monotonic() - queued_since >= REPORT_COALESCE_SEC:
+                queued_since = None
+                job = claim_job(REPORT_JOB, WORKER_ID, latest_event_seq())
+                if job:
+                    run_report(job)
+                    continue
+        except Exception as e:
+            print(f"Report Worker Error: {e}")
+        time.sleep(WORKER_POLL_SEC)
+
+
+def _handle_stop(signum, frame):
+    global _STOP
+    _STOP = True
+    print("🛑 Stop signal received, finishing current job...")
+
+
+def main():
+    print("=" * 60)
+    print(f"🛠  SCRAPER WORKER ({WORKER_ID})")
+    print("=" * 60)
+
+    while not check_connection():
+        print("⏳ DB холбогдохыг хүлээж байна...")
+        time.sleep(5)
+    ensure_indexes()
+
+    forward_events_to_db()
+    handler = EventLogHandler()
+    handler.setFormatter(logging.Formatter("[%(asctime)s] %(message)s", datefmt="%H:%M:%S"))
+    logging.getLogger("ScraperPipeline").addHandler(handler)
+    logging.getLogger("Summarizer").addHandler(handler)
+
+    signal.signal(signal.SIGTERM, _handle_stop)
+    signal.signal(signal.SIGINT, _handle_stop)
+
+    global site_scheduler
+    scheduler = BackgroundScheduler()
+    if SCHEDULE_MODE == "interval":
+        # =====================================================
+        # ✅ SCHEDULER - САЙТ БҮР ӨӨРИЙН ХУВААРЬТАЙ (interval ± jitter, priority)
+        # =====================================================
+        site_scheduler = SiteScheduler()
+        scheduler.add_job(
+            enqueue_due,
+            IntervalTrigger(seconds=SCHEDULE_TICK_SEC),
+            id='site_schedule',
+            replace_existing=True,
+            max_instances=1
+        )
+        scheduler.start()
+        print(f"✅ Scheduler started. Per-site intervals, up to {engine.MAX_BROWSERS} browsers at once")
+    else:
+        # =====================================================
+        # ✅ SCHEDULER - ӨДӨРТ 2 УДАА (09:00 & 18:00)
+        # =====================================================
+        scheduler.add_job(
+            enqueue,
+            CronTrigger(hour=9, minute=0, timezone='Asia/Ulaanbaatar'),
+            id='morning_scrape',
+            replace_existing=True
+        )
+        scheduler.add_job(
+            enqueue,
+            CronTrigger(hour=18, minute=0, timezone='Asia/Ulaanbaatar'),
+            id='evening_scrape',
+            replace_existing=True
+        )
+        scheduler.start()
+        print("✅ Scheduler started. Jobs run at 09:00 & 18:00 (Asia/Ulaanbaatar)")
+
+    report_thread = threading.Thread(target=report_loop, daemon=True, name="report-worker")
+    report_thread.start()
+
+    resume_pending = True
+    while not _STOP:
+        try:
+            if resume_pending:
+                resume_pending = not enqueue_resume()
+            job = claim_job(SCRAPE_JOB, WORKER_ID, latest_event_seq())
+        except Exception as e:
+            print(f"Worker Error: {e}")
+            job = None
+        if job:
+            run_job(job)
+        else:
+            time.sleep(WORKER_POLL_SEC)
+
+    scheduler.shutdown(wait=False)
+    report_thread.join(timeout=WORKER_POLL_SEC + 1)
+    print("👋 Worker stopped")
+
+
+if __name__ == "__main__":
+    main()